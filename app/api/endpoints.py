@@ -1,30 +1,80 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Body, UploadFile, File, Form, HTTPException, Query, WebSocket, WebSocketDisconnect
 from typing import List
+import json
 from ..services.image_service import ImageService
-from fastapi.responses import JSONResponse
+from ..services.blob_listing import MAX_PAGE_SIZE, stream_json_array
+from ..services.block_upload import UploadTooLargeError
+from ..services.bulk_delete import parse_selection, summarize
+from ..services.image_pipeline import parse_operations
+from ..services.ocr_session import OcrSessionService, SessionRejectedError
+from ..core.metrics import metrics
+from fastapi.responses import JSONResponse, StreamingResponse
 
 router = APIRouter()
 image_service = ImageService()
+ocr_session_service = OcrSessionService()
+
+metrics.collect(
+    'cache_lookups_total', 'Cache lookups by cache and outcome',
+    lambda: {('image_list', outcome): image_service.page_cache.stats()[outcome] for outcome in ('hits', 'misses')},
+    labelnames=('cache', 'outcome')
+)
+metrics.collect(
+    'ocr_sessions', 'Open OCR sessions', lambda: {(): ocr_session_service.stats()['active']}, kind='gauge'
+)
 
 @router.post("/upload/")
 async def upload_image(file: UploadFile = File(...)):
     """Upload ảnh mới"""
     try:
-        content = await file.read()
-        result = await image_service.upload_image(content, file.filename)
+        # UploadFile đã được spool ra đĩa, service đọc từng block (await file.read)
+        result = await image_service.upload_image(file, file.filename)
         return JSONResponse(content=result, status_code=201)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/images/")
-async def list_images():
-    """Lấy danh sách tất cả các ảnh"""
+async def list_images(
+    limit: int = Query(1000, ge=1, le=MAX_PAGE_SIZE),
+    prefix: str = None,
+    continuation_token: str = None
+):
+    """Lấy danh sách ảnh theo trang; header X-Continuation-Token chứa token của trang tiếp theo"""
     try:
-        images = await image_service.list_images()
-        return images
+        images, next_token = await image_service.list_images(prefix, limit, continuation_token)
+        headers = {"X-Continuation-Token": next_token} if next_token else None
+        return StreamingResponse(stream_json_array(images), media_type="application/json", headers=headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/images/bulk-delete/")
+async def bulk_delete_images(
+    names: List[str] = Body(None, description="Danh sách tên ảnh cần xóa (không dùng chung với prefix/older_than)"),
+    prefix: str = Body(None, description="Xóa các ảnh có tên bắt đầu bằng prefix"),
+    older_than: str = Body(None, description="Xóa các ảnh sửa đổi lần cuối trước thời điểm này (ISO 8601, mặc định UTC)"),
+    dry_run: bool = Body(False, description="Chỉ liệt kê các ảnh sẽ bị xóa")
+):
+    """Xóa hàng loạt ảnh theo danh sách tên, prefix hoặc thời gian; trả về NDJSON, mỗi dòng một ảnh và dòng tổng kết cuối cùng"""
+    try:
+        names, prefix, older_than = parse_selection(names, prefix, older_than)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    async def generate():
+        summary = {"dry_run": dry_run}
+        try:
+            async for outcomes in image_service.bulk_delete(names, prefix, older_than, dry_run):
+                summarize(outcomes, summary)
+                for outcome in outcomes:
+                    yield json.dumps(outcome, ensure_ascii=False) + "\n"
+        except Exception as e:
+            summary["error"] = str(e)
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @router.get("/images/{filename}")
 async def get_image_info(filename: str):
     """Lấy thông tin chi tiết của một ảnh"""
@@ -67,4 +117,54 @@ async def crop_image(
         result = await image_service.crop_image(content, file.filename, left, top, right, bottom)
         return JSONResponse(content=result, status_code=201)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e)) 
+
+@router.post("/process/pipeline/")
+async def process_pipeline(
+    file: UploadFile = File(...),
+    operations: str = Form(..., description='Danh sách thao tác dạng JSON, ví dụ [{"op": "crop", "left": 0, "top": 0, "right": 640, "bottom": 480}, {"op": "grayscale"}, {"op": "resize", "width": 320}]')
+):
+    """Áp dụng lần lượt nhiều thao tác (crop, grayscale, resize, threshold, rotate) và chỉ upload ảnh cuối cùng"""
+    try:
+        try:
+            operations = json.loads(operations)
+        except ValueError as e:
+            raise ValueError(f"operations must be a JSON list: {str(e)}")
+        parsed = parse_operations(operations)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        content = await file.read()
+        result = await image_service.process_pipeline(content, file.filename, parsed)
+        return JSONResponse(content=result, status_code=201)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.websocket("/ocr/ws")
+async def ocr_session(
+    websocket: WebSocket,
+    set_order: int = None,
+    template_id: str = None,
+    ocr_mode: str = None,
+    policy: str = None
+):
+    """Phiên OCR liên tục: client gửi từng frame dạng binary, nhận kết quả OCR dạng JSON trên cùng kết nối.
+
+    Bố cục ROI (set_order hoặc template_id, mặc định theo set_order.txt) được xác định một lần khi mở phiên.
+    """
+    await websocket.accept()
+    try:
+        session = await ocr_session_service.open_session(set_order, template_id, ocr_mode, policy)
+    except SessionRejectedError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=e.code)
+        return
+    try:
+        await session.run(websocket)
+    except WebSocketDisconnect:
+        pass
+
+@router.get("/ocr/sessions/")
+async def ocr_session_stats():
+    """Thống kê các phiên OCR của tiến trình này"""
+    return ocr_session_service.stats()
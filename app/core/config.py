@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,6 +11,60 @@ class Settings:
     # Azure Storage settings
     AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
     AZURE_STORAGE_CONTAINER_NAME = os.getenv("AZURE_STORAGE_CONTAINER_NAME", "images")
+    # Số kết nối HTTP tối đa của connection pool dùng chung tới Blob Storage
+    AZURE_HTTP_POOL_SIZE = int(os.getenv("AZURE_HTTP_POOL_SIZE", "100"))
+    
+    # Storage backend: azure, local (thư mục trên đĩa) hoặc memory (chạy không cần Azure)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "azure")
+    LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "storage")
+    # Cache đọc qua trên đĩa cục bộ cho ảnh vừa upload / vừa đọc (bỏ trống để tắt)
+    STORAGE_CACHE_DIR = os.getenv("STORAGE_CACHE_DIR")
+    STORAGE_CACHE_MAX_BYTES = int(os.getenv("STORAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    STORAGE_CACHE_TTL_SECONDS = float(os.getenv("STORAGE_CACHE_TTL_SECONDS", "30"))
+    STORAGE_CACHE_MAX_OBJECT_BYTES = int(os.getenv("STORAGE_CACHE_MAX_OBJECT_BYTES", str(8 * 1024 * 1024)))
+    
+    # Upload settings: ảnh được stream thành các block và upload song song
+    UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", str(4 * 1024 * 1024)))
+    UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "4"))
+    UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+    
+    # Listing settings: thời gian cache các trang danh sách ảnh gần đây
+    IMAGE_LIST_CACHE_TTL_SECONDS = float(os.getenv("IMAGE_LIST_CACHE_TTL_SECONDS", "10"))
+    
+    # Xóa hàng loạt: mỗi batch request tối đa 256 ảnh, số batch chạy song song
+    BULK_DELETE_BATCH_SIZE = int(os.getenv("BULK_DELETE_BATCH_SIZE", "256"))
+    BULK_DELETE_CONCURRENCY = int(os.getenv("BULK_DELETE_CONCURRENCY", "4"))
+    
+    # Container cấu hình (roi_info.txt, templates/) và set_order.txt, dùng chung với main.py
+    AZURE_STORAGE_CONFIG_CONTAINER_NAME = os.getenv("AZURE_STORAGE_CONFIG_CONTAINER_NAME")
+    AZURE_STORAGE_SET_ORDER_CONTAINER_NAME = os.getenv("AZURE_STORAGE_SET_ORDER_CONTAINER_NAME")
+    ROI_CACHE_TTL_SECONDS = float(os.getenv("ROI_CACHE_TTL_SECONDS", "30"))
+    SET_ORDER_CACHE_TTL_SECONDS = float(os.getenv("SET_ORDER_CACHE_TTL_SECONDS", "5"))
+    TEMPLATE_CACHE_TTL_SECONDS = float(os.getenv("TEMPLATE_CACHE_TTL_SECONDS", "30"))
+    
+    # OCR settings: cùng ý nghĩa và giá trị mặc định như biến môi trường của main.py
+    OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")
+    OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "0"))  # 0: chia số core cho WEB_CONCURRENCY
+    OCR_MODE = os.getenv("OCR_MODE", "per_roi")
+    OCR_THRESHOLD_SCOPE = os.getenv("OCR_THRESHOLD_SCOPE", "image")
+    OCR_TEXT_HEIGHT = float(os.getenv("OCR_TEXT_HEIGHT", "0"))
+    OCR_CHANGE_DETECTION = os.getenv("OCR_CHANGE_DETECTION", "0").lower() in ("1", "true")
+    OCR_CHANGE_THRESHOLD = float(os.getenv("OCR_CHANGE_THRESHOLD", "24"))
+    OCR_BLANK_STDDEV = float(os.getenv("OCR_BLANK_STDDEV", "2.0"))
+    # Cùng thư mục khóa với main.py: các phiên OCR chia chung ngân sách token của máy
+    OCR_ADMISSION = os.getenv("OCR_ADMISSION", "1").lower() in ("1", "true")
+    OCR_ADMISSION_TOKENS = int(os.getenv("OCR_ADMISSION_TOKENS", "0")) or (os.cpu_count() or 1)
+    OCR_ADMISSION_MAX_QUEUE = int(os.getenv("OCR_ADMISSION_MAX_QUEUE", "16"))
+    OCR_ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("OCR_ADMISSION_MAX_WAIT_SECONDS", "10"))
+    OCR_ADMISSION_LOCK_DIR = os.getenv(
+        "OCR_ADMISSION_LOCK_DIR", os.path.join(tempfile.gettempdir(), "wrembly-ocr-admission")
+    )
+    
+    # Phiên OCR qua WebSocket: số phiên tối đa mỗi tiến trình, số frame chờ tối đa mỗi phiên
+    # và cách xử lý frame đến khi hàng đợi đầy (drop: bỏ frame mới, coalesce: bỏ frame cũ nhất)
+    OCR_SESSION_MAX_SESSIONS = int(os.getenv("OCR_SESSION_MAX_SESSIONS", "32"))
+    OCR_SESSION_MAX_PENDING = int(os.getenv("OCR_SESSION_MAX_PENDING", "1"))
+    OCR_SESSION_FRAME_POLICY = os.getenv("OCR_SESSION_FRAME_POLICY", "coalesce")
     
     # API settings
     API_V1_STR = "/api/v1"
@@ -0,0 +1,23 @@
+from ..services.metrics import BYTES_BUCKETS, MetricsRegistry
+
+# Metrics Prometheus của API FastAPI, phục vụ tại /metrics (theo từng tiến trình)
+metrics = MetricsRegistry('wrembly_api')
+
+request_seconds = metrics.histogram(
+    'request_seconds', 'Duration of API requests', labelnames=('route', 'method')
+)
+request_errors = metrics.counter(
+    'request_errors_total', 'API requests answered with an error status', labelnames=('route', 'status')
+)
+stage_seconds = metrics.histogram(
+    'stage_seconds', 'Duration of image processing and storage stages', labelnames=('stage',)
+)
+image_bytes = metrics.histogram(
+    'image_bytes', 'Size of images received', BYTES_BUCKETS, labelnames=('endpoint',)
+)
+storage_transfer_bytes = metrics.histogram(
+    'storage_transfer_bytes', 'Bytes sent to blob storage per operation', BYTES_BUCKETS, labelnames=('operation',)
+)
+ocr_session_frames = metrics.counter(
+    'ocr_session_frames_total', 'Frames received by OCR sessions', labelnames=('outcome',)
+)
@@ -1,11 +1,28 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from .core.config import settings
-from .api.endpoints import router as api_router
+from .core.metrics import metrics, request_errors, request_seconds
+from .services.metrics import CONTENT_TYPE
+from .api.endpoints import router as api_router, image_service, ocr_session_service
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Blob client và connection pool được tạo một lần khi khởi động, đóng khi dừng
+    await image_service.start()
+    # OCR engine, worker pool và bộ đọc cấu hình ROI của các phiên OCR được tạo khi mở phiên đầu tiên
+    try:
+        yield
+    finally:
+        ocr_session_service.close()
+        await image_service.close()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.PROJECT_VERSION,
+    lifespan=lifespan,
 )
 
 # Cấu hình CORS
@@ -17,6 +34,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Đo thời gian và lỗi của mọi request (theo route template, không theo URL cụ thể)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    if path != "/metrics":
+        request_seconds.observe(time.perf_counter() - start, route=path, method=request.method)
+    if response.status_code >= 400:
+        request_errors.inc(route=path, status=response.status_code)
+    return response
+
 # Thêm router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -26,4 +56,9 @@ async def root():
         "message": "Chào mừng đến với Wrembly Image Processing API",
         "version": settings.PROJECT_VERSION,
         "docs_url": "/docs"
-    } 
\ No newline at end of file
+    } 
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Metrics Prometheus của tiến trình này"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
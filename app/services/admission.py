@@ -0,0 +1,188 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single server process, the budget stays process-local
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request cannot get a token: the wait queue is full or its deadline passed"""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Token budget in front of CPU-bound work with a bounded FIFO wait queue.
+
+    Up to ``tokens`` requests run at once; the next ``max_queue`` wait in arrival order
+    for at most ``max_wait_seconds``, anything beyond is rejected right away. With a
+    ``lock_dir`` the budget is shared by every process using that directory (gunicorn
+    workers of one machine): each token is an flock on a slot file, which the kernel
+    releases if a worker dies. Processes see each other's releases by polling every
+    ``poll_interval`` seconds; within a process waiters are woken directly.
+
+    The slot files are opened on first use in each process, not at construction: flock
+    belongs to the open file description, so descriptors inherited over fork (gunicorn
+    ``--preload``) would let every worker hold the same slot.
+    """
+
+    def __init__(self, tokens: int, max_queue: int = 16, max_wait_seconds: float = 10.0,
+                 lock_dir=None, poll_interval: float = 0.01):
+        self.tokens = max(1, tokens)
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.poll_interval = poll_interval
+
+        self._cond = threading.Condition()
+        self._waiters = deque()
+        self._held = set()
+        self._lock_dir = None
+        self._slots = None
+        self._slots_pid = None
+        if lock_dir and fcntl is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+            self._lock_dir = lock_dir
+        elif lock_dir:
+            logger.warning("File locks are not available, the OCR token budget is per process")
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._hold_average = None
+
+    @property
+    def shared(self):
+        return self._lock_dir is not None
+
+    def _slot_files(self):
+        """This process' slot files under self._cond, (re)opened after a fork"""
+        pid = os.getpid()
+        if self._slots_pid != pid:
+            # Tokens and waiters of the parent do not carry over to a forked child
+            self._held.clear()
+            self._waiters.clear()
+            self._slots = [
+                open(os.path.join(self._lock_dir, f"slot-{i}.lock"), 'a+b') for i in range(self.tokens)
+            ]
+            self._slots_pid = pid
+        return self._slots
+
+    def _try_take(self):
+        """Claim a free token under self._cond, returns its slot number or None"""
+        slots = self._slot_files() if self.shared else None
+        for slot in range(self.tokens):
+            if slot in self._held:
+                continue
+            if slots is not None:
+                try:
+                    fcntl.flock(slots[slot], fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+            self._held.add(slot)
+            return slot
+        return None
+
+    def retry_after(self):
+        """Seconds a rejected client should wait: the queue ahead of it at the average hold time"""
+        with self._cond:
+            hold = self._hold_average if self._hold_average is not None else 1.0
+            return max(1, math.ceil(hold * (len(self._waiters) + 1) / self.tokens))
+
+    def acquire(self):
+        """Wait for a token, returns (slot, seconds waited); AdmissionRejectedError if none"""
+        start = time.monotonic()
+        deadline = start + self.max_wait_seconds
+        with self._cond:
+            if self.shared:
+                self._slot_files()
+            slot = self._try_take() if not self._waiters else None
+            if slot is None:
+                if len(self._waiters) >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    reason = 'queue_full'
+                else:
+                    ticket = object()
+                    self._waiters.append(ticket)
+                    try:
+                        while True:
+                            if self._waiters[0] is ticket:
+                                slot = self._try_take()
+                                if slot is not None:
+                                    break
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                break
+                            # Releases of other processes are only noticed by polling
+                            self._cond.wait(min(remaining, self.poll_interval) if self.shared else remaining)
+                    finally:
+                        self._waiters.remove(ticket)
+                        self._cond.notify_all()
+                    if slot is None:
+                        self.rejected_timeout += 1
+                        reason = 'timeout'
+
+            if slot is not None:
+                waited = time.monotonic() - start
+                self.admitted += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+                return slot, waited
+
+        if reason == 'queue_full':
+            message = f"OCR is at capacity ({self.tokens} running, {self.max_queue} waiting)"
+        else:
+            message = f"No OCR capacity within {self.max_wait_seconds:g}s"
+        raise AdmissionRejectedError(message, reason, self.retry_after())
+
+    def release(self, slot, held_seconds=None):
+        with self._cond:
+            if self.shared:
+                fcntl.flock(self._slot_files()[slot], fcntl.LOCK_UN)
+            self._held.discard(slot)
+            if held_seconds is not None:
+                # Moving average of how long requests keep a token, for Retry-After
+                self._hold_average = held_seconds if self._hold_average is None else (
+                    0.8 * self._hold_average + 0.2 * held_seconds
+                )
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self):
+        """Hold a token for the duration of the block, yields the seconds spent waiting"""
+        slot, waited = self.acquire()
+        start = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(slot, time.monotonic() - start)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'tokens': self.tokens,
+                'shared': self.shared,
+                'in_use': len(self._held),
+                'queued': len(self._waiters),
+                'max_queue': self.max_queue,
+                'max_wait_seconds': self.max_wait_seconds,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_timeout': self.rejected_timeout,
+                'avg_wait_seconds': round(self._wait_total / self.admitted, 4) if self.admitted else None,
+                'max_wait_seconds_seen': round(self._wait_max, 4),
+                'avg_hold_seconds': round(self._hold_average, 4) if self._hold_average is not None else None
+            }
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+MAX_PAGE_SIZE = 5000
+
+
+def list_blob_page(container_client, prefix=None, limit: int = 1000, continuation_token=None):
+    """Fetch one page of a container listing.
+
+    Returns the blobs of the page and the opaque continuation token of the next page
+    (None on the last page). Only this page is requested from storage, so the cost does not
+    depend on how many blobs the container holds.
+    """
+    pages = container_client.list_blobs(
+        name_starts_with=prefix or None,
+        results_per_page=limit
+    ).by_page(continuation_token=continuation_token or None)
+    try:
+        page = list(next(pages))
+    except StopIteration:
+        return [], None
+    return page, pages.continuation_token or None
+
+
+async def list_blob_page_async(container_client, prefix=None, limit: int = 1000, continuation_token=None):
+    """Async counterpart of list_blob_page for the aio container client"""
+    pages = container_client.list_blobs(
+        name_starts_with=prefix or None,
+        results_per_page=limit
+    ).by_page(continuation_token=continuation_token or None)
+    try:
+        page = await pages.__anext__()
+    except StopAsyncIteration:
+        return [], None
+    return [blob async for blob in page], pages.continuation_token or None
+
+
+def stream_json_array(items):
+    """Serialize a list as a JSON array one element at a time"""
+    yield '['
+    for i, item in enumerate(items):
+        yield (',' if i else '') + json.dumps(item, ensure_ascii=False)
+    yield ']'
+
+
+class PageCache:
+    """Small TTL cache of recent listing pages keyed by (prefix, limit, continuation token)"""
+
+    def __init__(self, ttl_seconds: float = 10.0, max_entries: int = 64):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every page, e.g. after this process added or removed blobs"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'ttl_seconds': self.ttl_seconds
+            }
+
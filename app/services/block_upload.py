@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.storage.blob import BlobBlock
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured maximum size"""
+
+
+def _read_block(stream, block_size):
+    # file.read(n) may return less than n bytes before EOF (sockets, request bodies)
+    parts = []
+    remaining = block_size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        parts.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(parts)
+
+
+def upload_stream_in_blocks(blob_client, stream, block_size: int = DEFAULT_BLOCK_SIZE,
+                            max_concurrency: int = 4, max_size: int = None, **commit_kwargs):
+    """Upload a file-like object as a block blob without buffering it whole.
+
+    The stream is read one block at a time and every block is staged concurrently, with at
+    most ``max_concurrency`` blocks in flight, so memory stays at a few blocks whatever the
+    size of the upload. The block list is committed once every block is staged. Returns the
+    number of bytes uploaded.
+    """
+    slots = threading.BoundedSemaphore(max_concurrency)
+    block_ids = []
+    pending = []
+    total = 0
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        try:
+            while True:
+                data = _read_block(stream, block_size)
+                if not data:
+                    break
+                total += len(data)
+                if max_size is not None and total > max_size:
+                    raise UploadTooLargeError(f"Upload exceeds the maximum size of {max_size} bytes")
+
+                # Stop reading ahead until a staging slot frees up
+                slots.acquire()
+                # Block IDs must all have the same length within a blob
+                block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+                block_ids.append(block_id)
+                future = executor.submit(blob_client.stage_block, block_id, data)
+                future.add_done_callback(lambda _: slots.release())
+                pending.append(future)
+
+                # Surface staging failures early instead of reading the rest of the body
+                for done in [f for f in pending if f.done()]:
+                    done.result()
+                    pending.remove(done)
+
+            for future in pending:
+                future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids], **commit_kwargs)
+    return total
+
+
+async def _read_block_async(stream, block_size):
+    parts = []
+    remaining = block_size
+    while remaining > 0:
+        chunk = await stream.read(remaining)
+        if not chunk:
+            break
+        parts.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(parts)
+
+
+async def upload_stream_in_blocks_async(blob_client, stream, block_size: int = DEFAULT_BLOCK_SIZE,
+                                        max_concurrency: int = 4, max_size: int = None, **commit_kwargs):
+    """Async counterpart of upload_stream_in_blocks for the aio blob client.
+
+    ``stream.read`` must be a coroutine (e.g. FastAPI's UploadFile).
+    """
+    slots = asyncio.Semaphore(max_concurrency)
+    block_ids = []
+    pending = set()
+    total = 0
+
+    async def stage(block_id, data):
+        try:
+            await blob_client.stage_block(block_id, data)
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            data = await _read_block_async(stream, block_size)
+            if not data:
+                break
+            total += len(data)
+            if max_size is not None and total > max_size:
+                raise UploadTooLargeError(f"Upload exceeds the maximum size of {max_size} bytes")
+
+            # Stop reading ahead until a staging slot frees up
+            await slots.acquire()
+            # Block IDs must all have the same length within a blob
+            block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+            block_ids.append(block_id)
+            pending.add(asyncio.ensure_future(stage(block_id, data)))
+
+            # Surface staging failures early instead of reading the rest of the body
+            for done in [task for task in pending if task.done()]:
+                pending.discard(done)
+                done.result()
+
+        if pending:
+            await asyncio.gather(*pending)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+
+    await blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids], **commit_kwargs)
+    return total
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from azure.core.exceptions import ResourceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# A blob batch request carries at most 256 sub-requests
+MAX_BATCH_SIZE = 256
+MAX_NAMES = 10000
+
+
+def parse_selection(names=None, prefix=None, older_than=None):
+    """Validate a bulk delete selection: explicit names, or a prefix and/or an age cutoff.
+
+    older_than is an ISO 8601 datetime (UTC unless it carries an offset); blobs last
+    modified before it are selected. Returns (names, prefix, older_than).
+    """
+    if names is not None:
+        if prefix or older_than:
+            raise ValueError('Pass either names or prefix/older_than, not both')
+        if not isinstance(names, list) or not names or not all(isinstance(name, str) and name for name in names):
+            raise ValueError('names must be a non-empty list of blob names')
+        if len(names) > MAX_NAMES:
+            raise ValueError(f"At most {MAX_NAMES} names per request")
+        # Duplicates would be reported twice and fail the second time
+        return list(dict.fromkeys(names)), None, None
+
+    if not prefix and not older_than:
+        raise ValueError('Pass names, prefix or older_than')
+    if older_than is not None and not isinstance(older_than, datetime):
+        try:
+            older_than = datetime.fromisoformat(str(older_than))
+        except ValueError:
+            raise ValueError('older_than must be an ISO 8601 datetime')
+    if older_than is not None and older_than.tzinfo is None:
+        older_than = older_than.replace(tzinfo=timezone.utc)
+    return None, prefix or None, older_than
+
+
+def _selected(blob, older_than):
+    return older_than is None or (blob.last_modified is not None and blob.last_modified < older_than)
+
+
+def select_blobs(container_client, prefix=None, older_than=None):
+    """Names of the blobs under a prefix last modified before older_than, page by page"""
+    for page in container_client.list_blobs(name_starts_with=prefix).by_page():
+        for blob in page:
+            if _selected(blob, older_than):
+                yield blob.name
+
+
+async def select_blobs_async(container_client, prefix=None, older_than=None):
+    """Async counterpart of select_blobs for the aio container client"""
+    async for page in container_client.list_blobs(name_starts_with=prefix).by_page():
+        async for blob in page:
+            if _selected(blob, older_than):
+                yield blob.name
+
+
+def chunked(names, size: int):
+    batch = []
+    for name in names:
+        batch.append(name)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def item_outcome(name, response):
+    """Per-blob outcome of a batch: the Azure sub-response, or None / an exception from the
+    local backends"""
+    if isinstance(response, ResourceNotFoundError):
+        return {'name': name, 'status': 'not_found'}
+    if isinstance(response, Exception):
+        return {'name': name, 'status': 'failed', 'error': str(response)}
+    status_code = getattr(response, 'status_code', None)
+    if response is None or status_code in (200, 202):
+        return {'name': name, 'status': 'deleted'}
+    if status_code == 404:
+        return {'name': name, 'status': 'not_found'}
+    return {'name': name, 'status': 'failed', 'error': f"HTTP {status_code}"}
+
+
+def delete_batch(container_client, names):
+    """Delete up to MAX_BATCH_SIZE blobs with one batch request, returns their outcomes"""
+    try:
+        responses = list(container_client.delete_blobs(*names, raise_on_any_failure=False))
+    except Exception as e:
+        logger.error(f"Error in batch delete of {len(names)} blobs: {str(e)}")
+        return [{'name': name, 'status': 'failed', 'error': str(e)} for name in names]
+    return [item_outcome(name, response) for name, response in zip(names, responses)]
+
+
+async def delete_batch_async(container_client, names):
+    try:
+        responses = await container_client.delete_blobs(*names, raise_on_any_failure=False)
+        if hasattr(responses, '__aiter__'):
+            responses = [response async for response in responses]
+    except Exception as e:
+        logger.error(f"Error in batch delete of {len(names)} blobs: {str(e)}")
+        return [{'name': name, 'status': 'failed', 'error': str(e)} for name in names]
+    return [item_outcome(name, response) for name, response in zip(names, list(responses))]
+
+
+def delete_in_batches(container_client, names, batch_size: int = MAX_BATCH_SIZE,
+                      concurrency: int = 4, dry_run: bool = False):
+    """Delete blobs in batch requests, up to ``concurrency`` at a time.
+
+    ``names`` may be a lazy iterable (e.g. select_blobs), it is consumed as batches are
+    submitted. Yields the list of per-item outcomes of each batch as it completes; a dry
+    run yields the names that would be deleted without touching storage.
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    if dry_run:
+        for batch in chunked(names, batch_size):
+            yield [{'name': name, 'status': 'would_delete'} for name in batch]
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='bulk-delete') as executor:
+        pending = set()
+        for batch in chunked(names, batch_size):
+            pending.add(executor.submit(delete_batch, container_client, batch))
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+async def delete_in_batches_async(container_client, names, batch_size: int = MAX_BATCH_SIZE,
+                                  concurrency: int = 4, dry_run: bool = False):
+    """Async counterpart of delete_in_batches; ``names`` may be an async iterable"""
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+
+    async def batches():
+        batch = []
+        if hasattr(names, '__aiter__'):
+            async for name in names:
+                batch.append(name)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        else:
+            for name in names:
+                batch.append(name)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    if dry_run:
+        async for batch in batches():
+            yield [{'name': name, 'status': 'would_delete'} for name in batch]
+        return
+
+    pending = set()
+    try:
+        async for batch in batches():
+            pending.add(asyncio.ensure_future(delete_batch_async(container_client, batch)))
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        for task in asyncio.as_completed(pending):
+            yield await task
+        pending = set()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def summarize(outcomes, summary=None):
+    """Add per-status counts of outcomes to a running summary dict"""
+    summary = summary if summary is not None else {}
+    summary['batches'] = summary.get('batches', 0) + 1
+    for outcome in outcomes:
+        summary[outcome['status']] = summary.get(outcome['status'], 0) + 1
+    return summary
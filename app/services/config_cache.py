@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotModifiedError
+
+logger = logging.getLogger(__name__)
+
+
+class CachedConfigBlob:
+    """In-memory copy of a small config blob, revalidated by ETag once the TTL expires.
+
+    One thread at a time goes back to storage; the others keep getting the previous
+    value meanwhile (only the very first load is waited for).
+    """
+
+    def __init__(self, blob_client, parser, ttl_seconds: float = 30.0):
+        self.blob_client = blob_client
+        self.parser = parser
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._loaded_cond = threading.Condition(self._lock)
+        self._refreshing = False
+        self._value = None
+        self._etag = None
+        self._loaded = False
+        self._checked_at = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.reloads = 0
+
+    def get(self):
+        """Return the parsed value, touching storage only when the TTL has expired"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self._loaded and (self._refreshing or now - self._checked_at < self.ttl_seconds):
+                    # Fresh, or another thread is refreshing it: serve what we have
+                    self.hits += 1
+                    return self._value
+                if not self._refreshing:
+                    self._refreshing = True
+                    self.misses += 1
+                    kwargs = {}
+                    if self._loaded and self._etag:
+                        kwargs = {'etag': self._etag, 'match_condition': MatchConditions.IfModified}
+                    break
+                # Nothing loaded yet and another thread is loading it
+                self._loaded_cond.wait()
+
+        try:
+            return self._refresh(now, kwargs)
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._loaded_cond.notify_all()
+
+    def prime(self, content: str, etag=None):
+        """Write-through: replace the cached value after this process uploaded new content"""
+        value = self.parser(content)
+        with self._lock:
+            self._value = value
+            self._etag = etag
+            self._loaded = True
+            self._checked_at = time.monotonic()
+            self._loaded_cond.notify_all()
+        return value
+
+    def invalidate(self):
+        """Force the next read to go back to storage"""
+        with self._lock:
+            self._loaded = False
+            self._etag = None
+
+    def stats(self):
+        with self._lock:
+            age = time.monotonic() - self._checked_at if self._loaded else None
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'reloads': self.reloads,
+                'etag': self._etag,
+                'age_seconds': round(age, 3) if age is not None else None,
+                'ttl_seconds': self.ttl_seconds
+            }
+
+    def _refresh(self, now, kwargs):
+        """Download (or revalidate) and parse outside the lock, returns the current value"""
+        try:
+            downloader = self.blob_client.download_blob(**kwargs)
+        except ResourceNotModifiedError:
+            # Content unchanged since the last read: keep the parsed value
+            with self._lock:
+                self.revalidations += 1
+                self._checked_at = max(self._checked_at, now)
+                return self._value
+
+        content = downloader.readall().decode('utf-8')
+        value = self.parser(content)
+        etag = downloader.properties.etag
+        with self._lock:
+            # A prime() since the download started holds newer content
+            if self._checked_at <= now:
+                self._value = value
+                self._etag = etag
+                self._loaded = True
+                self._checked_at = now
+                self.reloads += 1
+            value = self._value
+        logger.info(f"Reloaded config blob {self.blob_client.blob_name} (etag {etag})")
+        return value
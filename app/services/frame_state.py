@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Fingerprints average the ROI over a grid of square cells, FINGERPRINT_ROWS high: a cell
+# is about a stroke wide for a single line of text, so one changed character moves whole
+# cells instead of a sliver of a global average
+FINGERPRINT_ROWS = 16
+MAX_FINGERPRINT_CELLS = 4096
+
+
+def roi_fingerprint(gray_roi):
+    """Area-averaged grid of a grayscale ROI, comparable across frames"""
+    height, width = gray_roi.shape[:2]
+    rows = min(FINGERPRINT_ROWS, height)
+    columns = max(1, min(round(width * rows / height), MAX_FINGERPRINT_CELLS // rows))
+    return cv2.resize(gray_roi, (columns, rows), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def fingerprint_difference(previous, fingerprint):
+    """Largest change of any cell (0-255 scale) once the overall brightness shift is removed"""
+    if previous.shape != fingerprint.shape:
+        return float('inf')
+    difference = fingerprint - previous
+    return float(np.max(np.abs(difference - np.median(difference))))
+
+
+def is_blank(gray_roi, max_stddev: float):
+    """True for a ROI with no contrast to read (uniform background, lens cap, empty field)"""
+    return float(cv2.meanStdDev(gray_roi)[1][0][0]) <= max_stddev
+
+
+class FrameState:
+    """Fingerprint and text of every ROI the last time it was OCRed, for one station and layout"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rois = {}
+
+    def get(self, index):
+        with self._lock:
+            return self._rois.get(index)
+
+    def put(self, index, roi, fingerprint, text):
+        with self._lock:
+            self._rois[index] = (dict(roi), fingerprint, text)
+
+
+class FrameStateCache:
+    """Skips tesseract for ROIs that did not change since the previous frame of a station.
+
+    A ROI is reused when no cell of its fingerprint moved by more than ``change_threshold``
+    (0-255 scale, after compensating a global brightness change) since it was last OCRed,
+    so a single changed digit is enough to OCR it again. The stored fingerprint only moves
+    when OCR runs again, so slow drift cannot accumulate into stale text. Blank ROIs are
+    answered with empty text without OCR.
+    """
+
+    def __init__(self, change_threshold: float = 24.0, blank_stddev: float = 2.0, max_entries: int = 1024):
+        self.change_threshold = change_threshold
+        self.blank_stddev = blank_stddev
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._states = OrderedDict()
+
+        self.unchanged = 0
+        self.blank = 0
+        self.recognized = 0
+
+    def state(self, key):
+        """State of one (station, layout) pair, created on first use"""
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = FrameState()
+                while len(self._states) > self.max_entries:
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(key)
+            return state
+
+    def triage(self, state: FrameState, frame, rois):
+        """Split (index, roi) pairs into those needing OCR and reused results.
+
+        A stored text is only reused for the same coordinates and hints. Returns (pending,
+        reused, fingerprints); fingerprints of pending ROIs are handed back to ``remember``
+        once their text is known.
+        """
+        pending = []
+        reused = []
+        fingerprints = {}
+        for index, roi in rois:
+            coords = roi['coordinates']
+            gray = frame.gray_roi(coords)
+            if gray is None or gray.size == 0:
+                pending.append((index, roi))
+                continue
+
+            if self.blank_stddev >= 0 and is_blank(gray, self.blank_stddev):
+                reused.append({'roi_index': index + 1, 'coordinates': coords, 'text': '', 'skipped': 'blank'})
+                continue
+
+            fingerprint = roi_fingerprint(gray)
+            previous = state.get(index) if self.change_threshold >= 0 else None
+            if (previous is not None and previous[0] == roi
+                    and fingerprint_difference(previous[1], fingerprint) <= self.change_threshold):
+                reused.append({'roi_index': index + 1, 'coordinates': coords, 'text': previous[2], 'skipped': 'unchanged'})
+                continue
+
+            pending.append((index, roi))
+            fingerprints[index] = (roi, fingerprint)
+
+        with self._lock:
+            self.blank += sum(1 for result in reused if result['skipped'] == 'blank')
+            self.unchanged += sum(1 for result in reused if result['skipped'] == 'unchanged')
+            self.recognized += len(pending)
+        return pending, reused, fingerprints
+
+    def remember(self, state: FrameState, fingerprints, results):
+        for result in results:
+            index = result['roi_index'] - 1
+            # A failed recognition must not be served again for the next frames
+            if index in fingerprints and not result.get('error'):
+                roi, fingerprint = fingerprints[index]
+                state.put(index, roi, fingerprint, result['text'])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'states': len(self._states),
+                'recognized': self.recognized,
+                'skipped_unchanged': self.unchanged,
+                'skipped_blank': self.blank,
+                'change_threshold': self.change_threshold,
+                'blank_stddev': self.blank_stddev
+            }
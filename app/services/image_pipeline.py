@@ -0,0 +1,164 @@
+import io
+import math
+
+from PIL import Image
+
+PIPELINE_OPERATIONS = ('crop', 'grayscale', 'resize', 'threshold', 'rotate')
+MAX_OPERATIONS = 20
+MAX_DIMENSION = 10000
+
+
+def _int(operation, key, default=None, minimum=None, maximum=None):
+    value = operation.get(key, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ValueError(f"{operation['op']}.{key} must be an integer")
+    value = int(value)
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ValueError(f"{operation['op']}.{key} must be between {minimum} and {maximum}")
+    return value
+
+
+def parse_operations(operations):
+    """Validate an ordered list of pipeline operations, returns them normalized.
+
+    crop: left, top, right, bottom (pixels of the image at that step)
+    grayscale
+    resize: width and/or height (the other keeps the aspect ratio)
+    threshold: value (0-255, default 128), output is black and white
+    rotate: angle in degrees counter-clockwise, expand (default true) grows the canvas
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise ValueError(f"At most {MAX_OPERATIONS} operations are allowed")
+
+    parsed = []
+    for operation in operations:
+        if isinstance(operation, str):
+            operation = {'op': operation}
+        if not isinstance(operation, dict) or operation.get('op') not in PIPELINE_OPERATIONS:
+            raise ValueError(f"Unknown operation {operation}, expected one of {', '.join(PIPELINE_OPERATIONS)}")
+
+        op = operation['op']
+        if op == 'crop':
+            box = [_int(operation, key, minimum=0) for key in ('left', 'top', 'right', 'bottom')]
+            if None in box:
+                raise ValueError('crop needs left, top, right and bottom')
+            if box[2] <= box[0] or box[3] <= box[1]:
+                raise ValueError('crop box is empty')
+            parsed.append({'op': op, 'box': box})
+        elif op == 'resize':
+            width = _int(operation, 'width', minimum=1, maximum=MAX_DIMENSION)
+            height = _int(operation, 'height', minimum=1, maximum=MAX_DIMENSION)
+            if width is None and height is None:
+                raise ValueError('resize needs width or height')
+            parsed.append({'op': op, 'width': width, 'height': height})
+        elif op == 'threshold':
+            parsed.append({'op': op, 'value': _int(operation, 'value', 128, 0, 255)})
+        elif op == 'rotate':
+            angle = operation.get('angle', 0)
+            if isinstance(angle, bool) or not isinstance(angle, (int, float)):
+                raise ValueError('rotate.angle must be a number')
+            parsed.append({'op': op, 'angle': float(angle) % 360, 'expand': bool(operation.get('expand', True))})
+        else:
+            parsed.append({'op': op})
+    return parsed
+
+
+def _resize_target(size, operation):
+    width, height = operation['width'], operation['height']
+    if width is None:
+        width = max(1, round(size[0] * height / size[1]))
+    if height is None:
+        height = max(1, round(size[1] * width / size[0]))
+    return width, height
+
+
+def _draft_factor(size, operations):
+    """Downscale the pipeline applies before anything needs full detail, 1.0 if none.
+
+    Only geometry-only steps (crop, grayscale, right-angle rotation) may precede the
+    first resize, so decoding at a reduced scale cannot change the result beyond
+    resampling.
+    """
+    width, height = size
+    for operation in operations:
+        op = operation['op']
+        if op == 'crop':
+            left, top, right, bottom = operation['box']
+            width, height = min(right, width) - min(left, width), min(bottom, height) - min(top, height)
+            if width <= 0 or height <= 0:
+                return 1.0
+        elif op == 'rotate':
+            if operation['angle'] % 90:
+                return 1.0
+            if operation['angle'] % 180:
+                width, height = height, width
+        elif op == 'resize':
+            target_width, target_height = _resize_target((width, height), operation)
+            return min(1.0, max(target_width / width, target_height / height))
+        elif op != 'grayscale':
+            return 1.0
+    return 1.0
+
+
+def _wants_grayscale(operations):
+    return any(operation['op'] in ('grayscale', 'threshold') for operation in operations)
+
+
+def run_pipeline(content: bytes, operations):
+    """Decode once, apply the operations in order and encode once.
+
+    JPEG sources are decoded at a reduced DCT scale (draft mode) when the pipeline
+    shrinks the image anyway, and straight to luminance when the output is grayscale.
+    Returns (encoded bytes, format, (width, height)).
+    """
+    image = Image.open(io.BytesIO(content))
+    source_format = image.format
+    original_size = image.size
+
+    scale = 1.0
+    if source_format == 'JPEG':
+        factor = _draft_factor(original_size, operations)
+        mode = 'L' if _wants_grayscale(operations) else image.mode
+        requested = (max(1, math.ceil(original_size[0] * factor)), max(1, math.ceil(original_size[1] * factor)))
+        image.draft(mode, requested)
+        scale = image.size[0] / original_size[0]
+
+    resized = False
+    for operation in operations:
+        op = operation['op']
+        if op == 'crop':
+            box = operation['box']
+            if not resized and scale != 1.0:
+                # Crops before the first resize are given in source pixels
+                box = [round(value * scale) for value in box]
+            image = image.crop(box)
+        elif op == 'grayscale':
+            if image.mode != 'L':
+                image = image.convert('L')
+        elif op == 'resize':
+            image = image.resize(_resize_target(image.size, operation), Image.LANCZOS)
+            resized = True
+        elif op == 'threshold':
+            value = operation['value']
+            image = image.convert('L').point(lambda pixel: 255 if pixel > value else 0)
+        elif op == 'rotate':
+            angle = operation['angle']
+            if angle == 90:
+                image = image.transpose(Image.ROTATE_90)
+            elif angle == 180:
+                image = image.transpose(Image.ROTATE_180)
+            elif angle == 270:
+                image = image.transpose(Image.ROTATE_270)
+            elif angle:
+                image = image.rotate(angle, resample=Image.BICUBIC, expand=operation['expand'])
+
+    output_format = source_format or 'PNG'
+    if output_format == 'JPEG' and image.mode not in ('L', 'RGB', 'CMYK'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=output_format)
+    return buffer.getvalue(), output_format, image.size
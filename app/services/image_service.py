@@ -1,27 +1,100 @@
-from azure.storage.blob import BlobServiceClient
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob.aio import BlobServiceClient
+from fastapi.concurrency import run_in_threadpool
 from PIL import Image
+import aiohttp
 import io
 import uuid
 from datetime import datetime
 from ..core.config import settings
+from ..core.metrics import image_bytes, stage_seconds, storage_transfer_bytes
+from .blob_listing import PageCache, list_blob_page_async
+from .block_upload import upload_stream_in_blocks_async
+from .bulk_delete import delete_in_batches_async, select_blobs_async
+from .image_pipeline import run_pipeline
+from .storage import AsyncContainerAdapter, DiskCache, create_storage
+
+
+def _encode(image, format):
+    """Mã hóa ảnh PIL thành bytes"""
+    img_byte_arr = io.BytesIO()
+    image.save(img_byte_arr, format=format)
+    return img_byte_arr.getvalue()
+
+
+def _grayscale(file_content: bytes):
+    """Giải mã, chuyển sang ảnh xám và mã hóa lại (chạy trong thread pool)"""
+    image = Image.open(io.BytesIO(file_content))
+    return _encode(image.convert('L'), image.format)
+
+
+def _crop(file_content: bytes, left: int, top: int, right: int, bottom: int):
+    """Giải mã, cắt ảnh và mã hóa lại (chạy trong thread pool)"""
+    image = Image.open(io.BytesIO(file_content))
+    return _encode(image.crop((left, top, right, bottom)), image.format)
+
 
 class ImageService:
     def __init__(self):
         self.connection_string = settings.AZURE_STORAGE_CONNECTION_STRING
         self.container_name = settings.AZURE_STORAGE_CONTAINER_NAME
-        self.blob_service_client = BlobServiceClient.from_connection_string(self.connection_string)
+        self.page_cache = PageCache(ttl_seconds=settings.IMAGE_LIST_CACHE_TTL_SECONDS)
+        self.session = None
+        self.blob_service_client = None
+        self.container_client = None
+
+    async def start(self):
+        """Tạo HTTP session dùng chung (connection pool) và async blob client, gọi một lần khi app khởi động"""
+        if settings.STORAGE_BACKEND != 'azure':
+            # Backend cục bộ là đồng bộ, được bọc để chạy trong thread pool
+            storage = create_storage(settings.STORAGE_BACKEND, root=settings.LOCAL_STORAGE_ROOT)
+            container_client = storage.get_container_client(self.container_name)
+            if settings.STORAGE_CACHE_DIR:
+                container_client = DiskCache(
+                    settings.STORAGE_CACHE_DIR,
+                    max_bytes=settings.STORAGE_CACHE_MAX_BYTES,
+                    ttl_seconds=settings.STORAGE_CACHE_TTL_SECONDS,
+                    max_object_bytes=settings.STORAGE_CACHE_MAX_OBJECT_BYTES
+                ).wrap(container_client)
+            self.container_client = AsyncContainerAdapter(container_client)
+            return
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=settings.AZURE_HTTP_POOL_SIZE)
+        )
+        transport = AioHttpTransport(session=self.session, session_owner=False)
+        self.blob_service_client = BlobServiceClient.from_connection_string(
+            self.connection_string, transport=transport
+        )
         self.container_client = self.blob_service_client.get_container_client(self.container_name)
 
-    async def upload_image(self, file_content: bytes, filename: str):
-        """Upload ảnh lên Azure Blob Storage"""
+    async def close(self):
+        """Đóng blob client và HTTP session khi app dừng"""
+        if self.blob_service_client is not None:
+            await self.blob_service_client.close()
+        if self.session is not None:
+            await self.session.close()
+
+    async def upload_image(self, file, filename: str):
+        """Upload ảnh lên Azure Blob Storage (đọc từng block từ file, không nạp cả file vào bộ nhớ)"""
         # Tạo tên file duy nhất
         extension = filename.split('.')[-1]
         unique_filename = f"{uuid.uuid4()}.{extension}"
-        
-        # Upload file
+
+        # Upload file theo từng block
         blob_client = self.container_client.get_blob_client(unique_filename)
-        blob_client.upload_blob(file_content)
-        
+        with stage_seconds.time(stage='upload'):
+            uploaded_bytes = await upload_stream_in_blocks_async(
+                blob_client,
+                file,
+                block_size=settings.UPLOAD_BLOCK_SIZE,
+                max_concurrency=settings.UPLOAD_MAX_CONCURRENCY,
+                max_size=settings.UPLOAD_MAX_BYTES
+            )
+        self.page_cache.clear()
+        image_bytes.observe(uploaded_bytes, endpoint='upload')
+        storage_transfer_bytes.observe(uploaded_bytes, operation='image_upload')
+
         return {
             "filename": unique_filename,
             "url": blob_client.url,
@@ -31,8 +104,8 @@ class ImageService:
     async def get_image_info(self, filename: str):
         """Lấy thông tin của ảnh"""
         blob_client = self.container_client.get_blob_client(filename)
-        properties = blob_client.get_blob_properties()
-        
+        properties = await blob_client.get_blob_properties()
+
         return {
             "filename": filename,
             "url": blob_client.url,
@@ -44,37 +117,58 @@ class ImageService:
     async def delete_image(self, filename: str):
         """Xóa ảnh từ storage"""
         blob_client = self.container_client.get_blob_client(filename)
-        blob_client.delete_blob()
+        with stage_seconds.time(stage='delete'):
+            await blob_client.delete_blob()
+        self.page_cache.clear()
+
+    async def bulk_delete(self, names=None, prefix: str = None, older_than: datetime = None, dry_run: bool = False):
+        """Xóa nhiều ảnh bằng batch request, trả về từng batch kết quả (name, status) khi hoàn tất"""
+        selected = names if names is not None else select_blobs_async(self.container_client, prefix, older_than)
+        try:
+            async for outcomes in delete_in_batches_async(
+                self.container_client,
+                selected,
+                batch_size=settings.BULK_DELETE_BATCH_SIZE,
+                concurrency=max(1, settings.BULK_DELETE_CONCURRENCY),
+                dry_run=dry_run
+            ):
+                yield outcomes
+        finally:
+            if not dry_run:
+                self.page_cache.clear()
 
-    async def list_images(self):
-        """Lấy danh sách tất cả các ảnh"""
-        blobs = self.container_client.list_blobs()
-        return [{
-            "filename": blob.name,
-            "size": blob.size,
-            "created_at": blob.creation_time.isoformat()
-        } for blob in blobs]
+    async def list_images(self, prefix: str = None, limit: int = 1000, continuation_token: str = None):
+        """Lấy một trang danh sách ảnh, trả về (danh sách ảnh, token của trang tiếp theo)"""
+        cache_key = (prefix, limit, continuation_token)
+        page = self.page_cache.get(cache_key)
+        if page is None:
+            with stage_seconds.time(stage='list'):
+                blobs, next_token = await list_blob_page_async(self.container_client, prefix, limit, continuation_token)
+            page = ([{
+                "filename": blob.name,
+                "size": blob.size,
+                "created_at": blob.creation_time.isoformat()
+            } for blob in blobs], next_token)
+            self.page_cache.put(cache_key, page)
+        return page
 
     async def convert_to_grayscale(self, file_content: bytes, filename: str):
         """Chuyển ảnh sang ảnh xám"""
-        # Đọc ảnh từ bytes
-        image = Image.open(io.BytesIO(file_content))
-        
-        # Chuyển sang ảnh xám
-        gray_image = image.convert('L')
-        
-        # Chuyển ảnh xám thành bytes
-        img_byte_arr = io.BytesIO()
-        gray_image.save(img_byte_arr, format=image.format)
-        img_byte_arr = img_byte_arr.getvalue()
-        
+        # Giải mã / mã hóa PIL tốn CPU nên chạy ngoài event loop
+        image_bytes.observe(len(file_content), endpoint='grayscale')
+        with stage_seconds.time(stage='grayscale'):
+            img_byte_arr = await run_in_threadpool(_grayscale, file_content)
+
         # Upload ảnh xám
         extension = filename.split('.')[-1]
         gray_filename = f"gray_{uuid.uuid4()}.{extension}"
-        
+
         blob_client = self.container_client.get_blob_client(gray_filename)
-        blob_client.upload_blob(img_byte_arr)
-        
+        with stage_seconds.time(stage='upload'):
+            await blob_client.upload_blob(img_byte_arr)
+        self.page_cache.clear()
+        storage_transfer_bytes.observe(len(img_byte_arr), operation='processed_upload')
+
         return {
             "filename": gray_filename,
             "url": blob_client.url,
@@ -83,26 +177,47 @@ class ImageService:
 
     async def crop_image(self, file_content: bytes, filename: str, left: int, top: int, right: int, bottom: int):
         """Cắt ảnh theo tọa độ"""
-        # Đọc ảnh từ bytes
-        image = Image.open(io.BytesIO(file_content))
-        
-        # Cắt ảnh
-        cropped_image = image.crop((left, top, right, bottom))
-        
-        # Chuyển ảnh đã cắt thành bytes
-        img_byte_arr = io.BytesIO()
-        cropped_image.save(img_byte_arr, format=image.format)
-        img_byte_arr = img_byte_arr.getvalue()
-        
+        # Giải mã / mã hóa PIL tốn CPU nên chạy ngoài event loop
+        image_bytes.observe(len(file_content), endpoint='crop')
+        with stage_seconds.time(stage='crop'):
+            img_byte_arr = await run_in_threadpool(_crop, file_content, left, top, right, bottom)
+
         # Upload ảnh đã cắt
         extension = filename.split('.')[-1]
         cropped_filename = f"cropped_{uuid.uuid4()}.{extension}"
-        
+
         blob_client = self.container_client.get_blob_client(cropped_filename)
-        blob_client.upload_blob(img_byte_arr)
-        
+        with stage_seconds.time(stage='upload'):
+            await blob_client.upload_blob(img_byte_arr)
+        self.page_cache.clear()
+        storage_transfer_bytes.observe(len(img_byte_arr), operation='processed_upload')
+
         return {
             "filename": cropped_filename,
             "url": blob_client.url,
             "processed_at": datetime.utcnow().isoformat()
-        } 
\ No newline at end of file
+        }
+
+    async def process_pipeline(self, file_content: bytes, filename: str, operations):
+        """Áp dụng chuỗi thao tác với một lần giải mã / mã hóa, chỉ upload ảnh kết quả"""
+        image_bytes.observe(len(file_content), endpoint='pipeline')
+        with stage_seconds.time(stage='pipeline'):
+            img_byte_arr, _, (width, height) = await run_in_threadpool(run_pipeline, file_content, operations)
+
+        extension = filename.split('.')[-1]
+        processed_filename = f"processed_{uuid.uuid4()}.{extension}"
+
+        blob_client = self.container_client.get_blob_client(processed_filename)
+        with stage_seconds.time(stage='upload'):
+            await blob_client.upload_blob(img_byte_arr)
+        self.page_cache.clear()
+        storage_transfer_bytes.observe(len(img_byte_arr), operation='processed_upload')
+
+        return {
+            "filename": processed_filename,
+            "url": blob_client.url,
+            "width": width,
+            "height": height,
+            "operations": len(operations),
+            "processed_at": datetime.utcnow().isoformat()
+        }
@@ -0,0 +1,170 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    def __init__(self, payload):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self._enqueued = time.monotonic()
+        self.wait_seconds = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'submitted_at': self.submitted_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'wait_seconds': round(self.wait_seconds, 3) if self.wait_seconds is not None else None,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class JobQueue:
+    """Bounded in-process job queue drained by a fixed set of worker threads.
+
+    ``handler(job_id, payload)`` does the work and returns the job result. It and the
+    optional ``on_status(job)`` hook, called by the worker when a job starts and finishes,
+    are the only things that touch storage, so the queue runs unchanged against a local
+    stand-in.
+    """
+
+    def __init__(self, handler, workers: int = 2, max_queue: int = 100, max_finished: int = 1000,
+                 on_status=None):
+        self.handler = handler
+        self.on_status = on_status
+        self.max_finished = max_finished
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.running = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"ocr-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, payload):
+        job = Job(payload)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFullError(f"Job queue is full ({self._queue.maxsize} jobs)")
+            self._jobs[job.id] = job
+            self.submitted += 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self.failed + self.running
+            return {
+                'depth': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'workers': len(self._threads),
+                'running': self.running,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'avg_wait_seconds': round(self._wait_total / started, 3) if started else 0.0,
+                'max_wait_seconds': round(self._wait_max, 3),
+                'oldest_queued_seconds': self._oldest_queued_seconds()
+            }
+
+    def shutdown(self, timeout: float = None):
+        """Stop the workers once the jobs already queued have been processed"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _notify(self, job):
+        if self.on_status is None:
+            return
+        try:
+            self.on_status(job)
+        except Exception as e:
+            logger.error(f"Error recording status of OCR job {job.id}: {str(e)}")
+
+    def _oldest_queued_seconds(self):
+        now = time.monotonic()
+        for job in self._jobs.values():
+            if job.status == 'queued':
+                return round(now - job._enqueued, 3)
+        return 0.0
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            with self._lock:
+                job.status = 'running'
+                job.started_at = datetime.utcnow()
+                job.wait_seconds = time.monotonic() - job._enqueued
+                self._wait_total += job.wait_seconds
+                self._wait_max = max(self._wait_max, job.wait_seconds)
+                self.running += 1
+            self._notify(job)
+
+            try:
+                result = self.handler(job.id, job.payload)
+                status, error = 'succeeded', None
+            except Exception as e:
+                logger.error(f"Error in OCR job {job.id}: {str(e)}")
+                result, status, error = None, 'failed', str(e)
+
+            with self._lock:
+                job.result = result
+                job.error = error
+                job.status = status
+                job.finished_at = datetime.utcnow()
+                # The payload (image bytes) is no longer needed once the job ran
+                job.payload = None
+                self.running -= 1
+                if status == 'succeeded':
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._evict_finished()
+            self._notify(job)
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.status in ('succeeded', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
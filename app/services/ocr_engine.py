@@ -0,0 +1,206 @@
+import logging
+import os
+import queue
+import shlex
+import threading
+from contextlib import contextmanager
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:  # tesserocr needs libtesseract headers at install time, it stays optional
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANG = 'vie+eng'
+
+
+def tesseract_config(psm=None, whitelist=None):
+    """Command line options of the tesseract binary for a page segmentation mode and whitelist"""
+    options = []
+    if psm is not None:
+        options.append(f"--psm {int(psm)}")
+    if whitelist:
+        options.append(f"-c tessedit_char_whitelist={shlex.quote(whitelist)}")
+    return ' '.join(options)
+
+
+class PytesseractEngine:
+    """OCR through pytesseract: spawns the tesseract binary for every call"""
+
+    name = 'pytesseract'
+
+    def image_to_string(self, image, lang: str = DEFAULT_LANG, psm=None, whitelist=None):
+        return pytesseract.image_to_string(image, lang=lang, config=tesseract_config(psm, whitelist))
+
+    def image_to_data(self, image, lang: str = DEFAULT_LANG, psm=None, whitelist=None):
+        return pytesseract.image_to_data(
+            image, lang=lang, config=tesseract_config(psm, whitelist), output_type=pytesseract.Output.DICT
+        )
+
+    def stats(self):
+        return {'engine': self.name}
+
+
+class TesserocrEngine:
+    """OCR through persistent in-process Tesseract API handles.
+
+    Handles are created lazily per language, up to ``pool_size`` each, and reused across
+    ROIs and requests so the traineddata is only loaded once per handle.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, pool_size: int, tessdata_path=None):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.pool_size = pool_size
+        self.tessdata_path = tessdata_path
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._created = {}
+
+    def warm_up(self, lang: str = DEFAULT_LANG):
+        """Initialize one handle up front so a broken install fails at startup"""
+        with self._acquire(lang):
+            pass
+
+    def image_to_string(self, image, lang: str = DEFAULT_LANG, psm=None, whitelist=None):
+        with self._acquire(lang) as api, self._options(api, psm, whitelist):
+            try:
+                api.SetImage(image)
+                return api.GetUTF8Text()
+            finally:
+                api.Clear()
+
+    def image_to_data(self, image, lang: str = DEFAULT_LANG, psm=None, whitelist=None):
+        """Word boxes in the same dict layout as pytesseract.image_to_data"""
+        data = {key: [] for key in ('text', 'conf', 'left', 'top', 'width', 'height',
+                                     'block_num', 'par_num', 'line_num', 'word_num')}
+        with self._acquire(lang) as api, self._options(api, psm, whitelist):
+            try:
+                api.SetImage(image)
+                api.Recognize()
+                iterator = api.GetIterator()
+                if iterator is None:
+                    return data
+
+                block_num = par_num = line_num = word_num = 0
+                level = tesserocr.RIL.WORD
+                for word in tesserocr.iterate_level(iterator, level):
+                    if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                        block_num += 1
+                        par_num = 0
+                    if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+                        par_num += 1
+                        line_num = 0
+                    if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                        line_num += 1
+                        word_num = 0
+                    word_num += 1
+
+                    box = word.BoundingBox(level)
+                    text = word.GetUTF8Text(level)
+                    if box is None or text is None:
+                        continue
+                    x1, y1, x2, y2 = box
+                    data['text'].append(text)
+                    data['conf'].append(word.Confidence(level))
+                    data['left'].append(x1)
+                    data['top'].append(y1)
+                    data['width'].append(x2 - x1)
+                    data['height'].append(y2 - y1)
+                    data['block_num'].append(block_num)
+                    data['par_num'].append(par_num)
+                    data['line_num'].append(line_num)
+                    data['word_num'].append(word_num)
+                return data
+            finally:
+                api.Clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'engine': self.name,
+                'pool_size': self.pool_size,
+                'handles': dict(self._created),
+                'idle': {lang: pool.qsize() for lang, pool in self._pools.items()}
+            }
+
+    @contextmanager
+    def _options(self, api, psm, whitelist):
+        """Apply per-call options to a pooled handle and restore its defaults afterwards"""
+        default_psm = api.GetPageSegMode()
+        if psm is not None:
+            api.SetPageSegMode(int(psm))
+        if whitelist:
+            api.SetVariable('tessedit_char_whitelist', whitelist)
+        try:
+            yield
+        finally:
+            if psm is not None:
+                api.SetPageSegMode(default_psm)
+            if whitelist:
+                api.SetVariable('tessedit_char_whitelist', '')
+
+    @contextmanager
+    def _acquire(self, lang):
+        pool = self._get_pool(lang)
+        try:
+            api = pool.get_nowait()
+        except queue.Empty:
+            api = self._create_handle(lang)
+            if api is None:
+                # Pool for this language is full: wait for a handle to be released
+                api = pool.get()
+        try:
+            yield api
+        finally:
+            pool.put(api)
+
+    def _get_pool(self, lang):
+        with self._lock:
+            if lang not in self._pools:
+                self._pools[lang] = queue.LifoQueue()
+                self._created[lang] = 0
+            return self._pools[lang]
+
+    def _create_handle(self, lang):
+        with self._lock:
+            if self._created[lang] >= self.pool_size:
+                return None
+            self._created[lang] += 1
+        try:
+            kwargs = {'lang': lang}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+        except Exception:
+            with self._lock:
+                self._created[lang] -= 1
+            raise
+        logger.info(f"Initialized Tesseract handle for '{lang}'")
+        return api
+
+
+def create_engine(name: str = 'auto', pool_size: int = 1):
+    """Build the OCR engine selected by name ('auto', 'tesserocr' or 'pytesseract').
+
+    'auto' prefers the persistent tesserocr backend and falls back to pytesseract when it
+    is not installed or cannot load the traineddata.
+    """
+    if name not in ('auto', 'tesserocr', 'pytesseract'):
+        raise ValueError(f"Unknown OCR engine: {name}")
+
+    if name == 'pytesseract' or (name == 'auto' and tesserocr is None):
+        return PytesseractEngine()
+
+    try:
+        engine = TesserocrEngine(pool_size, tessdata_path=os.getenv('TESSDATA_PREFIX'))
+        engine.warm_up()
+        return engine
+    except Exception as e:
+        logger.warning(f"Falling back to pytesseract, tesserocr unavailable: {str(e)}")
+        return PytesseractEngine()
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+def pack_rois(rois, gap: int = 32, margin: int = 10, background: int = 255):
+    """Stack preprocessed grayscale ROIs vertically on one canvas separated by blank bands.
+
+    Returns the canvas and the list of (top, bottom) row bands occupied by each ROI, in
+    the same order as ``rois``.
+    """
+    width = max(roi.shape[1] for roi in rois) + 2 * margin
+    height = sum(roi.shape[0] for roi in rois) + gap * (len(rois) - 1) + 2 * margin
+    canvas = np.full((height, width), background, dtype=np.uint8)
+
+    bands = []
+    top = margin
+    for roi in rois:
+        bottom = top + roi.shape[0]
+        canvas[top:bottom, margin:margin + roi.shape[1]] = roi
+        bands.append((top, bottom))
+        top = bottom + gap
+
+    return canvas, bands
+
+
+def split_words_by_band(data, bands):
+    """Map the words of a pytesseract ``image_to_data`` dict back to the band they fall in.
+
+    Words are assigned by the vertical centre of their bounding box. Within a band, words
+    of the same tesseract line are joined by spaces and lines by newlines, which matches
+    what ``image_to_string`` returns for the ROI on its own.
+    """
+    lines = [[] for _ in bands]
+    last_line_key = [None] * len(bands)
+
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        if not word or float(data['conf'][i]) < 0:
+            continue
+
+        center = data['top'][i] + data['height'][i] / 2
+        band_index = _find_band(bands, center)
+        if band_index is None:
+            continue
+
+        line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if line_key != last_line_key[band_index]:
+            lines[band_index].append([])
+            last_line_key[band_index] = line_key
+        lines[band_index][-1].append(word)
+
+    return ['\n'.join(' '.join(words) for words in band_lines) for band_lines in lines]
+
+
+def _find_band(bands, y):
+    # Bands are sorted top to bottom; a centre in a gap goes to the nearest band
+    best_index = None
+    best_distance = None
+    for index, (top, bottom) in enumerate(bands):
+        if top <= y < bottom:
+            return index
+        distance = top - y if y < top else y - bottom
+        if best_distance is None or distance < best_distance:
+            best_index = index
+            best_distance = distance
+    return best_index
@@ -0,0 +1,188 @@
+import logging
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .ocr_engine import DEFAULT_LANG
+from .ocr_packing import pack_rois, split_words_by_band
+from .preprocessing import THRESHOLD_SCOPES, PreprocessedFrame
+from .roi_layout import ocr_options
+
+logger = logging.getLogger(__name__)
+
+# 'per_roi' runs tesseract once per ROI, 'packed' runs it once per image on a canvas
+# holding all ROIs
+OCR_MODES = ('per_roi', 'packed')
+
+
+def elapsed_ms(start):
+    """Milliseconds elapsed since a time.perf_counter() reading"""
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+class OcrPipeline:
+    """Decode, preprocess and OCR the ROIs of a frame.
+
+    Shared by the Flask OCR API and the FastAPI OCR sessions: ``engine`` is an OCR engine
+    from create_engine, per-ROI tesseract calls run on ``executor``. With ``frame_states``
+    ROIs that did not change since the previous frame of a station are answered from its
+    frame state.
+    """
+
+    def __init__(self, engine, executor, threshold_scope: str = 'image', text_height=None, frame_states=None):
+        if threshold_scope not in THRESHOLD_SCOPES:
+            raise ValueError(f"Invalid threshold scope: {threshold_scope}")
+        self.engine = engine
+        self.executor = executor
+        self.threshold_scope = threshold_scope
+        self.text_height = text_height
+        self.frame_states = frame_states
+
+    def recognize_text(self, processed_image, lang=DEFAULT_LANG, psm=None, whitelist=None):
+        """Run Tesseract OCR on an already preprocessed image"""
+        try:
+            # Convert numpy array to PIL Image
+            pil_image = Image.fromarray(processed_image)
+
+            # Perform OCR
+            text = self.engine.image_to_string(pil_image, lang=lang, psm=psm, whitelist=whitelist)
+
+            return text.strip()
+        except Exception as e:
+            logger.error(f"Error in Tesseract processing: {str(e)}")
+            return None
+
+    def frame_roi(self, frame, roi):
+        """Preprocessed pixels of a ROI (with its profile), returns None when it lies outside the image"""
+        pixels = frame.roi(roi['coordinates'], roi.get('profile', 'default'), roi.get('text_height'))
+        if pixels is None or pixels.size == 0:
+            logger.warning(f"Empty ROI at coordinates {roi['coordinates']}")
+            return None
+        return pixels
+
+    def ocr_roi(self, frame, index, roi):
+        """Run OCR on a single ROI of the preprocessed frame with its hints, returns None for an empty ROI"""
+        pixels = self.frame_roi(frame, roi)
+        if pixels is None:
+            return None
+
+        text = self.recognize_text(pixels, **ocr_options(roi))
+        result = {
+            'roi_index': index + 1,
+            'coordinates': roi['coordinates'],
+            'text': text if text else ''
+        }
+        if text is None:
+            result['error'] = 'Text recognition failed'
+        return result
+
+    def ocr_rois_per_roi(self, frame, rois):
+        """OCR every (index, roi) pair with its own tesseract call on the shared worker pool"""
+        futures = [
+            self.executor.submit(self.ocr_roi, frame, i, roi)
+            for i, roi in rois
+        ]
+        results = []
+        for (i, roi), future in zip(rois, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error processing ROI {i + 1}: {str(e)}")
+                result = {
+                    'roi_index': i + 1,
+                    'coordinates': roi['coordinates'],
+                    'text': '',
+                    'error': str(e)
+                }
+            if result:
+                results.append(result)
+        return results
+
+    def ocr_rois_packed(self, frame, rois):
+        """OCR all (index, roi) pairs with a single tesseract call on a packed canvas.
+
+        ROIs with their own psm, whitelist or language cannot share the canvas settings and
+        are OCRed individually.
+        """
+        hinted = [(i, roi) for i, roi in rois if ocr_options(roi)]
+        results = self.ocr_rois_per_roi(frame, hinted) if hinted else []
+
+        entries = []
+        for i, roi in rois:
+            if ocr_options(roi):
+                continue
+            try:
+                pixels = self.frame_roi(frame, roi)
+                if pixels is None:
+                    continue
+                entries.append((i, roi['coordinates'], pixels))
+            except Exception as e:
+                logger.error(f"Error processing ROI {i + 1}: {str(e)}")
+                continue
+
+        if not entries:
+            return results
+
+        canvas, bands = pack_rois([processed for _, _, processed in entries])
+        error = None
+        try:
+            data = self.engine.image_to_data(Image.fromarray(canvas), lang=DEFAULT_LANG)
+            texts = split_words_by_band(data, bands)
+        except Exception as e:
+            logger.error(f"Error in Tesseract processing: {str(e)}")
+            texts = [''] * len(entries)
+            error = 'Text recognition failed'
+
+        for (i, coords, _), text in zip(entries, texts):
+            result = {
+                'roi_index': i + 1,
+                'coordinates': coords,
+                'text': text
+            }
+            if error:
+                result['error'] = error
+            results.append(result)
+        return sorted(results, key=lambda result: result['roi_index'])
+
+    def ocr_image(self, image_data, rois, ocr_mode, timings, state=None):
+        """Decode an uploaded image and OCR its ROIs, filling decode/preprocess/ocr timings.
+
+        With a frame state (one station and layout), unchanged and blank ROIs are answered
+        from it instead of tesseract and marked with a 'skipped' reason.
+        """
+        # Only grayscale is used downstream, decode straight to it
+        stage_start = time.perf_counter()
+        nparr = np.frombuffer(image_data, np.uint8)
+        img = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+
+        if img is None:
+            raise ValueError('Invalid image file')
+        timings['decode'] = elapsed_ms(stage_start)
+
+        # Preprocess once for all ROIs (restricted to their union bounding box)
+        stage_start = time.perf_counter()
+        frame = PreprocessedFrame(img, [roi['coordinates'] for roi in rois], self.threshold_scope, self.text_height)
+        timings['preprocess'] = elapsed_ms(stage_start)
+
+        # Process OCR for each ROI, keeping roi_index order
+        stage_start = time.perf_counter()
+        pending = list(enumerate(rois))
+        if self.frame_states is None:
+            state = None
+        if state is not None:
+            pending, reused, fingerprints = self.frame_states.triage(state, frame, pending)
+
+        if not pending:
+            results = []
+        elif ocr_mode == 'packed':
+            results = self.ocr_rois_packed(frame, pending)
+        else:
+            results = self.ocr_rois_per_roi(frame, pending)
+
+        if state is not None:
+            self.frame_states.remember(state, fingerprints, results)
+            results = sorted(results + reused, key=lambda result: result['roi_index'])
+        timings['ocr'] = elapsed_ms(stage_start)
+        return results
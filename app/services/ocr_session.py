@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from azure.core.exceptions import AzureError
+from fastapi.concurrency import run_in_threadpool
+
+from ..core.config import settings
+from ..core.metrics import image_bytes, ocr_session_frames, stage_seconds
+from .admission import AdmissionController, AdmissionRejectedError
+from .config_cache import CachedConfigBlob
+from .frame_state import FrameState, FrameStateCache
+from .ocr_engine import create_engine
+from .ocr_pipeline import OCR_MODES, OcrPipeline, elapsed_ms
+from .roi_layout import parse_roi_info, parse_set_order, resolve_layout
+from .storage import create_storage
+from .template_registry import TemplateRegistry
+
+logger = logging.getLogger(__name__)
+
+# What happens to a frame arriving while the session's queue is full: 'drop' discards the
+# new frame, 'coalesce' discards the oldest queued one so the newest is always OCRed next
+FRAME_POLICIES = ('drop', 'coalesce')
+
+
+class SessionRejectedError(Exception):
+    """Raised when a session cannot be opened: invalid parameters, no capacity left (1013)
+    or OCR sessions unavailable, e.g. unreadable config storage (1011)"""
+
+    def __init__(self, message, code=1008):
+        super().__init__(message)
+        self.code = code
+
+
+class OcrSessionService:
+    """OCR for long-lived WebSocket sessions of the FastAPI app.
+
+    The OCR engine, its worker pool and the ROI layout sources (roi_info.txt,
+    set_order.txt and the template registry) are created on the first session and shared
+    by every session of the process, so the REST API starts without them.
+    """
+
+    def __init__(self):
+        self.pipeline = None
+        self.executor = None
+        self.frame_states = None
+        self.admission = None
+        self._lock = threading.Lock()
+        # Created by the first session: before Python 3.10 an asyncio.Lock binds to the loop
+        # current at creation, and the service is built at import time
+        self._start_lock = None
+        self._sessions = {}
+
+        self.opened = 0
+        self.rejected = 0
+
+    async def ensure_started(self):
+        """Start the service on the first session, SessionRejectedError if it cannot start"""
+        if self.pipeline is not None:
+            return
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.pipeline is not None:
+                return
+            try:
+                await run_in_threadpool(self.start)
+            except Exception as e:
+                logger.error(f"Cannot start OCR sessions: {str(e)}")
+                self.close()
+                raise SessionRejectedError(f"OCR sessions are unavailable: {str(e)}", code=1011)
+
+    def start(self):
+        """Create the config readers, OCR engine and worker pool"""
+        offline = settings.STORAGE_BACKEND != 'azure'
+        if not offline and not (settings.AZURE_STORAGE_CONFIG_CONTAINER_NAME
+                                and settings.AZURE_STORAGE_SET_ORDER_CONTAINER_NAME):
+            raise ValueError(
+                'AZURE_STORAGE_CONFIG_CONTAINER_NAME and AZURE_STORAGE_SET_ORDER_CONTAINER_NAME are not configured'
+            )
+        storage = create_storage(
+            settings.STORAGE_BACKEND,
+            connection_string=settings.AZURE_STORAGE_CONNECTION_STRING,
+            root=settings.LOCAL_STORAGE_ROOT
+        )
+        config_container = storage.get_container_client(
+            settings.AZURE_STORAGE_CONFIG_CONTAINER_NAME or ('config' if offline else None)
+        )
+        set_order_container = storage.get_container_client(
+            settings.AZURE_STORAGE_SET_ORDER_CONTAINER_NAME or ('set-order' if offline else None)
+        )
+        self.roi_cache = CachedConfigBlob(
+            config_container.get_blob_client('roi_info.txt'),
+            parse_roi_info,
+            ttl_seconds=settings.ROI_CACHE_TTL_SECONDS
+        )
+        self.set_order_cache = CachedConfigBlob(
+            set_order_container.get_blob_client('set_order.txt'),
+            parse_set_order,
+            ttl_seconds=settings.SET_ORDER_CACHE_TTL_SECONDS
+        )
+        self.template_registry = TemplateRegistry(config_container, ttl_seconds=settings.TEMPLATE_CACHE_TTL_SECONDS)
+
+        max_workers = settings.OCR_MAX_WORKERS or max(
+            1, (os.cpu_count() or 1) // max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+        )
+        # Each tesseract process should stay single-threaded, parallelism comes from the pool
+        os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr-session')
+        engine = create_engine(settings.OCR_ENGINE, pool_size=max_workers)
+        # Frame states live in the sessions, the cache only holds the thresholds
+        self.frame_states = FrameStateCache(
+            change_threshold=settings.OCR_CHANGE_THRESHOLD,
+            blank_stddev=settings.OCR_BLANK_STDDEV
+        ) if settings.OCR_CHANGE_DETECTION else None
+        # Same lock files as the Flask API, so sessions and requests share the machine's budget
+        self.admission = AdmissionController(
+            tokens=settings.OCR_ADMISSION_TOKENS,
+            max_queue=settings.OCR_ADMISSION_MAX_QUEUE,
+            max_wait_seconds=settings.OCR_ADMISSION_MAX_WAIT_SECONDS,
+            lock_dir=settings.OCR_ADMISSION_LOCK_DIR
+        ) if settings.OCR_ADMISSION else None
+        self.pipeline = OcrPipeline(
+            engine, self.executor, settings.OCR_THRESHOLD_SCOPE, settings.OCR_TEXT_HEIGHT, self.frame_states
+        )
+        logger.info(f"OCR sessions use engine: {engine.name}")
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def ocr_frame(self, data, rois, ocr_mode, timings, state):
+        """OCR one frame holding an admission token, AdmissionRejectedError if none is free"""
+        if self.admission is None:
+            return self.pipeline.ocr_image(data, rois, ocr_mode, timings, state)
+        with self.admission.admit() as waited:
+            timings['admission'] = round(waited * 1000, 2)
+            return self.pipeline.ocr_image(data, rois, ocr_mode, timings, state)
+
+    async def open_session(self, set_order=None, template_id=None, ocr_mode=None, policy=None):
+        """Resolve the layout of a new session, SessionRejectedError if it cannot be opened"""
+        ocr_mode = ocr_mode or settings.OCR_MODE
+        policy = policy or settings.OCR_SESSION_FRAME_POLICY
+        try:
+            await self.ensure_started()
+        except SessionRejectedError:
+            with self._lock:
+                self.rejected += 1
+            raise
+        try:
+            if set_order is not None and template_id:
+                raise ValueError('Pass either set_order or template_id, not both')
+            if ocr_mode not in OCR_MODES:
+                raise ValueError(f"Invalid ocr_mode, expected one of {', '.join(OCR_MODES)}")
+            if policy not in FRAME_POLICIES:
+                raise ValueError(f"Invalid policy, expected one of {', '.join(FRAME_POLICIES)}")
+            # Config blobs are read with the synchronous clients, off the event loop
+            layout, rois = await run_in_threadpool(
+                resolve_layout, self.template_registry, self.roi_cache, self.set_order_cache, set_order, template_id
+            )
+        except (ValueError, LookupError) as e:
+            with self._lock:
+                self.rejected += 1
+            raise SessionRejectedError(str(e))
+        except (AzureError, OSError) as e:
+            # Missing or unreadable roi_info.txt / set_order.txt / templates
+            logger.error(f"Cannot resolve the ROI layout of an OCR session: {str(e)}")
+            with self._lock:
+                self.rejected += 1
+            raise SessionRejectedError(f"Cannot read the ROI layout: {str(e)}", code=1011)
+
+        session = OcrSession(self, layout, rois, ocr_mode, policy, settings.OCR_SESSION_MAX_PENDING)
+        with self._lock:
+            if len(self._sessions) >= settings.OCR_SESSION_MAX_SESSIONS:
+                self.rejected += 1
+                raise SessionRejectedError(
+                    f"Too many OCR sessions ({settings.OCR_SESSION_MAX_SESSIONS}), retry later", code=1013
+                )
+            self._sessions[session.id] = session
+            self.opened += 1
+        return session
+
+    def end_session(self, session):
+        with self._lock:
+            self._sessions.pop(session.id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'max_sessions': settings.OCR_SESSION_MAX_SESSIONS,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'admission': self.admission.stats() if self.admission else None
+            }
+
+
+class OcrSession:
+    """One client's stream of frames, OCRed in arrival order against a fixed ROI layout.
+
+    Frames wait in a queue of ``max_pending``; when it is full the frame policy decides
+    which frame is dropped. The frame state of the session lets unchanged ROIs skip
+    tesseract from one frame to the next.
+    """
+
+    def __init__(self, service: OcrSessionService, layout, rois, ocr_mode: str, policy: str, max_pending: int = 1):
+        self.id = uuid.uuid4().hex
+        self.service = service
+        self.layout = layout
+        self.rois = rois
+        self.ocr_mode = ocr_mode
+        self.policy = policy
+        self.max_pending = max(1, max_pending)
+        self.state = FrameState()
+
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self._dropped_frames = []
+        self._send_lock = asyncio.Lock()
+        self._sequence = 0
+
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def description(self):
+        return {
+            'type': 'session',
+            'session_id': self.id,
+            **self.layout,
+            'rois': len(self.rois),
+            'ocr_mode': self.ocr_mode,
+            'policy': self.policy,
+            'max_pending': self.max_pending
+        }
+
+    async def run(self, websocket):
+        """Serve the session until the client disconnects"""
+        await self.send(websocket, self.description())
+        worker = asyncio.create_task(self._process_frames(websocket))
+        try:
+            await self._receive_frames(websocket)
+        finally:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error(f"OCR session {self.id} ended with an error: {str(e)}")
+            self.service.end_session(self)
+
+    async def send(self, websocket, message):
+        async with self._send_lock:
+            await websocket.send_json(message)
+
+    async def _receive_frames(self, websocket):
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+            data = message.get('bytes')
+            if data is None:
+                await self.send(websocket, {'type': 'error', 'error': 'Send frames as binary messages'})
+                continue
+
+            self._sequence += 1
+            self.received += 1
+            if len(data) > settings.UPLOAD_MAX_BYTES:
+                self._fail()
+                await self.send(websocket, {
+                    'type': 'error',
+                    'frame': self._sequence,
+                    'error': f"Frame exceeds {settings.UPLOAD_MAX_BYTES} bytes"
+                })
+                continue
+            self._enqueue(self._sequence, data)
+
+    def _enqueue(self, sequence, data):
+        if len(self._queue) >= self.max_pending:
+            if self.policy == 'coalesce':
+                # The newest frame supersedes the oldest one still waiting
+                self._drop(self._queue.popleft()[0])
+            else:
+                self._drop(sequence)
+                return
+        self._queue.append((sequence, data))
+        self._ready.set()
+
+    def _drop(self, sequence):
+        self.dropped += 1
+        self._dropped_frames.append(sequence)
+        ocr_session_frames.inc(outcome='dropped')
+
+    def _fail(self):
+        self.failed += 1
+        ocr_session_frames.inc(outcome='failed')
+
+    async def _process_frames(self, websocket):
+        while True:
+            await self._ready.wait()
+            sequence, data = self._queue.popleft()
+            if not self._queue:
+                self._ready.clear()
+
+            timings = {}
+            start = time.perf_counter()
+            try:
+                results = await run_in_threadpool(
+                    self.service.ocr_frame, data, self.rois, self.ocr_mode, timings, self.state
+                )
+            except AdmissionRejectedError as e:
+                # The machine's OCR budget is exhausted: the client may resend after retry_after
+                self.rejected += 1
+                ocr_session_frames.inc(outcome='rejected')
+                await self.send(websocket, {
+                    'type': 'error',
+                    'frame': sequence,
+                    'error': str(e),
+                    'reason': e.reason,
+                    'retry_after': e.retry_after
+                })
+                continue
+            except Exception as e:
+                self._fail()
+                await self.send(websocket, {'type': 'error', 'frame': sequence, 'error': str(e)})
+                continue
+            timings['total'] = elapsed_ms(start)
+
+            self.processed += 1
+            ocr_session_frames.inc(outcome='processed')
+            image_bytes.observe(len(data), endpoint='ocr_session')
+            stage_seconds.observe(timings['total'] / 1000, stage='ocr_session')
+
+            dropped, self._dropped_frames = self._dropped_frames, []
+            await self.send(websocket, {
+                'type': 'result',
+                'frame': sequence,
+                'results': results,
+                'skipped_rois': sum(1 for result in results if result.get('skipped')),
+                'dropped_frames': dropped,
+                'timings_ms': timings
+            })
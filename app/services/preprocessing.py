@@ -0,0 +1,238 @@
+import logging
+import math
+import threading
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+THRESHOLD_SCOPES = ('image', 'roi')
+# Per-ROI preprocessing: 'default' follows the threshold scope, 'gray' leaves binarization
+# to tesseract, 'otsu' thresholds the ROI on its own, 'invert' is 'default' with light text
+# on a dark background turned dark on light
+PREPROCESSING_PROFILES = ('default', 'gray', 'otsu', 'invert')
+
+# Text height normalization: scale factors close to 1 are not worth a resize, upscaling is
+# capped (it adds pixels, not detail) and so is the size of the scaled ROI
+SCALE_TOLERANCE = 0.2
+MIN_SCALE = 0.1
+MAX_SCALE = 4.0
+MAX_SCALED_PIXELS = 8 * 1024 * 1024
+# Text height is estimated on a reduced copy of larger ROIs
+ESTIMATE_MAX_PIXELS = 256 * 1024
+
+
+def preprocess_image(image, threshold=None):
+    """Preprocess image for better OCR results (Otsu threshold unless one is given)"""
+    try:
+        # Convert to grayscale (frames decoded with IMREAD_GRAYSCALE already are)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+        # Apply thresholding to preprocess the image
+        if threshold is None:
+            gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        else:
+            gray = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY)[1]
+
+        # Apply dilation to connect text components
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        gray = cv2.dilate(gray, kernel, iterations=1)
+
+        return gray
+    except Exception as e:
+        logger.error(f"Error in image preprocessing: {str(e)}")
+        return image
+
+
+def estimate_text_height(gray):
+    """Median height in pixels of the character-like connected components of a grayscale
+    ROI, or None when it holds no text-like components"""
+    if gray is None or gray.size == 0:
+        return None
+    factor = 1.0
+    if gray.size > ESTIMATE_MAX_PIXELS:
+        factor = math.sqrt(ESTIMATE_MAX_PIXELS / gray.size)
+        gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+    binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    # Text covers less of the ROI than its background: flip light text on a dark background
+    if cv2.countNonZero(binary) > binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    # Drop specks, frame borders / ruling lines spanning the ROI and sparse line art
+    keep = ((heights >= 3) & (areas >= 6)
+            & (heights < 0.9 * binary.shape[0]) & (widths < 0.9 * binary.shape[1])
+            & (areas >= 0.1 * widths * heights))
+    if not np.any(keep):
+        return None
+    return float(np.median(heights[keep])) / factor
+
+
+def text_scale(gray, target_height: float, text_height=None):
+    """Factor that brings the text of a ROI to target_height pixels, or None to leave it.
+
+    text_height is the ROI's hint of its text height in source pixels; without it the
+    height is estimated from connected components.
+    """
+    if text_height is None:
+        text_height = estimate_text_height(gray)
+    if not text_height:
+        return None
+    scale = min(max(target_height / text_height, MIN_SCALE), MAX_SCALE)
+    scale = min(scale, math.sqrt(MAX_SCALED_PIXELS / gray.size))
+    if abs(scale - 1.0) <= SCALE_TOLERANCE:
+        return None
+    return scale
+
+
+def rescale(gray, scale: float):
+    """Resize a ROI, area averaging when shrinking and bicubic when enlarging"""
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    width = max(1, round(gray.shape[1] * scale))
+    height = max(1, round(gray.shape[0] * scale))
+    return cv2.resize(gray, (width, height), interpolation=interpolation)
+
+
+def clamp_box(coords, shape):
+    """Clip (x1, y1, x2, y2) to an image of the given shape"""
+    x1, y1, x2, y2 = coords
+    height, width = shape[:2]
+    return (
+        max(0, min(x1, width)),
+        max(0, min(y1, height)),
+        max(0, min(x2, width)),
+        max(0, min(y2, height))
+    )
+
+
+def union_bounding_box(roi_coordinates, shape):
+    """Smallest box covering every ROI inside the image, or None if none overlaps it"""
+    boxes = [clamp_box(coords, shape) for coords in roi_coordinates]
+    boxes = [box for box in boxes if box[2] > box[0] and box[3] > box[1]]
+    if not boxes:
+        return None
+    return (
+        min(box[0] for box in boxes),
+        min(box[1] for box in boxes),
+        max(box[2] for box in boxes),
+        max(box[3] for box in boxes)
+    )
+
+
+class PreprocessedFrame:
+    """A grayscale frame preprocessed once for all of its ROIs.
+
+    Only the union bounding box of the ROIs is touched. With the 'image' threshold scope
+    that region is binarized in a single pass, the first time a ROI needs it, and
+    ``roi()`` returns zero-copy views into it; with the 'roi' scope every ROI gets its own Otsu threshold, which can be more
+    accurate when lighting differs across the frame.
+
+    With a ``text_height`` target, ``roi()`` rescales each grayscale ROI so its text is about
+    that many pixels high before binarizing it, keeping tesseract's work per ROI roughly
+    constant whatever the camera resolution. In the 'image' scope the scaled ROI is
+    binarized at the Otsu threshold of the whole region.
+    """
+
+    def __init__(self, gray, roi_coordinates, threshold_scope: str = 'image', text_height=None):
+        if threshold_scope not in THRESHOLD_SCOPES:
+            raise ValueError(f"Invalid threshold scope: {threshold_scope}")
+        self.shape = gray.shape
+        self.threshold_scope = threshold_scope
+        self.text_height = text_height or None
+        self._threshold = None
+        self._region = None
+        # ROIs of a frame are preprocessed from several OCR worker threads
+        self._lock = threading.Lock()
+
+        box = union_bounding_box(roi_coordinates, gray.shape)
+        if box is None:
+            self.offset = (0, 0)
+            self.gray_region = gray[0:0, 0:0]
+            return
+
+        x1, y1, x2, y2 = box
+        self.offset = (x1, y1)
+        self.gray_region = gray[y1:y2, x1:x2]
+
+    def roi(self, coords, profile: str = 'default', text_height=None):
+        """Preprocessed pixels of one ROI, or None when it lies outside the image.
+
+        text_height (the ROI's hint, in source pixels) replaces the estimated text height
+        when the frame normalizes text height.
+        """
+        if self.text_height is not None:
+            scaled = self.scaled_roi(coords, profile, text_height)
+            if scaled is not None:
+                return scaled
+
+        if profile == 'gray':
+            return self.gray_roi(coords)
+        if profile == 'otsu':
+            gray = self.gray_roi(coords)
+            return preprocess_image(gray) if gray is not None and gray.size else gray
+        if profile == 'invert':
+            # Not rescaled (see above): invert the default pixels without estimating again
+            view = self.unscaled_roi(coords)
+            return cv2.bitwise_not(view) if view is not None and view.size else view
+        return self.unscaled_roi(coords)
+
+    def unscaled_roi(self, coords):
+        """Pixels of one ROI at source size with the default profile, or None when it lies
+        outside the image"""
+        x1, y1, x2, y2 = clamp_box(coords, self.shape)
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        dx, dy = self.offset
+        if self.threshold_scope == 'roi':
+            return preprocess_image(self.gray_region[y1 - dy:y2 - dy, x1 - dx:x2 - dx])
+        return self.region()[y1 - dy:y2 - dy, x1 - dx:x2 - dx]
+
+    def scaled_roi(self, coords, profile: str = 'default', text_height=None):
+        """Preprocessed pixels of one ROI rescaled to the target text height, or None when
+        it needs no rescaling (or lies outside the image)"""
+        gray = self.gray_roi(coords)
+        if gray is None or gray.size == 0:
+            return None
+        scale = text_scale(gray, self.text_height, text_height)
+        if scale is None:
+            return None
+
+        scaled = rescale(gray, scale)
+        if profile == 'gray':
+            return scaled
+        if profile == 'otsu' or self.threshold_scope == 'roi':
+            return preprocess_image(scaled)
+        binary = preprocess_image(scaled, self.threshold())
+        return cv2.bitwise_not(binary) if profile == 'invert' else binary
+
+    def threshold(self):
+        """Otsu threshold of the ROIs' union region, computed on first use"""
+        if self._threshold is None and self.gray_region.size:
+            self._threshold = cv2.threshold(self.gray_region, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[0]
+        return self._threshold
+
+    def region(self):
+        """The ROIs' union region binarized at its Otsu threshold, computed on first use.
+
+        Only ROIs served without rescaling read it, so frames whose ROIs are all rescaled
+        never binarize the whole region.
+        """
+        with self._lock:
+            if self._region is None:
+                self._region = preprocess_image(self.gray_region, self.threshold()) if self.gray_region.size else self.gray_region
+            return self._region
+
+    def gray_roi(self, coords):
+        """Grayscale pixels of one ROI before preprocessing, or None when it lies outside the image"""
+        x1, y1, x2, y2 = clamp_box(coords, self.shape)
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        dx, dy = self.offset
+        return self.gray_region[y1 - dy:y2 - dy, x1 - dx:x2 - dx]
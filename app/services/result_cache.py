@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from azure.core.exceptions import ResourceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+def result_cache_key(image_data: bytes, set_order, roi_coordinates, *variant):
+    """Content address of an OCR result: image bytes, set order, ROI layout and OCR options"""
+    layout = json.dumps(roi_coordinates, separators=(',', ':'))
+    digest = hashlib.blake2b(image_data, digest_size=16)
+    digest.update(f"|{set_order}|{layout}|{'|'.join(str(v) for v in variant)}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """OCR results keyed by content address.
+
+    A memory LRU bounded by the serialized size of its entries sits in front of an
+    optional persistent tier of ``result_cache/<key>.json`` blobs. Persistent writes go
+    through the write-behind writer so they stay off the request path.
+    """
+
+    def __init__(self, max_bytes: int, container_client=None, writer=None, prefix: str = 'result_cache/'):
+        self.max_bytes = max_bytes
+        self.container_client = container_client
+        self.writer = writer
+        self.prefix = prefix
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def persistent(self):
+        return self.container_client is not None
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry)
+
+        if self.persistent:
+            content = self._load(key)
+            if content is not None:
+                self._remember(key, content)
+                with self._lock:
+                    self.persistent_hits += 1
+                return json.loads(content)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value):
+        content = json.dumps(value, ensure_ascii=False)
+        self._remember(key, content)
+        if self.persistent and self.writer is not None:
+            self.writer.submit(f"{self.prefix}{key}.json", content)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+                'persistent': self.persistent
+            }
+
+    def _remember(self, key, content):
+        content = content.encode('utf-8')
+        size = len(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = content
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def _load(self, key):
+        name = f"{self.prefix}{key}.json"
+        if self.writer is not None:
+            content = self.writer.pending(name)
+            if content is not None:
+                return content
+        try:
+            blob_client = self.container_client.get_blob_client(name)
+            return blob_client.download_blob().readall().decode('utf-8')
+        except ResourceNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading cached OCR result {name}: {str(e)}")
+            return None
@@ -0,0 +1,318 @@
+import base64
+import gzip
+import heapq
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobBlock
+
+logger = logging.getLogger(__name__)
+
+SHARD_PREFIX = 'shards/'
+INDEX_SUFFIX = '.index.json'
+
+
+def utc(value: datetime):
+    """Aware UTC datetime, naive values are taken as UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def segment_key(set_order=None, template_id=None):
+    """Index key of a result's layout: 'template:<id>' for templates, else 'set:<n>'"""
+    if template_id:
+        return f"template:{template_id}"
+    return f"set:{set_order}"
+
+
+class _OpenShard:
+    """A shard this process is still appending to: its committed blocks and index"""
+
+    def __init__(self, name):
+        self.name = name
+        self.block_ids = []
+        self.size = 0
+        self.segments = []
+
+
+class ResultStore:
+    """OCR results in time-partitioned, gzip-compressed JSONL shards with a small index.
+
+    Every process appends to its own shard per UTC hour,
+    ``shards/YYYY/MM/DD/HH/<writer>-<seq>.jsonl.gz``. Each flush stages one gzip member per
+    layout as a block and recommits the block list, so shards grow without being rewritten
+    and concatenated members stay a valid gzip file. ``<shard>.index.json`` lists every
+    segment with its layout key, byte offset and length, record count and time range.
+
+    A query lists the index blobs of the hours in range and range-reads only the segments of
+    the requested layout that overlap it, so its cost follows the data returned rather than
+    the total history. Records become visible once flushed (``flush_interval``).
+    """
+
+    def __init__(self, container_client, flush_interval: float = 5.0, max_buffer: int = 10000,
+                 max_shard_bytes: int = 64 * 1024 * 1024, max_shard_blocks: int = 10000):
+        self.container_client = container_client
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_shard_bytes = max_shard_bytes
+        self.max_shard_blocks = max_shard_blocks
+        self.writer_id = uuid.uuid4().hex[:12]
+
+        self._condition = threading.Condition()
+        self._buffer = []
+        self._flushing = False
+        self._closed = False
+        self._flush_requested = False
+        self._shards = {}
+        # Shards whose committed segments are not in their index blob yet, by name
+        self._pending_indexes = {}
+        self._sequence = 0
+
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.segments_written = 0
+        self.queries = 0
+        self.segments_read = 0
+        self.bytes_read = 0
+
+        self._thread = threading.Thread(target=self._run, name='result-store-flush', daemon=True)
+        self._thread.start()
+
+    def append(self, record: dict):
+        """Queue a result record (set_order / template_id, results, ...) stamped with 'ts' now.
+
+        Returns False when it was dropped because the buffer is full.
+        """
+        with self._condition:
+            if self._closed or len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                logger.warning('Dropped OCR result record: shard buffer full')
+                return False
+            # Stamped under the lock so every segment is in timestamp order
+            self._buffer.append(dict(record, ts=datetime.now(timezone.utc).isoformat()))
+            self.appended += 1
+        return True
+
+    def flush(self, timeout: float = None):
+        """Block until everything appended so far has been written (or failed to)"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._buffer or self._flushing:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(min(remaining, 0.1) if remaining is not None else 0.1)
+        return True
+
+    def close(self, timeout: float = 30.0):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        if self._buffer:
+            logger.error(f"Result store closed with {len(self._buffer)} unwritten records")
+
+    def stats(self):
+        with self._condition:
+            return {
+                'writer': self.writer_id,
+                'buffered': len(self._buffer),
+                'open_shards': len(self._shards),
+                'pending_indexes': len(self._pending_indexes),
+                'appended': self.appended,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed_flushes': self.failed_flushes,
+                'segments_written': self.segments_written,
+                'queries': self.queries,
+                'segments_read': self.segments_read,
+                'bytes_read': self.bytes_read
+            }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not (self._closed or self._flush_requested):
+                    self._condition.wait(self.flush_interval)
+                self._flush_requested = False
+                batch, self._buffer = self._buffer, []
+                self._flushing = bool(batch)
+                closed = self._closed
+            failed = self._write(batch) if batch else []
+            # Before flush() returns, so flushed records can be queried
+            if self._pending_indexes:
+                self._write_pending_indexes()
+            if batch:
+                with self._condition:
+                    if failed:
+                        # Retried with the next flush, ahead of newer records
+                        room = max(0, self.max_buffer - len(self._buffer))
+                        self._buffer[:0] = failed[:room]
+                        self.dropped += max(0, len(failed) - room)
+                    self._flushing = False
+                    self._condition.notify_all()
+                if failed and closed:
+                    return
+                if failed:
+                    time.sleep(min(self.flush_interval, 1.0))
+            elif closed:
+                if self._pending_indexes:
+                    logger.error(f"Result store closed with {len(self._pending_indexes)} shard indexes not written")
+                return
+
+    def _write(self, records):
+        """Append records to the shards of their hours, returns the records that failed"""
+        hours = {}
+        for record in records:
+            hours.setdefault(record['ts'][:13], []).append(record)
+
+        failed = []
+        for hour, hour_records in sorted(hours.items()):
+            try:
+                self._append_segments(hour, hour_records)
+                with self._condition:
+                    self.written += len(hour_records)
+            except Exception as e:
+                logger.error(f"Error writing OCR result shard for {hour}: {str(e)}")
+                with self._condition:
+                    self.failed_flushes += 1
+                failed.extend(hour_records)
+
+        # Shards of past hours receive no more records
+        latest = max(hours)
+        for hour in [hour for hour in self._shards if hour < latest and hour not in hours]:
+            del self._shards[hour]
+        return failed
+
+    def _open_shard(self, hour):
+        shard = self._shards.get(hour)
+        if shard is None or shard.size >= self.max_shard_bytes or len(shard.block_ids) >= self.max_shard_blocks:
+            self._sequence += 1
+            ts = datetime.fromisoformat(hour + ':00:00+00:00')
+            shard = _OpenShard(f"{SHARD_PREFIX}{ts:%Y/%m/%d/%H}/{self.writer_id}-{self._sequence:04d}.jsonl.gz")
+            self._shards[hour] = shard
+        return shard
+
+    def _append_segments(self, hour, records):
+        shard = self._open_shard(hour)
+        layouts = {}
+        for record in records:
+            key = segment_key(record.get('set_order'), record.get('template_id'))
+            layouts.setdefault(key, []).append(record)
+
+        blob_client = self.container_client.get_blob_client(shard.name)
+        block_ids = list(shard.block_ids)
+        segments = []
+        offset = shard.size
+        for key, layout_records in sorted(layouts.items()):
+            lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in layout_records)
+            data = gzip.compress(lines.encode('utf-8'), compresslevel=6)
+            block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+            blob_client.stage_block(block_id, data)
+            block_ids.append(block_id)
+            segments.append({
+                'key': key,
+                'offset': offset,
+                'length': len(data),
+                'count': len(layout_records),
+                'from': layout_records[0]['ts'],
+                'to': layout_records[-1]['ts']
+            })
+            offset += len(data)
+        blob_client.commit_block_list([BlobBlock(block_id=block_id) for block_id in block_ids])
+
+        # Committed: the records are written even if the index below fails, which is only
+        # retried (records put back in the buffer would be committed twice)
+        shard.block_ids = block_ids
+        shard.size = offset
+        shard.segments.extend(segments)
+        self._pending_indexes[shard.name] = shard
+        with self._condition:
+            self.segments_written += len(segments)
+
+    def _write_pending_indexes(self):
+        for name, shard in list(self._pending_indexes.items()):
+            index = {
+                'shard': name,
+                'writer': self.writer_id,
+                'from': shard.segments[0]['from'],
+                'to': shard.segments[-1]['to'],
+                'segments': shard.segments
+            }
+            # Written after the commit: the index never points past committed data
+            try:
+                self.container_client.get_blob_client(name[:-len('.jsonl.gz')] + INDEX_SUFFIX).upload_blob(
+                    json.dumps(index, separators=(',', ':')), overwrite=True
+                )
+            except Exception as e:
+                logger.error(f"Error writing OCR result index of {name}: {str(e)}")
+                with self._condition:
+                    self.failed_flushes += 1
+                continue
+            del self._pending_indexes[name]
+
+    def query(self, start: datetime, end: datetime, set_order=None, template_id=None, limit: int = None):
+        """Yield the records of one layout with start <= ts < end, in time order per hour"""
+        start, end = utc(start), utc(end)
+        key = segment_key(set_order, template_id)
+        with self._condition:
+            self.queries += 1
+
+        returned = 0
+        for hour_start in self._hours(start, end):
+            segments = self._hour_segments(hour_start, key, start, end)
+            # Records of several writers in the same hour are merged by timestamp
+            records = heapq.merge(*(self._read_segment(shard, segment, start, end)
+                                    for shard, segment in segments), key=lambda record: record['ts'])
+            for record in records:
+                yield record
+                returned += 1
+                if limit is not None and returned >= limit:
+                    return
+
+    def _hours(self, start, end):
+        hour = start.replace(minute=0, second=0, microsecond=0)
+        while hour < end:
+            yield hour
+            hour += timedelta(hours=1)
+
+    def _hour_segments(self, hour_start, key, start, end):
+        """(shard, segment) pairs of an hour matching the layout key and time range"""
+        prefix = f"{SHARD_PREFIX}{hour_start:%Y/%m/%d/%H}/"
+        matches = []
+        for blob in self.container_client.list_blobs(name_starts_with=prefix):
+            if not blob.name.endswith(INDEX_SUFFIX):
+                continue
+            try:
+                index = json.loads(self.container_client.get_blob_client(blob.name).download_blob().readall())
+            except (ResourceNotFoundError, ValueError) as e:
+                logger.warning(f"Skipping unreadable shard index {blob.name}: {str(e)}")
+                continue
+            for segment in index['segments']:
+                if segment['key'] != key:
+                    continue
+                if utc(datetime.fromisoformat(segment['to'])) < start or utc(datetime.fromisoformat(segment['from'])) >= end:
+                    continue
+                matches.append((index['shard'], segment))
+        return matches
+
+    def _read_segment(self, shard, segment, start, end):
+        data = self.container_client.get_blob_client(shard).download_blob(
+            offset=segment['offset'], length=segment['length']
+        ).readall()
+        with self._condition:
+            self.segments_read += 1
+            self.bytes_read += len(data)
+        for line in gzip.decompress(data).decode('utf-8').splitlines():
+            record = json.loads(line)
+            ts = utc(datetime.fromisoformat(record['ts']))
+            if start <= ts < end:
+                yield record
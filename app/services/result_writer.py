@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingWrite:
+    __slots__ = ('name', 'content', 'attempts', 'submitted_at', 'not_before')
+
+    def __init__(self, name, content):
+        self.name = name
+        self.content = content
+        self.attempts = 0
+        self.submitted_at = time.monotonic()
+        self.not_before = 0.0
+
+
+class WriteBehindWriter:
+    """Buffers blob writes in memory and uploads them in batches from a background thread.
+
+    The buffer is bounded: when it is full new writes are dropped and counted rather than
+    growing memory without limit. Failed uploads are retried with exponential backoff.
+    """
+
+    def __init__(self, container_client, max_buffer: int = 1000, batch_size: int = 32,
+                 flush_interval: float = 1.0, max_retries: int = 3, upload_concurrency: int = 4):
+        self.container_client = container_client
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._buffer = deque()
+        self._pending = {}
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._flush_requested = False
+        self._uploader = ThreadPoolExecutor(max_workers=upload_concurrency, thread_name_prefix='result-writer')
+
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.batches = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+
+        self._thread = threading.Thread(target=self._run, name='result-writer-flush', daemon=True)
+        self._thread.start()
+
+    def submit(self, name: str, content):
+        """Queue a write, returns False when it was dropped because the buffer is full"""
+        with self._condition:
+            if self._closed or len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                logger.warning(f"Dropped result write {name}: buffer full")
+                return False
+            write = _PendingWrite(name, content)
+            self._buffer.append(write)
+            self._pending[name] = write
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        return True
+
+    def pending(self, name: str):
+        """Content of a write that has not reached storage yet, or None"""
+        with self._condition:
+            write = self._pending.get(name)
+            return write.content if write else None
+
+    def flush(self, timeout: float = None):
+        """Block until everything buffered so far has been written or given up on"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._buffer or self._in_flight:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    def close(self, timeout: float = 30.0):
+        """Drain the buffer and stop the background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        self._uploader.shutdown(wait=True)
+        if self._buffer:
+            logger.error(f"Result writer closed with {len(self._buffer)} unwritten results")
+
+    def stats(self):
+        with self._condition:
+            oldest = self._buffer[0].submitted_at if self._buffer else None
+            return {
+                'buffered': len(self._buffer),
+                'in_flight': self._in_flight,
+                'capacity': self.max_buffer,
+                'written': self.written,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'retries': self.retries,
+                'batches': self.batches,
+                'oldest_buffered_seconds': round(time.monotonic() - oldest, 3) if oldest else 0.0,
+                'last_flush_lag_seconds': round(self.last_flush_lag, 3),
+                'max_flush_lag_seconds': round(self.max_flush_lag, 3)
+            }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Accumulate a batch unless it is already full or a flush was asked for
+                if len(self._buffer) < self.batch_size and not (self._closed or self._flush_requested):
+                    self._condition.wait(self.flush_interval)
+                self._flush_requested = False
+                if not self._buffer:
+                    if self._closed:
+                        return
+                    continue
+
+                now = time.monotonic()
+                batch = []
+                deferred = []
+                while self._buffer and len(batch) < self.batch_size:
+                    write = self._buffer.popleft()
+                    (batch if write.not_before <= now else deferred).append(write)
+                # Writes still backing off go back to the front in their original order
+                self._buffer.extendleft(reversed(deferred))
+                self._in_flight = len(batch)
+
+            if not batch:
+                time.sleep(min(self.flush_interval, 0.1))
+                continue
+
+            try:
+                outcomes = list(self._uploader.map(self._upload, batch))
+            except RuntimeError:
+                # Executors refuse new work once the interpreter is exiting: drain sequentially
+                outcomes = [self._upload(write) for write in batch]
+
+            with self._condition:
+                now = time.monotonic()
+                retry = []
+                for write, ok in zip(batch, outcomes):
+                    if ok:
+                        self.written += 1
+                        lag = now - write.submitted_at
+                        self.last_flush_lag = lag
+                        self.max_flush_lag = max(self.max_flush_lag, lag)
+                        self._pending.pop(write.name, None)
+                    elif write.attempts <= self.max_retries:
+                        self.retries += 1
+                        write.not_before = now + min(30.0, 0.5 * 2 ** (write.attempts - 1))
+                        retry.append(write)
+                    else:
+                        self.failed += 1
+                        self._pending.pop(write.name, None)
+                        logger.error(f"Giving up on result write {write.name} after {write.attempts} attempts")
+                self._buffer.extendleft(reversed(retry))
+                self._in_flight = 0
+                self.batches += 1
+                self._condition.notify_all()
+
+    def _upload(self, write):
+        write.attempts += 1
+        try:
+            blob_client = self.container_client.get_blob_client(write.name)
+            blob_client.upload_blob(write.content, overwrite=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error writing result {write.name} (attempt {write.attempts}): {str(e)}")
+            return False
@@ -0,0 +1,237 @@
+import json
+import logging
+import re
+
+from .preprocessing import PREPROCESSING_PROFILES
+
+logger = logging.getLogger(__name__)
+
+ROI_HINTS = ('psm', 'whitelist', 'lang', 'profile', 'text_height')
+# Page segmentation modes that produce text (0 is orientation detection only, 2 is unimplemented)
+PAGE_SEGMENTATION_MODES = (1,) + tuple(range(3, 14))
+LANG_PATTERN = re.compile(r'^[A-Za-z0-9_]+(\+[A-Za-z0-9_]+)*$')
+MAX_WHITELIST_LENGTH = 256
+MAX_TEXT_HEIGHT = 10000
+
+
+def parse_hints(hints):
+    """Validate the optional OCR hints of a ROI, returns them normalized.
+
+    psm: tesseract page segmentation mode, e.g. 7 for a single text line
+    whitelist: the only characters tesseract may output, e.g. 0123456789.
+    lang: tesseract languages, e.g. eng (default vie+eng)
+    profile: preprocessing profile, one of PREPROCESSING_PROFILES
+    text_height: height of the ROI's text in image pixels, skips estimating it when the
+    ROI is rescaled to the target text height
+    """
+    parsed = {}
+    if hints.get('psm') is not None:
+        psm = hints['psm']
+        try:
+            psm = int(psm)
+        except (TypeError, ValueError):
+            raise ValueError(f"psm must be an integer: {psm}")
+        if isinstance(hints['psm'], bool) or psm not in PAGE_SEGMENTATION_MODES:
+            raise ValueError(f"psm must be 1 or 3-13: {hints['psm']}")
+        parsed['psm'] = psm
+    if hints.get('whitelist') is not None:
+        whitelist = hints['whitelist']
+        if (not isinstance(whitelist, str) or not whitelist or len(whitelist) > MAX_WHITELIST_LENGTH
+                or any(char.isspace() for char in whitelist)):
+            raise ValueError(f"whitelist must be 1-{MAX_WHITELIST_LENGTH} characters without spaces")
+        parsed['whitelist'] = whitelist
+    if hints.get('lang') is not None:
+        lang = hints['lang']
+        if not isinstance(lang, str) or not LANG_PATTERN.match(lang):
+            raise ValueError(f"lang must look like eng or vie+eng: {lang}")
+        parsed['lang'] = lang
+    if hints.get('profile') is not None:
+        if hints['profile'] not in PREPROCESSING_PROFILES:
+            raise ValueError(f"profile must be one of {', '.join(PREPROCESSING_PROFILES)}: {hints['profile']}")
+        parsed['profile'] = hints['profile']
+    if hints.get('text_height') is not None:
+        text_height = hints['text_height']
+        try:
+            text_height = int(text_height)
+        except (TypeError, ValueError):
+            raise ValueError(f"text_height must be an integer: {text_height}")
+        if isinstance(hints['text_height'], bool) or not 1 <= text_height <= MAX_TEXT_HEIGHT:
+            raise ValueError(f"text_height must be between 1 and {MAX_TEXT_HEIGHT}: {hints['text_height']}")
+        parsed['text_height'] = text_height
+    return parsed
+
+
+def ocr_options(roi):
+    """Keyword arguments of the OCR engine for a ROI's hints (lang, psm, whitelist)"""
+    return {key: roi[key] for key in ('lang', 'psm', 'whitelist') if key in roi}
+
+
+def parse_line_hints(text: str, line: str, strict: bool = False):
+    """Parse the key=value hints written after a ROI's coordinates, e.g. "psm=7 lang=eng".
+
+    Unknown or invalid hints are logged and ignored, or raise ValueError when strict.
+    """
+    hints = {}
+    for token in text.split():
+        key, separator, value = token.partition('=')
+        if not separator or key not in ROI_HINTS:
+            if strict:
+                raise ValueError(f"Unknown ROI hint '{token}' in: {line}, expected {', '.join(ROI_HINTS)}")
+            logger.error(f"Ignoring unknown ROI hint '{token}' in: {line}")
+            continue
+        hints[key] = value
+    try:
+        return parse_hints(hints)
+    except ValueError as e:
+        if strict:
+            raise ValueError(f"Invalid ROI hints in: {line}, Error: {str(e)}")
+        # Keep the ROI (and the roi_index of the ones after it) with default OCR settings
+        logger.error(f"Ignoring invalid ROI hints in: {line}, Error: {str(e)}")
+        return {}
+
+
+def parse_roi_info(roi_content: str, strict: bool = False):
+    """Parse roi_info.txt into a dict mapping set number to its list of ROIs.
+
+    Every ROI is a dict with its [x1, y1, x2, y2] 'coordinates' and the optional hints
+    written after them on the same line; all coordinate lines of a set are returned. A set
+    listed twice keeps its first ROIs, as the original per-request parser did. With strict,
+    unknown or invalid hints and repeated sets raise ValueError instead of being logged and
+    ignored.
+    """
+    layouts = {}
+    current_set = None
+
+    for line in roi_content.strip().split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith('Bộ khung'):
+            # Extract set number from "Bộ khung X: Y vùng"
+            set_parts = line.split(':')
+            header = set_parts[0].split()
+            if len(header) < 3:
+                logger.error(f"Invalid set header: {line}")
+                current_set = None
+                continue
+            set_number = header[2]  # Get the number after "Bộ khung"
+            try:
+                current_set = int(set_number)
+            except ValueError:
+                logger.error(f"Invalid set number format: {set_number}")
+                current_set = None
+                continue
+            if layouts.get(current_set):
+                if strict:
+                    raise ValueError(f"Set {current_set} is listed more than once")
+                logger.warning(f"Ignoring repeated set {current_set} in roi_info.txt, the first one is used")
+                current_set = None
+                continue
+            layouts[current_set] = []
+        elif line.startswith('(') and current_set is not None:
+            end = line.find(')')
+            if end < 0:
+                end = len(line)
+            try:
+                # Parse coordinates (x1, y1, x2, y2)
+                coords = line[1:end].split(',')
+                if len(coords) != 4:
+                    continue
+                coords = [int(x.strip()) for x in coords]
+            except (ValueError, IndexError) as e:
+                logger.error(f"Error parsing coordinates: {line}, Error: {str(e)}")
+                continue
+            roi = {'coordinates': coords}
+            roi.update(parse_line_hints(line[end + 1:], line, strict))
+            layouts[current_set].append(roi)
+
+    return {set_number: rois for set_number, rois in layouts.items() if rois}
+
+
+def parse_roi(roi):
+    """Validate one template ROI, given as [x1, y1, x2, y2] or {"coordinates": [...], <hints>}"""
+    if isinstance(roi, dict):
+        roi = dict(roi)
+        coordinates = roi.get('coordinates')
+    else:
+        coordinates = roi
+        roi = {}
+    if not isinstance(coordinates, (list, tuple)) or len(coordinates) != 4:
+        raise ValueError(f"ROI coordinates must be [x1, y1, x2, y2]: {coordinates}")
+    try:
+        x1, y1, x2, y2 = (int(value) for value in coordinates)
+    except (TypeError, ValueError):
+        raise ValueError(f"ROI coordinates must be integers: {coordinates}")
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"Empty ROI: {coordinates}")
+    hints = parse_hints(roi)
+    for key in ROI_HINTS:
+        roi.pop(key, None)
+    roi['coordinates'] = [x1, y1, x2, y2]
+    roi.update(hints)
+    return roi
+
+
+def parse_template(content: str):
+    """Parse a template document (templates/<template_id>.json) with its ROIs normalized"""
+    try:
+        document = json.loads(content)
+    except ValueError as e:
+        raise ValueError(f"Template is not valid JSON: {str(e)}")
+    if not isinstance(document, dict) or not isinstance(document.get('rois'), list) or not document['rois']:
+        raise ValueError('Template must be an object with a non-empty "rois" list')
+
+    template = dict(document)
+    template['version'] = int(document.get('version', 1))
+    template['rois'] = [parse_roi(roi) for roi in document['rois']]
+    return template
+
+
+def parse_set_order(content):
+    """Parse the content of set_order.txt"""
+    return int(content.strip())
+
+
+def set_order_rois(roi_cache, set_order):
+    """Get the ROIs (coordinates and hints) for the specified set order"""
+    try:
+        # Parsed layouts are served from memory and revalidated by ETag
+        layouts = roi_cache.get()
+        rois = layouts.get(set_order)
+        if not rois:
+            raise ValueError(f"Set order {set_order} not found in ROI info or no coordinates found")
+        return rois
+    except Exception as e:
+        logger.error(f"Error getting ROI coordinates: {str(e)}")
+        raise
+
+
+def resolve_layout(template_registry, roi_cache, set_order_cache, set_order=None, template_id=None):
+    """Resolve the ROI layout of a request, ValueError if unusable.
+
+    A template_id selects a registry template, a set_order a set of roi_info.txt (read
+    through roi_cache), and without either the global set order of set_order_cache is used.
+    Returns (layout, rois) where layout identifies the source in responses and every ROI is
+    a dict with its 'coordinates' and optional OCR hints.
+    """
+    if template_id:
+        template = template_registry.get(template_id)
+        layout = {'set_order': None, 'template_id': template_id, 'template_version': template['version']}
+        return layout, template['rois']
+
+    if set_order is None:
+        # Get current set order (served from memory, see SET_ORDER_CACHE_TTL_SECONDS)
+        try:
+            set_order = set_order_cache.get()
+        except ValueError as e:
+            logger.error(f"Invalid set order value: {str(e)}")
+            raise ValueError('Invalid set order value')
+
+    # Get ROI coordinates for the set order
+    try:
+        rois = set_order_rois(roi_cache, set_order)
+    except ValueError as e:
+        logger.error(f"Error getting ROI coordinates: {str(e)}")
+        raise
+    return {'set_order': set_order}, rois
@@ -0,0 +1,885 @@
+"""Pluggable blob storage backends.
+
+Every backend hands out container clients exposing the subset of the Azure
+``ContainerClient`` / ``BlobClient`` API this project uses (download with ETag
+conditions, upload, staged blocks, delete, properties, paged listing), so the code
+written against Azure runs unchanged on local disk or in memory.
+"""
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single server process, a thread lock is enough
+    fcntl = None
+
+from azure.core import MatchConditions
+from azure.core.exceptions import (
+    ResourceExistsError,
+    ResourceModifiedError,
+    ResourceNotFoundError,
+    ResourceNotModifiedError
+)
+from azure.storage.blob import BlobServiceClient
+
+STORAGE_BACKENDS = ('azure', 'local', 'memory')
+# Conditional writes of the local backend are serialized on this many lock files per container
+LOCAL_WRITE_LOCKS = 64
+
+
+def create_storage(backend: str = 'azure', connection_string: str = None, root: str = None):
+    """Build the storage service for a backend name; its get_container_client() is all callers use"""
+    if backend == 'azure':
+        return BlobServiceClient.from_connection_string(connection_string)
+    if backend == 'local':
+        return LocalStorage(root or 'storage')
+    if backend == 'memory':
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+class BlobProperties:
+    def __init__(self, name, size, etag, creation_time, last_modified):
+        self.name = name
+        self.size = size
+        self.etag = etag
+        self.creation_time = creation_time
+        self.last_modified = last_modified
+
+
+class Download:
+    """Result of download_blob(): the content plus its properties"""
+
+    def __init__(self, data: bytes, properties: BlobProperties):
+        self._data = data
+        self.properties = properties
+        self.size = properties.size
+
+    def readall(self):
+        return self._data
+
+    def content_as_bytes(self):
+        return self._data
+
+    def content_as_text(self, encoding='UTF-8'):
+        return self._data.decode(encoding)
+
+    def readinto(self, stream):
+        stream.write(self._data)
+        return len(self._data)
+
+
+def _check_conditions(current_etag, etag, match_condition):
+    if etag is None or match_condition is None:
+        return
+    if match_condition == MatchConditions.IfModified and current_etag == etag:
+        raise ResourceNotModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+    if match_condition == MatchConditions.IfNotModified and current_etag != etag:
+        raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+
+
+def _to_bytes(data):
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+    if hasattr(data, 'read'):
+        return data.read()
+    return b''.join(data)
+
+
+def _range(kwargs, size):
+    """(start, end) of the byte range asked with download_blob(offset=, length=)"""
+    offset = kwargs.get('offset') or 0
+    length = kwargs.get('length')
+    end = size if length is None else min(size, offset + length)
+    return min(offset, size), end
+
+
+def _block_id(block):
+    return getattr(block, 'id', None) or getattr(block, 'block_id', None) or block
+
+
+def _utc(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class _PageIterator:
+    """Pages of a sorted name listing; the continuation token is the last name returned"""
+
+    def __init__(self, names, properties, per_page, continuation_token):
+        self._names = names
+        self._properties = properties
+        self._per_page = per_page
+        self._started = False
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._started and self.continuation_token is None:
+            raise StopIteration
+        self._started = True
+
+        start = bisect.bisect_right(self._names, self.continuation_token) if self.continuation_token else 0
+        page_names = self._names[start:start + self._per_page]
+        more = start + self._per_page < len(self._names)
+        self.continuation_token = page_names[-1] if more and page_names else None
+
+        page = []
+        for name in page_names:
+            properties = self._properties(name)
+            if properties is not None:  # Removed while listing
+                page.append(properties)
+        return iter(page)
+
+
+class _Listing:
+    def __init__(self, names, properties, per_page):
+        self._names = names
+        self._properties = properties
+        self._per_page = per_page or 5000
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def by_page(self, continuation_token=None):
+        return _PageIterator(self._names, self._properties, self._per_page, continuation_token)
+
+
+class LocalStorage:
+    """Blobs stored as files under ``root/<container>/<blob name>``"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def get_container_client(self, container_name: str):
+        return LocalContainerClient(self.root, container_name)
+
+
+class LocalContainerClient:
+    def __init__(self, root: str, container_name: str):
+        self.container_name = container_name
+        self.root = os.path.join(root, container_name)
+        self.staging_root = os.path.join(root, '.staging', container_name)
+        self.locks_root = os.path.join(root, '.locks', container_name)
+        self._thread_lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def get_blob_client(self, blob):
+        return LocalBlobClient(self, blob)
+
+    def list_blobs(self, name_starts_with=None, results_per_page=None, **kwargs):
+        names = []
+        # Only the directory holding the prefix can contain matches
+        top = self.root
+        if name_starts_with and '/' in name_starts_with:
+            top = self._path(name_starts_with.rsplit('/', 1)[0] + '/.')
+            if not os.path.isdir(top):
+                return _Listing([], self._properties, results_per_page)
+        for directory, _, files in os.walk(top):
+            for filename in files:
+                if filename.startswith('.tmp-'):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if not name_starts_with or name.startswith(name_starts_with):
+                    names.append(name)
+        names.sort()
+        return _Listing(names, self._properties, results_per_page)
+
+    def delete_blobs(self, *blobs, **kwargs):
+        return [self._delete_one(blob) for blob in blobs]
+
+    def _delete_one(self, blob):
+        name = getattr(blob, 'name', blob)
+        try:
+            self.get_blob_client(name).delete_blob()
+            return None
+        except ResourceNotFoundError as e:
+            return e
+
+    @contextmanager
+    def _write_lock(self, name):
+        """Serialize check-and-write of a blob across threads and processes (gunicorn workers
+        sharing the directory): an flock on one of LOCAL_WRITE_LOCKS lock files"""
+        if fcntl is None:
+            with self._thread_lock:
+                yield
+            return
+        os.makedirs(self.locks_root, exist_ok=True)
+        stripe = int(hashlib.sha1(name.encode('utf-8')).hexdigest(), 16) % LOCAL_WRITE_LOCKS
+        with open(os.path.join(self.locks_root, f"{stripe:02d}.lock"), 'a+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _path(self, name):
+        path = os.path.normpath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid blob name: {name}")
+        return path
+
+    def _properties(self, name):
+        try:
+            stat = os.stat(self._path(name))
+        except FileNotFoundError:
+            return None
+        return BlobProperties(
+            name=name,
+            size=stat.st_size,
+            etag=f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            creation_time=_utc(stat.st_ctime),
+            last_modified=_utc(stat.st_mtime)
+        )
+
+
+class LocalBlobClient:
+    def __init__(self, container: LocalContainerClient, blob_name: str):
+        self.container = container
+        self.container_name = container.container_name
+        self.blob_name = blob_name
+        self.path = container._path(blob_name)
+        self.url = f"file://{self.path}"
+
+    def get_blob_properties(self, **kwargs):
+        properties = self.container._properties(self.blob_name)
+        if properties is None:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+        return properties
+
+    def exists(self, **kwargs):
+        return os.path.isfile(self.path)
+
+    def download_blob(self, etag=None, match_condition=None, **kwargs):
+        try:
+            with open(self.path, 'rb') as f:
+                properties = self.get_blob_properties()
+                _check_conditions(properties.etag, etag, match_condition)
+                start, end = _range(kwargs, properties.size)
+                if end <= start:
+                    return Download(b'', properties)
+                # Map the file instead of reading it through a buffered read loop
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return Download(mapped[start:end], properties)
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+
+    def upload_blob(self, data, overwrite: bool = False, etag=None, match_condition=None, **kwargs):
+        if not overwrite and os.path.exists(self.path):
+            raise ResourceExistsError(f"The specified blob already exists: {self.blob_name}")
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if hasattr(data, 'read'):
+                    while True:
+                        chunk = data.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        f.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                else:
+                    f.write(_to_bytes(data))
+            # The conditions are checked again under the lock, atomically with the write
+            with self.container._write_lock(self.blob_name):
+                if etag is not None:
+                    current = self.container._properties(self.blob_name)
+                    _check_conditions(current.etag if current else None, etag, match_condition)
+                if overwrite:
+                    os.replace(temp_path, self.path)
+                else:
+                    try:
+                        # Create-only: a hard link fails if another writer created the blob
+                        os.link(temp_path, self.path)
+                    except FileExistsError:
+                        raise ResourceExistsError(f"The specified blob already exists: {self.blob_name}")
+                    os.remove(temp_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if not kwargs.get('_keep_blocks'):
+            self._remove_block_layout()
+
+        properties = self.get_blob_properties()
+        return {'etag': properties.etag, 'last_modified': properties.last_modified}
+
+    def stage_block(self, block_id, data, **kwargs):
+        directory = self._staging_dir()
+        os.makedirs(directory, exist_ok=True)
+        name = base64.urlsafe_b64encode(block_id.encode('utf-8')).decode('ascii')
+        with open(os.path.join(directory, name), 'wb') as f:
+            f.write(_to_bytes(data))
+
+    def commit_block_list(self, block_list, **kwargs):
+        """Commit staged blocks; like Azure, IDs of blocks already committed to the blob may be
+        listed again, which lets a blob grow by staging only the new blocks"""
+        directory = self._staging_dir()
+        committed = {block_id: (offset, length) for block_id, offset, length in self._block_layout()}
+        sources = []
+        layout = []
+        offset = 0
+        for block in block_list:
+            block_id = _block_id(block)
+            name = base64.urlsafe_b64encode(block_id.encode('utf-8')).decode('ascii')
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                length = os.path.getsize(path)
+                sources.append((path, 0, length))
+            elif block_id in committed:
+                start, length = committed[block_id]
+                sources.append((self.path, start, length))
+            else:
+                raise ResourceNotFoundError(f"The specified block list is invalid: {block_id}")
+            layout.append((block_id, offset, length))
+            offset += length
+
+        class _Concatenated:
+            def __init__(self, sources):
+                self._sources = iter(sources)
+                self._current = None
+                self._remaining = 0
+
+            def read(self, size=-1):
+                while True:
+                    if self._current is None:
+                        source = next(self._sources, None)
+                        if source is None:
+                            return b''
+                        path, start, self._remaining = source
+                        self._current = open(path, 'rb')
+                        self._current.seek(start)
+                    want = self._remaining if size is None or size < 0 else min(size, self._remaining)
+                    chunk = self._current.read(want) if want else b''
+                    if chunk:
+                        self._remaining -= len(chunk)
+                        return chunk
+                    self._current.close()
+                    self._current = None
+
+        result = self.upload_blob(_Concatenated(sources), overwrite=True, _keep_blocks=True)
+        with open(self._staging_dir() + '.blocks', 'w', encoding='utf-8') as f:
+            json.dump(layout, f)
+        if os.path.isdir(directory):
+            for path in os.listdir(directory):
+                os.remove(os.path.join(directory, path))
+            os.rmdir(directory)
+        return result
+
+    def delete_blob(self, **kwargs):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+        self._remove_block_layout()
+
+    def _staging_dir(self):
+        digest = hashlib.sha1(self.blob_name.encode('utf-8')).hexdigest()
+        return os.path.join(self.container.staging_root, digest)
+
+    def _block_layout(self):
+        """(block_id, offset, length) of the committed blocks, empty if not built from blocks"""
+        try:
+            with open(self._staging_dir() + '.blocks', encoding='utf-8') as f:
+                return [tuple(entry) for entry in json.load(f)]
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def _remove_block_layout(self):
+        try:
+            os.remove(self._staging_dir() + '.blocks')
+        except FileNotFoundError:
+            pass
+
+
+class MemoryStorage:
+    """Process-local in-memory blobs, for tests and benchmarks"""
+
+    def __init__(self):
+        self._containers = {}
+        self._lock = threading.Lock()
+
+    def get_container_client(self, container_name: str):
+        with self._lock:
+            if container_name not in self._containers:
+                self._containers[container_name] = MemoryContainerClient(container_name)
+            return self._containers[container_name]
+
+
+class MemoryContainerClient:
+    def __init__(self, container_name: str):
+        self.container_name = container_name
+        self._lock = threading.Lock()
+        self._blobs = {}
+        self._staged = {}
+        self._layouts = {}
+
+    def get_blob_client(self, blob):
+        return MemoryBlobClient(self, blob)
+
+    def list_blobs(self, name_starts_with=None, results_per_page=None, **kwargs):
+        with self._lock:
+            names = sorted(name for name in self._blobs
+                           if not name_starts_with or name.startswith(name_starts_with))
+        return _Listing(names, self._properties, results_per_page)
+
+    def delete_blobs(self, *blobs, **kwargs):
+        outcomes = []
+        for blob in blobs:
+            try:
+                self.get_blob_client(getattr(blob, 'name', blob)).delete_blob()
+                outcomes.append(None)
+            except ResourceNotFoundError as e:
+                outcomes.append(e)
+        return outcomes
+
+    def _properties(self, name):
+        with self._lock:
+            entry = self._blobs.get(name)
+        return entry[1] if entry else None
+
+
+class MemoryBlobClient:
+    def __init__(self, container: MemoryContainerClient, blob_name: str):
+        self.container = container
+        self.container_name = container.container_name
+        self.blob_name = blob_name
+        self.url = f"memory://{container.container_name}/{blob_name}"
+
+    def get_blob_properties(self, **kwargs):
+        properties = self.container._properties(self.blob_name)
+        if properties is None:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+        return properties
+
+    def exists(self, **kwargs):
+        return self.container._properties(self.blob_name) is not None
+
+    def download_blob(self, etag=None, match_condition=None, **kwargs):
+        with self.container._lock:
+            entry = self.container._blobs.get(self.blob_name)
+        if entry is None:
+            raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+        data, properties = entry
+        _check_conditions(properties.etag, etag, match_condition)
+        start, end = _range(kwargs, len(data))
+        return Download(data[start:end] if (start, end) != (0, len(data)) else data, properties)
+
+    def upload_blob(self, data, overwrite: bool = False, etag=None, match_condition=None, _layout=None, **kwargs):
+        data = _to_bytes(data)
+        now = datetime.now(timezone.utc)
+        with self.container._lock:
+            existing = self.container._blobs.get(self.blob_name)
+            if existing is not None and not overwrite:
+                raise ResourceExistsError(f"The specified blob already exists: {self.blob_name}")
+            _check_conditions(existing[1].etag if existing else None, etag, match_condition)
+            properties = BlobProperties(
+                name=self.blob_name,
+                size=len(data),
+                etag=f'"{uuid.uuid4().hex}"',
+                creation_time=existing[1].creation_time if existing else now,
+                last_modified=now
+            )
+            self.container._blobs[self.blob_name] = (data, properties)
+            if _layout is None:
+                self.container._layouts.pop(self.blob_name, None)
+            else:
+                self.container._layouts[self.blob_name] = _layout
+        return {'etag': properties.etag, 'last_modified': properties.last_modified}
+
+    def stage_block(self, block_id, data, **kwargs):
+        with self.container._lock:
+            self.container._staged.setdefault(self.blob_name, {})[block_id] = _to_bytes(data)
+
+    def commit_block_list(self, block_list, **kwargs):
+        with self.container._lock:
+            staged = self.container._staged.pop(self.blob_name, {})
+            entry = self.container._blobs.get(self.blob_name)
+            committed = self.container._layouts.get(self.blob_name, {}) if entry else {}
+        chunks = []
+        layout = {}
+        offset = 0
+        for block in block_list:
+            block_id = _block_id(block)
+            if block_id in staged:
+                chunk = staged[block_id]
+            elif block_id in committed:
+                start, length = committed[block_id]
+                chunk = entry[0][start:start + length]
+            else:
+                raise ResourceNotFoundError(f"The specified block list is invalid: {block_id}")
+            chunks.append(chunk)
+            layout[block_id] = (offset, len(chunk))
+            offset += len(chunk)
+        return self.upload_blob(b''.join(chunks), overwrite=True, _layout=layout)
+
+    def delete_blob(self, **kwargs):
+        with self.container._lock:
+            self.container._layouts.pop(self.blob_name, None)
+            if self.container._blobs.pop(self.blob_name, None) is None:
+                raise ResourceNotFoundError(f"The specified blob does not exist: {self.blob_name}")
+
+
+class DiskCache:
+    """Size-bounded LRU of blob contents on local disk, shared by the wrapped containers.
+
+    Entries remember the ETag they were fetched with, so a stale entry is revalidated with a
+    conditional request instead of being downloaded again. The ETag is also written in a
+    header line of the cached file itself, replaced atomically with the content, and checked
+    on every read: processes sharing the directory keep their own index, and bytes stored
+    by another process are never served under the wrong ETag. ``max_bytes`` is enforced by
+    each process on the entries it knows of.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float = 30.0,
+                 max_object_bytes: int = 8 * 1024 * 1024):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_object_bytes = max_object_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def wrap(self, container_client):
+        return DiskCachedContainerClient(container_client, self)
+
+    def lookup(self, key):
+        """(etag, fresh) of a cached entry, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            etag, _, fetched_at = entry
+            return etag, time.monotonic() - fetched_at < self.ttl_seconds
+
+    def read(self, key, etag):
+        """Cached bytes of an entry, or None when the file is gone or holds another ETag"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = _read_cache_header(f)
+                if header is None or header.get('key') != key or header.get('etag') != etag:
+                    # Replaced or removed by another process sharing the directory
+                    self.discard(key, remove_file=False)
+                    return None
+                offset = f.tell()
+                if os.fstat(f.fileno()).st_size == offset:
+                    return b''
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[offset:]
+        except FileNotFoundError:
+            self.discard(key)
+            return None
+
+    def store(self, key, data: bytes, etag):
+        if len(data) > self.max_object_bytes or len(data) > self.max_bytes:
+            self.discard(key)
+            return
+        path = self._path(key)
+        header = json.dumps({'key': key, 'etag': etag}).encode('utf-8') + b'\n'
+        fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(data)
+        # The ETag and the bytes it describes become visible together
+        os.replace(temp_path, path)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (etag, len(data), time.monotonic())
+            self._size += len(data)
+            evicted = []
+            while self._size > self.max_bytes:
+                old_key, (_, old_size, _) = self._entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            self._remove_file(old_key)
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def touch(self, key):
+        """Mark an entry fresh after the origin confirmed it is unchanged"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], entry[1], time.monotonic())
+
+    def discard(self, key, remove_file: bool = True):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry[1]
+        if remove_file:
+            self._remove_file(key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self):
+        # Entries left by a previous run (or another worker) start stale: their first read
+        # is revalidated with a conditional request instead of a full download
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith('.tmp-'):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                with open(path, 'rb') as f:
+                    header = _read_cache_header(f)
+                    stat = os.fstat(f.fileno())
+                    size = stat.st_size - f.tell()
+            except OSError:
+                continue
+            if header is None or 'key' not in header:
+                continue
+            entries.append((stat.st_atime, header['key'], header.get('etag'), size))
+        for _, key, etag, size in sorted(entries):
+            self._entries[key] = (etag, size, float('-inf'))
+            self._size += size
+
+
+def _read_cache_header(f):
+    """The {'key', 'etag'} header line of a disk cache file, or None if it has none"""
+    try:
+        header = json.loads(f.readline(64 * 1024))
+    except ValueError:
+        return None
+    return header if isinstance(header, dict) else None
+
+
+class DiskCachedContainerClient:
+    """Read-through / write-through disk cache in front of another container client"""
+
+    def __init__(self, inner, cache: DiskCache):
+        self.inner = inner
+        self.cache = cache
+        self.container_name = getattr(inner, 'container_name', None)
+
+    def get_blob_client(self, blob):
+        return DiskCachedBlobClient(self, self.inner.get_blob_client(blob), blob)
+
+    def delete_blobs(self, *blobs, **kwargs):
+        for blob in blobs:
+            self.cache.discard(f"{self.container_name}/{getattr(blob, 'name', blob)}")
+        return self.inner.delete_blobs(*blobs, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+class DiskCachedBlobClient:
+    def __init__(self, container: DiskCachedContainerClient, inner, blob_name: str):
+        self.container = container
+        self.inner = inner
+        self.blob_name = blob_name
+        self.cache = container.cache
+        self.key = f"{container.container_name}/{blob_name}"
+        self._staged_lock = threading.Lock()
+        self._staged = {}
+        self._staged_size = 0
+
+    def download_blob(self, etag=None, match_condition=None, **kwargs):
+        if kwargs.get('offset') is not None or kwargs.get('length') is not None:
+            return self.inner.download_blob(etag=etag, match_condition=match_condition, **kwargs)
+
+        entry = self.cache.lookup(self.key)
+        if entry is not None:
+            cached_etag, fresh = entry
+            if not fresh:
+                try:
+                    downloader = self.inner.download_blob(
+                        etag=cached_etag, match_condition=MatchConditions.IfModified, **kwargs
+                    )
+                except ResourceNotModifiedError:
+                    self.cache.touch(self.key)
+                    self.cache.record('revalidations')
+                else:
+                    return self._remember(downloader, etag, match_condition)
+
+            data = self.cache.read(self.key, cached_etag)
+            if data is not None:
+                _check_conditions(cached_etag, etag, match_condition)
+                self.cache.record('hits')
+                properties = BlobProperties(self.blob_name, len(data), cached_etag, None, None)
+                return Download(data, properties)
+
+        self.cache.record('misses')
+        downloader = self.inner.download_blob(etag=etag, match_condition=match_condition, **kwargs)
+        return self._remember(downloader, None, None)
+
+    def upload_blob(self, data, **kwargs):
+        result = self.inner.upload_blob(data, **kwargs)
+        if isinstance(data, (bytes, str)):
+            # Write-through: what was just uploaded is the hottest copy
+            self.cache.store(self.key, _to_bytes(data), result.get('etag') if result else None)
+        else:
+            self.cache.discard(self.key)
+        return result
+
+    def stage_block(self, block_id, data, **kwargs):
+        result = self.inner.stage_block(block_id, data, **kwargs)
+        # Keep small uploads' blocks so the committed blob can be written through
+        with self._staged_lock:
+            if self._staged is not None:
+                self._staged[block_id] = _to_bytes(data)
+                self._staged_size += len(data)
+                if self._staged_size > self.cache.max_object_bytes:
+                    self._staged = None
+        return result
+
+    def commit_block_list(self, block_list, **kwargs):
+        self.cache.discard(self.key)
+        result = self.inner.commit_block_list(block_list, **kwargs)
+        with self._staged_lock:
+            staged, self._staged = self._staged, None
+        etag = result.get('etag') if isinstance(result, dict) else None
+        if staged is not None and etag:
+            block_ids = [getattr(block, 'id', block) for block in block_list]
+            if all(block_id in staged for block_id in block_ids):
+                self.cache.store(self.key, b''.join(staged[block_id] for block_id in block_ids), etag)
+        return result
+
+    def delete_blob(self, **kwargs):
+        self.cache.discard(self.key)
+        return self.inner.delete_blob(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _remember(self, downloader, etag, match_condition):
+        data = downloader.readall()
+        properties = downloader.properties
+        self.cache.store(self.key, data, properties.etag)
+        _check_conditions(properties.etag, etag, match_condition)
+        return Download(data, properties)
+
+
+class AsyncContainerAdapter:
+    """Exposes a synchronous container client through the aio client interface.
+
+    Blocking calls run in worker threads, so the local and in-memory backends can serve the
+    async FastAPI service as well.
+    """
+
+    def __init__(self, container_client):
+        self.inner = container_client
+        self.container_name = getattr(container_client, 'container_name', None)
+
+    def get_blob_client(self, blob):
+        return _AsyncBlobAdapter(self.inner.get_blob_client(blob))
+
+    def list_blobs(self, **kwargs):
+        return _AsyncListingAdapter(self.inner.list_blobs(**kwargs))
+
+    async def delete_blobs(self, *blobs, **kwargs):
+        return await asyncio.to_thread(self.inner.delete_blobs, *blobs, **kwargs)
+
+    async def close(self):
+        pass
+
+
+class _AsyncBlobAdapter:
+    def __init__(self, blob_client):
+        self.inner = blob_client
+        self.blob_name = blob_client.blob_name
+        self.url = getattr(blob_client, 'url', None)
+
+    def __getattr__(self, name):
+        method = getattr(self.inner, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+
+class _AsyncItems:
+    def __init__(self, items):
+        self._items = iter(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._items)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _AsyncPages:
+    def __init__(self, pages):
+        self._pages = pages
+
+    @property
+    def continuation_token(self):
+        return self._pages.continuation_token
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        page = await asyncio.to_thread(next, self._pages, None)
+        if page is None:
+            raise StopAsyncIteration
+        return _AsyncItems(list(page))
+
+
+class _AsyncListingAdapter:
+    def __init__(self, listing):
+        self._listing = listing
+
+    def by_page(self, continuation_token=None):
+        return _AsyncPages(self._listing.by_page(continuation_token=continuation_token))
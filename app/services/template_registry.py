@@ -0,0 +1,149 @@
+import json
+import logging
+import re
+import threading
+from datetime import datetime
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+from .config_cache import CachedConfigBlob
+from .roi_layout import parse_roi, parse_template
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+
+class TemplateNotFoundError(LookupError):
+    """Raised when a template ID has no layout in the registry"""
+
+
+class TemplateConflictError(ValueError):
+    """Raised when a template changed since the version the caller based its update on"""
+
+
+def validate_template_id(template_id: str):
+    if not TEMPLATE_ID_PATTERN.match(template_id or ''):
+        raise ValueError('template_id must be 1-64 letters, digits, "_", "-" or "." and start with a letter or digit')
+    return template_id
+
+
+class TemplateRegistry:
+    """ROI layouts stored as one versioned JSON blob per template (``templates/<id>.json``).
+
+    Every template has its own ETag-revalidated in-memory copy, found by a dict lookup, so
+    stations using different templates neither share a lock nor wait on each other's reads.
+    """
+
+    def __init__(self, container_client, ttl_seconds: float = 30.0, prefix: str = 'templates/'):
+        self.container_client = container_client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._templates = {}
+
+    def get(self, template_id: str):
+        """Parsed template, raises TemplateNotFoundError when it does not exist"""
+        validate_template_id(template_id)
+        try:
+            return self._entry(template_id).get()
+        except ResourceNotFoundError:
+            self._forget(template_id)
+            raise TemplateNotFoundError(f"Template {template_id} not found")
+
+    def put(self, template_id: str, rois, description: str = None, expected_version: int = None):
+        """Store a new version of a template and return it.
+
+        The update is conditional on the stored ETag, so two concurrent writers cannot both
+        produce the same version; ``expected_version`` additionally rejects updates based on
+        a stale read.
+        """
+        validate_template_id(template_id)
+        if not isinstance(rois, list) or not rois:
+            raise ValueError('rois must be a non-empty list')
+        rois = [parse_roi(roi) for roi in rois]
+
+        blob_client = self.container_client.get_blob_client(self._blob_name(template_id))
+        try:
+            downloader = blob_client.download_blob()
+            current = parse_template(downloader.readall().decode('utf-8'))
+            current_etag = downloader.properties.etag
+        except ResourceNotFoundError:
+            current = None
+            current_etag = None
+
+        current_version = current['version'] if current else 0
+        if expected_version is not None and expected_version != current_version:
+            raise TemplateConflictError(
+                f"Template {template_id} is at version {current_version}, expected {expected_version}"
+            )
+
+        content = json.dumps({
+            'template_id': template_id,
+            'version': current_version + 1,
+            'description': description,
+            'rois': rois,
+            'updated_at': datetime.utcnow().isoformat()
+        }, ensure_ascii=False, indent=2)
+
+        try:
+            if current_etag:
+                result = blob_client.upload_blob(
+                    content, overwrite=True, etag=current_etag, match_condition=MatchConditions.IfNotModified
+                )
+            else:
+                result = blob_client.upload_blob(content, overwrite=False)
+        except (ResourceModifiedError, ResourceExistsError):
+            raise TemplateConflictError(f"Template {template_id} was modified concurrently, retry the update")
+
+        # Make the new version visible to this worker immediately
+        return self._entry(template_id).prime(content, result.get('etag'))
+
+    def delete(self, template_id: str):
+        validate_template_id(template_id)
+        try:
+            self.container_client.get_blob_client(self._blob_name(template_id)).delete_blob()
+        except ResourceNotFoundError:
+            raise TemplateNotFoundError(f"Template {template_id} not found")
+        finally:
+            self._forget(template_id)
+
+    def list(self):
+        """IDs of all stored templates"""
+        names = self.container_client.list_blobs(name_starts_with=self.prefix)
+        return [
+            blob.name[len(self.prefix):-len('.json')]
+            for blob in names
+            if blob.name.endswith('.json') and '/' not in blob.name[len(self.prefix):]
+        ]
+
+    def stats(self):
+        with self._lock:
+            entries = dict(self._templates)
+        totals = {'templates': len(entries), 'hits': 0, 'misses': 0, 'revalidations': 0, 'reloads': 0}
+        for entry in entries.values():
+            entry_stats = entry.stats()
+            for key in ('hits', 'misses', 'revalidations', 'reloads'):
+                totals[key] += entry_stats[key]
+        totals['ttl_seconds'] = self.ttl_seconds
+        return totals
+
+    def _blob_name(self, template_id):
+        return f"{self.prefix}{template_id}.json"
+
+    def _entry(self, template_id):
+        with self._lock:
+            entry = self._templates.get(template_id)
+            if entry is None:
+                entry = CachedConfigBlob(
+                    self.container_client.get_blob_client(self._blob_name(template_id)),
+                    parse_template,
+                    ttl_seconds=self.ttl_seconds
+                )
+                self._templates[template_id] = entry
+            return entry
+
+    def _forget(self, template_id):
+        with self._lock:
+            self._templates.pop(template_id, None)
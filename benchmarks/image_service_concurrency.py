@@ -0,0 +1,104 @@
+"""Concurrency benchmark for the FastAPI image API (app/main.py).
+
+Start the API against a local Azurite (or any test storage account), e.g.:
+
+    AZURE_STORAGE_CONNECTION_STRING="UseDevelopmentStorage=true" uvicorn app.main:app
+
+then run:
+
+    python benchmarks/image_service_concurrency.py --url http://localhost:8000 --concurrency 1,4,16,64
+
+Throughput should grow with the number of concurrent clients until storage or the CPU
+saturates; with a blocking service it stays flat at the single-client rate.
+"""
+import argparse
+import asyncio
+import io
+import json
+import statistics
+import time
+
+import aiohttp
+from PIL import Image
+
+
+def make_image(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 200, 200)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+async def call(session, base_url, scenario, image):
+    if scenario == 'upload':
+        form = aiohttp.FormData()
+        form.add_field('file', image, filename='bench.jpg', content_type='image/jpeg')
+        url = f"{base_url}/api/v1/upload/"
+        async with session.post(url, data=form) as response:
+            await response.read()
+            return response.status
+    if scenario == 'grayscale':
+        form = aiohttp.FormData()
+        form.add_field('file', image, filename='bench.jpg', content_type='image/jpeg')
+        url = f"{base_url}/api/v1/process/grayscale/"
+        async with session.post(url, data=form) as response:
+            await response.read()
+            return response.status
+    async with session.get(f"{base_url}/api/v1/images/?limit=100") as response:
+        await response.read()
+        return response.status
+
+
+async def run_level(base_url, scenario, concurrency, total, image):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def client(session):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            status = await call(session, base_url, scenario, image)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'throughput_rps': round(total / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--scenario', choices=('upload', 'grayscale', 'list'), default='upload')
+    parser.add_argument('--concurrency', default='1,4,16,64')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--size', default='1280x720', help='Synthetic image size WIDTHxHEIGHT')
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split('x'))
+    image = make_image(width, height)
+    results = []
+    for level in (int(v) for v in args.concurrency.split(',')):
+        results.append(await run_level(args.url.rstrip('/'), args.scenario, level, args.requests, image))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,254 @@
+"""End-to-end benchmark of POST /api/ocr (main.py) on synthetic frames.
+
+Frames with known Vietnamese and English text are rendered into a generated ROI layout,
+the layout is published as roi_info.txt and every frame goes through the real request
+path against the local or in-memory storage backend, so no Azure account is needed:
+
+    python benchmarks/ocr_pipeline.py --concurrency 1,2,4,8 --requests 100 > ocr.json
+
+The JSON report holds, per concurrency level, p50/p95/p99 of every pipeline stage
+(config, decode, preprocess, ocr, upload) and images per second, plus character accuracy
+against the rendered text. Compare reports of two versions to spot regressions; keep
+--seed, --size and the layout options identical between runs.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFont
+
+TEXTS = {
+    'vi': [
+        'Nhiệt độ lò', 'Áp suất hơi', 'Tốc độ băng tải', 'Trạng thái máy', 'Bình thường',
+        'Cảnh báo quá nhiệt', 'Ca sản xuất', 'Số lượng đạt', 'Độ ẩm không khí', 'Người vận hành'
+    ],
+    'en': [
+        'Oven temperature', 'Steam pressure', 'Conveyor speed', 'Machine status', 'Normal',
+        'Overheat warning', 'Production shift', 'Good count', 'Air humidity', 'Operator'
+    ]
+}
+FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/Library/Fonts/Arial Unicode.ttf',
+    'C:\\Windows\\Fonts\\arial.ttf'
+)
+STAGES = ('config', 'decode', 'preprocess', 'ocr', 'upload', 'total')
+
+
+def load_font(path, size):
+    for candidate in ([path] if path else FONT_CANDIDATES):
+        if candidate and os.path.exists(candidate):
+            return ImageFont.truetype(candidate, size)
+    raise SystemExit('No TrueType font with Vietnamese glyphs found, pass --font')
+
+
+def make_layout(width, height, rois, font_size):
+    """Stack ROIs in two columns, each tall enough for one line of text"""
+    row_height = int(font_size * 2)
+    column_width = (width - 60) // 2
+    rows = (rois + 1) // 2
+    if 20 + rows * (row_height + 10) > height:
+        raise SystemExit(f'{rois} ROIs of {row_height}px do not fit in a {width}x{height} frame')
+
+    boxes = []
+    for i in range(rois):
+        x1 = 20 + (i % 2) * (column_width + 20)
+        y1 = 20 + (i // 2) * (row_height + 10)
+        boxes.append([x1, y1, x1 + column_width, y1 + row_height])
+    return boxes
+
+
+def roi_info_text(layouts):
+    """Serialize {set number: boxes} in the roi_info.txt format"""
+    lines = []
+    for set_number, boxes in layouts.items():
+        lines.append(f'Bộ khung {set_number}: {len(boxes)} vùng')
+        lines.extend(f'({x1}, {y1}, {x2}, {y2})' for x1, y1, x2, y2 in boxes)
+    return '\n'.join(lines) + '\n'
+
+
+def render_frame(rng, width, height, boxes, font, languages):
+    """Render one frame; returns its JPEG bytes and the text of every ROI"""
+    image = Image.new('RGB', (width, height), (235, 235, 230))
+    draw = ImageDraw.Draw(image)
+    truth = []
+    for x1, y1, x2, y2 in boxes:
+        language = rng.choice(languages)
+        text = f'{rng.choice(TEXTS[language])} {rng.randint(0, 9999)}'
+        draw.rectangle((x1, y1, x2, y2), fill=(255, 255, 255))
+        draw.text((x1 + 8, y1 + (y2 - y1 - font.size) // 2), text, font=font, fill=(20, 20, 20))
+        truth.append({'language': language, 'text': text})
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue(), truth
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def rank(p):
+        # Nearest-rank percentile
+        return round(values[max(0, -(-len(values) * p // 100) - 1)], 2)
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99), 'count': len(values)}
+
+
+def run_level(main, frames, concurrency, total, ocr_mode):
+    stage_values = {stage: [] for stage in STAGES}
+    latencies = []
+    errors = 0
+    outcomes = []
+
+    def send(i):
+        image, truth = frames[i % len(frames)]
+        client = main.app.test_client()
+        start = time.perf_counter()
+        response = client.post('/api/ocr', data={
+            'file': (io.BytesIO(image), f'frame_{i}.jpg'),
+            'ocr_mode': ocr_mode
+        })
+        latency = (time.perf_counter() - start) * 1000
+        return response.status_code, response.get_json(silent=True), truth, latency
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for status, body, truth, latency in executor.map(send, range(total)):
+            latencies.append(latency)
+            if status != 200 or not body:
+                errors += 1
+                continue
+            for stage in STAGES:
+                if stage in body.get('timings_ms', {}):
+                    stage_values[stage].append(body['timings_ms'][stage])
+            outcomes.append((body['results'], truth))
+    elapsed = time.perf_counter() - start
+
+    # Results are persisted write-behind, drain them so the next level starts clean
+    flush_start = time.perf_counter()
+    main.result_writer.flush(timeout=60)
+    flush_ms = (time.perf_counter() - flush_start) * 1000
+
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'images_per_second': round((total - errors) / elapsed, 2),
+        'latency_ms': percentiles(latencies),
+        'stages_ms': {stage: percentiles(values) for stage, values in stage_values.items()},
+        'result_flush_ms': round(flush_ms, 2)
+    }, outcomes
+
+
+def accuracy(outcomes):
+    """Character accuracy, 1 - edit distance / ground truth length, per language"""
+    totals = {}
+    for results, truth in outcomes:
+        texts = {result['roi_index']: ' '.join(result['text'].split()) for result in results}
+        for index, expected in enumerate(truth, 1):
+            entry = totals.setdefault(expected['language'], {'characters': 0, 'errors': 0, 'exact': 0, 'rois': 0})
+            recognized = texts.get(index, '')
+            distance = edit_distance(recognized, expected['text'])
+            entry['characters'] += len(expected['text'])
+            entry['errors'] += min(distance, len(expected['text']))
+            entry['exact'] += recognized == expected['text']
+            entry['rois'] += 1
+
+    report = {}
+    for language, entry in sorted(totals.items()):
+        report[language] = {
+            'rois': entry['rois'],
+            'character_accuracy': round(1 - entry['errors'] / entry['characters'], 4),
+            'exact_match_rate': round(entry['exact'] / entry['rois'], 4)
+        }
+    characters = sum(entry['characters'] for entry in totals.values())
+    if characters:
+        report['overall'] = round(1 - sum(entry['errors'] for entry in totals.values()) / characters, 4)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='1,2,4,8')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per concurrency level')
+    parser.add_argument('--frames', type=int, default=20, help='Distinct synthetic frames')
+    parser.add_argument('--size', default='1280x720', help='Frame size WIDTHxHEIGHT')
+    parser.add_argument('--rois', type=int, default=8, help='ROIs per frame')
+    parser.add_argument('--sets', type=int, default=3, help='Layouts in roi_info.txt, frames use set 1')
+    parser.add_argument('--font', help='TrueType font with Vietnamese glyphs')
+    parser.add_argument('--font-size', type=int, default=28)
+    parser.add_argument('--languages', default='vi,en')
+    parser.add_argument('--ocr-mode', choices=('per_roi', 'packed'), default='per_roi')
+    parser.add_argument('--backend', choices=('local', 'memory'), default='memory')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # main.py reads its configuration at import time
+    os.environ['STORAGE_BACKEND'] = args.backend
+    if args.backend == 'local':
+        os.environ.setdefault('LOCAL_STORAGE_ROOT', tempfile.mkdtemp(prefix='ocr-bench-'))
+    # Repeated frames must be OCRed every time, not answered by the result cache or from
+    # the frame state of a station
+    os.environ['RESULT_CACHE_MAX_BYTES'] = '0'
+    os.environ['OCR_CHANGE_DETECTION'] = '0'
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main as service
+
+    width, height = (int(v) for v in args.size.split('x'))
+    font = load_font(args.font, args.font_size)
+    languages = args.languages.split(',')
+    rng = random.Random(args.seed)
+
+    boxes = make_layout(width, height, args.rois, args.font_size)
+    layouts = {set_number: boxes for set_number in range(1, args.sets + 1)}
+    client = service.app.test_client()
+    client.post('/api/roi-info', data={'file': (io.BytesIO(roi_info_text(layouts).encode('utf-8')), 'roi_info.txt')})
+    client.post('/api/set-order', json={'value': 1})
+    frames = [render_frame(rng, width, height, boxes, font, languages) for _ in range(args.frames)]
+
+    levels = []
+    outcomes = []
+    for concurrency in (int(v) for v in args.concurrency.split(',')):
+        level, level_outcomes = run_level(service, frames, concurrency, args.requests, args.ocr_mode)
+        levels.append(level)
+        outcomes.extend(level_outcomes)
+
+    print(json.dumps({
+        'parameters': {
+            'size': args.size,
+            'rois': args.rois,
+            'frames': args.frames,
+            'font_size': args.font_size,
+            'languages': languages,
+            'ocr_mode': args.ocr_mode,
+            'backend': args.backend,
+            'seed': args.seed,
+            'ocr_engine': service.ocr_engine.stats().get('engine'),
+            'ocr_max_workers': service.ocr_max_workers,
+            'threshold_scope': service.threshold_scope,
+            'text_height': service.ocr_text_height
+        },
+        'levels': levels,
+        'accuracy': accuracy(outcomes)
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,39 @@
-from flask import Flask, request, jsonify
-from azure.storage.blob import BlobServiceClient
+from flask import Flask, request, jsonify, Response, g, stream_with_context
 import os
 from werkzeug.utils import secure_filename
 import uuid
-from datetime import datetime
-import cv2
-import numpy as np
+from datetime import datetime, timedelta, timezone
 import logging
-import pytesseract
-from PIL import Image
 import io
+import atexit
+from contextlib import contextmanager
 from flask_swagger_ui import get_swaggerui_blueprint
+from azure.core.exceptions import ResourceNotFoundError
 import json
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.services.admission import AdmissionController, AdmissionRejectedError
+from app.services.blob_listing import MAX_PAGE_SIZE, PageCache, list_blob_page, stream_json_array
+from app.services.bulk_delete import (
+    MAX_BATCH_SIZE, delete_in_batches, parse_selection, select_blobs, summarize
+)
+from app.services.block_upload import UploadTooLargeError, upload_stream_in_blocks
+from app.services.config_cache import CachedConfigBlob
+from app.services.frame_state import FrameStateCache
+from app.services.job_queue import JobQueue, QueueFullError
+from app.services.metrics import BYTES_BUCKETS, CONTENT_TYPE, COUNT_BUCKETS, MetricsRegistry
+from app.services.ocr_engine import DEFAULT_LANG, create_engine
+from app.services.ocr_pipeline import OCR_MODES, OcrPipeline, elapsed_ms
+from app.services.preprocessing import THRESHOLD_SCOPES, preprocess_image
+from app.services.result_cache import ResultCache, result_cache_key
+from app.services.result_store import ResultStore, utc
+from app.services.result_writer import WriteBehindWriter
+from app.services.roi_layout import parse_roi_info, parse_set_order, resolve_layout
+from app.services.storage import STORAGE_BACKENDS, DiskCache, create_storage
+from app.services.template_registry import TemplateConflictError, TemplateNotFoundError, TemplateRegistry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,109 +51,429 @@ swaggerui_blueprint = get_swaggerui_blueprint(
 )
 app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 
-# Azure Storage configuration
+# Storage configuration. STORAGE_BACKEND=local|memory runs the service without Azure,
+# containers then default to local names.
 try:
+    storage_backend = os.getenv('STORAGE_BACKEND', 'azure')
+    if storage_backend not in STORAGE_BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND must be one of {', '.join(STORAGE_BACKENDS)}")
+    offline = storage_backend != 'azure'
+
     connection_string = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
-    container_name = os.getenv('AZURE_STORAGE_CONTAINER_NAME')
-    config_container_name = os.getenv('AZURE_STORAGE_CONFIG_CONTAINER_NAME')
-    set_order_container_name = os.getenv('AZURE_STORAGE_SET_ORDER_CONTAINER_NAME')
-    ocr_results_container_name = os.getenv('AZURE_STORAGE_OCR_RESULTS_CONTAINER_NAME')
+    container_name = os.getenv('AZURE_STORAGE_CONTAINER_NAME', 'images' if offline else None)
+    config_container_name = os.getenv('AZURE_STORAGE_CONFIG_CONTAINER_NAME', 'config' if offline else None)
+    set_order_container_name = os.getenv('AZURE_STORAGE_SET_ORDER_CONTAINER_NAME', 'set-order' if offline else None)
+    ocr_results_container_name = os.getenv('AZURE_STORAGE_OCR_RESULTS_CONTAINER_NAME', 'ocr-results' if offline else None)
 
-    if not all([connection_string, container_name, config_container_name, 
+    if not all([connection_string or offline, container_name, config_container_name, 
                 set_order_container_name, ocr_results_container_name]):
         raise ValueError("Missing required environment variables")
 
-    blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+    blob_service_client = create_storage(
+        storage_backend,
+        connection_string=connection_string,
+        root=os.getenv('LOCAL_STORAGE_ROOT', 'storage')
+    )
     container_client = blob_service_client.get_container_client(container_name)
     config_container_client = blob_service_client.get_container_client(config_container_name)
     set_order_container_client = blob_service_client.get_container_client(set_order_container_name)
     ocr_results_container_client = blob_service_client.get_container_client(ocr_results_container_name)
+
+    # Optional read-through disk cache for the config files and recently uploaded or
+    # read images; OCR results are written once and rarely read back, so they bypass it
+    storage_cache_dir = os.getenv('STORAGE_CACHE_DIR')
+    storage_cache = DiskCache(
+        storage_cache_dir,
+        max_bytes=int(os.getenv('STORAGE_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+        ttl_seconds=float(os.getenv('STORAGE_CACHE_TTL_SECONDS', '30')),
+        max_object_bytes=int(os.getenv('STORAGE_CACHE_MAX_OBJECT_BYTES', str(8 * 1024 * 1024)))
+    ) if storage_cache_dir else None
+    if storage_cache is not None:
+        container_client = storage_cache.wrap(container_client)
+        config_container_client = storage_cache.wrap(config_container_client)
+        set_order_container_client = storage_cache.wrap(set_order_container_client)
 except Exception as e:
-    logger.error(f"Failed to initialize Azure Storage: {str(e)}")
+    logger.error(f"Failed to initialize storage: {str(e)}")
     raise
 
-def preprocess_image(image):
-    """Preprocess image for better OCR results"""
-    try:
-        # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply thresholding to preprocess the image
-        gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-        
-        # Apply dilation to connect text components
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3,3))
-        gray = cv2.dilate(gray, kernel, iterations=1)
-        
-        return gray
-    except Exception as e:
-        logger.error(f"Error in image preprocessing: {str(e)}")
-        return image
+# Image uploads are streamed into staged blocks, keeping a few blocks in memory
+upload_block_size = int(os.getenv('UPLOAD_BLOCK_SIZE', str(4 * 1024 * 1024)))
+upload_max_concurrency = int(os.getenv('UPLOAD_MAX_CONCURRENCY', '4'))
+upload_max_bytes = int(os.getenv('UPLOAD_MAX_BYTES', str(50 * 1024 * 1024)))
+
+# Image listing pages are cached briefly so paging clients don't hit storage repeatedly
+image_page_cache = PageCache(ttl_seconds=float(os.getenv('IMAGE_LIST_CACHE_TTL_SECONDS', '10')))
+
+# Bulk deletes go out as batch requests (at most 256 blobs each), a few in flight at once
+bulk_delete_batch_size = min(int(os.getenv('BULK_DELETE_BATCH_SIZE', str(MAX_BATCH_SIZE))), MAX_BATCH_SIZE)
+bulk_delete_concurrency = max(1, int(os.getenv('BULK_DELETE_CONCURRENCY', '4')))
+
+# Config caches
+roi_cache_ttl = float(os.getenv('ROI_CACHE_TTL_SECONDS', '30'))
+set_order_cache_ttl = float(os.getenv('SET_ORDER_CACHE_TTL_SECONDS', '5'))
+roi_cache = CachedConfigBlob(
+    config_container_client.get_blob_client('roi_info.txt'),
+    parse_roi_info,
+    ttl_seconds=roi_cache_ttl
+)
+set_order_cache = CachedConfigBlob(
+    set_order_container_client.get_blob_client('set_order.txt'),
+    parse_set_order,
+    ttl_seconds=set_order_cache_ttl
+)
+
+# Template registry: named ROI layouts (templates/<id>.json in the config container) that
+# OCR requests select with template_id, so stations with different templates can share
+# an instance without switching the global set order
+template_registry = TemplateRegistry(
+    config_container_client,
+    ttl_seconds=float(os.getenv('TEMPLATE_CACHE_TTL_SECONDS', '30'))
+)
+
+# OCR worker pool, shared by all requests of this process. The default splits the
+# cores between gunicorn workers (WEB_CONCURRENCY) so they don't oversubscribe the CPU.
+ocr_max_workers = int(os.getenv('OCR_MAX_WORKERS', '0')) or max(
+    1, (os.cpu_count() or 1) // max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+)
+# Each tesseract process should stay single-threaded, parallelism comes from the pool
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+ocr_executor = ThreadPoolExecutor(max_workers=ocr_max_workers, thread_name_prefix='ocr')
+
+# Admission control for OCR (requests, batch images, async jobs and the FastAPI sessions):
+# one token per image being OCRed, the budget sized to the cores and shared by the
+# gunicorn workers of the machine through lock files in OCR_ADMISSION_LOCK_DIR. Requests
+# beyond it wait in a bounded queue up to a deadline and are answered 429 with
+# Retry-After instead of slowing every request down.
+ocr_admission = AdmissionController(
+    tokens=int(os.getenv('OCR_ADMISSION_TOKENS', '0')) or (os.cpu_count() or 1),
+    max_queue=int(os.getenv('OCR_ADMISSION_MAX_QUEUE', '16')),
+    max_wait_seconds=float(os.getenv('OCR_ADMISSION_MAX_WAIT_SECONDS', '10')),
+    lock_dir=os.getenv('OCR_ADMISSION_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'wrembly-ocr-admission'))
+) if os.getenv('OCR_ADMISSION', '1').lower() in ('1', 'true') else None
+
+# Batch OCR: images of one batch are decoded and dispatched by a separate pool so
+# that their per-ROI tasks never wait behind their own parent task in ocr_executor
+ocr_batch_concurrency = int(os.getenv('OCR_BATCH_CONCURRENCY', str(ocr_max_workers)))
+ocr_batch_max_images = int(os.getenv('OCR_BATCH_MAX_IMAGES', '100'))
+# Zip members are checked against UPLOAD_MAX_BYTES and this total before being decompressed
+ocr_batch_max_bytes = int(os.getenv('OCR_BATCH_MAX_BYTES', str(256 * 1024 * 1024)))
+ocr_batch_executor = ThreadPoolExecutor(max_workers=ocr_batch_concurrency, thread_name_prefix='ocr-batch')
+
+# OCR results are persisted write-behind: responses return first, results are
+# uploaded in batches by a background thread and drained at shutdown
+result_writer = WriteBehindWriter(
+    ocr_results_container_client,
+    max_buffer=int(os.getenv('RESULT_WRITER_BUFFER_SIZE', '1000')),
+    batch_size=int(os.getenv('RESULT_WRITER_BATCH_SIZE', '32')),
+    flush_interval=float(os.getenv('RESULT_WRITER_FLUSH_INTERVAL_SECONDS', '1')),
+    max_retries=int(os.getenv('RESULT_WRITER_MAX_RETRIES', '3')),
+    upload_concurrency=int(os.getenv('RESULT_WRITER_UPLOAD_CONCURRENCY', '4'))
+)
+atexit.register(result_writer.close)
+
+# Every OCR result is also appended to hourly, compressed JSONL shards with an index by
+# layout and time (shards/ in the results container), queried by GET /api/ocr-results
+result_store = ResultStore(
+    ocr_results_container_client,
+    flush_interval=float(os.getenv('RESULT_SHARD_FLUSH_INTERVAL_SECONDS', '5')),
+    max_buffer=int(os.getenv('RESULT_SHARD_BUFFER_SIZE', '10000')),
+    max_shard_bytes=int(os.getenv('RESULT_SHARD_MAX_BYTES', str(64 * 1024 * 1024)))
+) if os.getenv('RESULT_SHARDS', '1').lower() in ('1', 'true') else None
+if result_store is not None:
+    atexit.register(result_store.close)
+result_query_max_days = float(os.getenv('RESULT_QUERY_MAX_DAYS', '31'))
+
+def store_result_record(layout, ocr_mode, results, result_file=None, **fields):
+    """Append an OCR result to the indexed result shards"""
+    if result_store is not None:
+        result_store.append({**layout, 'ocr_mode': ocr_mode, 'result_file': result_file, 'results': results, **fields})
+
+def new_result_filename(prefix):
+    """Collision-free result blob name: timestamp plus a random suffix"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f"{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}.json"
+
+# Content-addressed OCR result cache: identical frames (same bytes, set order and
+# ROI layout) are answered from memory, optionally backed by blobs in the results container
+result_cache_max_bytes = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+result_cache_persistent = os.getenv('RESULT_CACHE_PERSISTENT', '0').lower() in ('1', 'true')
+result_cache = ResultCache(
+    result_cache_max_bytes,
+    container_client=ocr_results_container_client if result_cache_persistent else None,
+    writer=result_writer
+) if result_cache_max_bytes > 0 else None
+
+def layout_key(layout):
+    """Identity of a resolved ROI layout: its set order, or its template and version"""
+    if layout.get('template_id'):
+        return f"template:{layout['template_id']}@{layout['template_version']}"
+    return layout['set_order']
+
+def ocr_cache_key(image_data, layout, rois, ocr_mode):
+    """Result cache key for an image, or None when the cache is disabled"""
+    if result_cache is None:
+        return None
+    # Engines may read the same pixels differently, workers sharing the persistent tier
+    # can run different ones
+    return result_cache_key(
+        image_data, layout_key(layout), rois, ocr_mode, threshold_scope, ocr_text_height, ocr_engine.name
+    )
+
+# Async OCR jobs (POST /api/ocr?async=1)
+ocr_job_workers = int(os.getenv('OCR_JOB_WORKERS', str(ocr_batch_concurrency)))
+ocr_job_queue_size = int(os.getenv('OCR_JOB_QUEUE_SIZE', '100'))
+# How long a job keeps retrying for an admission token before it fails
+ocr_job_max_admission_wait = float(os.getenv('OCR_JOB_MAX_ADMISSION_WAIT_SECONDS', '60'))
+
+# Otsu threshold scope: 'image' binarizes the union of all ROIs in one pass,
+# 'roi' thresholds every ROI separately (slower, can be more accurate)
+threshold_scope = os.getenv('OCR_THRESHOLD_SCOPE', 'image')
+if threshold_scope not in THRESHOLD_SCOPES:
+    raise ValueError(f"Invalid OCR_THRESHOLD_SCOPE: {threshold_scope}")
+
+# Text height normalization (opt-in): every ROI is rescaled so its text is about this many
+# pixels high (estimated from connected components or the ROI's text_height hint) before
+# it is binarized, so tesseract time per ROI no longer follows the camera resolution.
+# 0 (the default) leaves ROIs at their source size.
+ocr_text_height = float(os.getenv('OCR_TEXT_HEIGHT', '0'))
+if ocr_text_height < 0:
+    raise ValueError(f"Invalid OCR_TEXT_HEIGHT: {ocr_text_height}")
+
+# OCR engine: 'auto' keeps persistent tesserocr handles (one per pool thread) when
+# tesserocr is installed and falls back to spawning tesseract through pytesseract
+ocr_engine = create_engine(os.getenv('OCR_ENGINE', 'auto'), pool_size=ocr_max_workers)
+logger.info(f"Using OCR engine: {ocr_engine.name}")
+
+# OCR mode: 'per_roi' runs tesseract once per ROI, 'packed' runs it once per image
+# on a canvas holding all ROIs. Can be overridden per request with the ocr_mode field.
+default_ocr_mode = os.getenv('OCR_MODE', 'per_roi')
+if default_ocr_mode not in OCR_MODES:
+    raise ValueError(f"Invalid OCR_MODE: {default_ocr_mode}")
+
+# ROI change detection (opt-in): per station and layout, ROIs whose pixels match the last
+# OCRed frame reuse its text and blank ROIs are skipped, without running tesseract.
+# Requests without a station_id are always OCRed in full.
+frame_states = FrameStateCache(
+    change_threshold=float(os.getenv('OCR_CHANGE_THRESHOLD', '24')),
+    blank_stddev=float(os.getenv('OCR_BLANK_STDDEV', '2.0')),
+    max_entries=int(os.getenv('OCR_FRAME_STATE_MAX_ENTRIES', '1024'))
+) if os.getenv('OCR_CHANGE_DETECTION', '0').lower() in ('1', 'true') else None
+
+# OCR pipeline (decode, preprocess, tesseract) shared by the OCR endpoints, jobs and batches
+ocr_pipeline = OcrPipeline(ocr_engine, ocr_executor, threshold_scope, ocr_text_height, frame_states)
+
+# Prometheus metrics, served per worker process at /metrics
+metrics = MetricsRegistry('wrembly')
+ocr_stage_seconds = metrics.histogram(
+    'ocr_stage_seconds', 'Duration of each OCR stage', labelnames=('stage',)
+)
+request_seconds = metrics.histogram(
+    'request_seconds', 'Duration of API requests', labelnames=('endpoint', 'method')
+)
+request_errors = metrics.counter(
+    'request_errors_total', 'API requests answered with an error status', labelnames=('endpoint', 'status')
+)
+ocr_rois = metrics.histogram('ocr_rois', 'ROIs per OCRed image', COUNT_BUCKETS)
+image_bytes = metrics.histogram(
+    'image_bytes', 'Size of images received', BYTES_BUCKETS, labelnames=('endpoint',)
+)
+storage_transfer_bytes = metrics.histogram(
+    'storage_transfer_bytes', 'Bytes sent to blob storage per operation', BYTES_BUCKETS, labelnames=('operation',)
+)
+ocr_rois_skipped = metrics.counter(
+    'ocr_rois_skipped_total', 'ROIs answered without tesseract', labelnames=('reason',)
+)
+admission_wait_seconds = metrics.histogram(
+    'ocr_admission_wait_seconds', 'Time OCR requests waited for a token'
+)
+admission_rejected = metrics.counter(
+    'ocr_admission_rejected_total', 'OCR requests answered 429 by admission control', labelnames=('reason',)
+)
+bulk_deleted_images = metrics.counter(
+    'bulk_delete_images_total', 'Images processed by bulk deletes', labelnames=('status',)
+)
+
+def cache_lookup_samples():
+    """Hit/miss counters the caches already keep, read at scrape time"""
+    samples = {}
+    caches = {
+        'roi_info': roi_cache.stats(),
+        'set_order': set_order_cache.stats(),
+        'templates': template_registry.stats(),
+        'image_list': image_page_cache.stats(),
+        'result': result_cache.stats() if result_cache else {},
+        'storage': storage_cache.stats() if storage_cache else {}
+    }
+    for cache, stats in caches.items():
+        for outcome in ('hits', 'persistent_hits', 'revalidations', 'misses'):
+            if outcome in stats:
+                samples[(cache, outcome)] = stats[outcome]
+    return samples
+
+metrics.collect(
+    'cache_lookups_total', 'Cache lookups by cache and outcome', cache_lookup_samples,
+    labelnames=('cache', 'outcome')
+)
+metrics.collect(
+    'result_writer_results_total', 'OCR result blobs handled by the write-behind writer',
+    lambda: {outcome: result_writer.stats()[outcome] for outcome in ('written', 'failed', 'dropped', 'retries')},
+    labelnames=('outcome',)
+)
+if ocr_admission is not None:
+    metrics.collect(
+        'ocr_admission_in_use', 'OCR tokens held by this worker',
+        lambda: {(): ocr_admission.stats()['in_use']}, kind='gauge'
+    )
+    metrics.collect(
+        'ocr_admission_queued', 'OCR requests of this worker waiting for a token',
+        lambda: {(): ocr_admission.stats()['queued']}, kind='gauge'
+    )
+if result_store is not None:
+    metrics.collect(
+        'result_store_records_total', 'OCR result records handled by the result shard store',
+        lambda: {outcome: result_store.stats()[outcome] for outcome in ('appended', 'written', 'dropped')},
+        labelnames=('outcome',)
+    )
+metrics.collect(
+    'result_writer_buffered', 'OCR results waiting to be written',
+    lambda: {(): result_writer.stats()['buffered']}, kind='gauge'
+)
+
+def record_timings(timings, *stages):
+    """Feed millisecond stage timings into the OCR stage histogram"""
+    for stage in stages:
+        if stage in timings:
+            ocr_stage_seconds.observe(timings[stage] / 1000, stage=stage)
+
+@contextmanager
+def ocr_admitted(timings):
+    """Hold an OCR admission token while the block runs, recording the wait in timings"""
+    if ocr_admission is None:
+        yield
+        return
+    with ocr_admission.admit() as waited:
+        timings['admission'] = round(waited * 1000, 2)
+        admission_wait_seconds.observe(waited)
+        yield
+
+def recognize_text(processed_image, lang=DEFAULT_LANG, psm=None, whitelist=None):
+    """Run Tesseract OCR on an already preprocessed image"""
+    return ocr_pipeline.recognize_text(processed_image, lang=lang, psm=psm, whitelist=whitelist)
 
 def process_image_with_tesseract(image):
     """Process image using Tesseract OCR"""
-    try:
-        # Preprocess image
-        processed_image = preprocess_image(image)
-        
-        # Convert numpy array to PIL Image
-        pil_image = Image.fromarray(processed_image)
-        
-        # Perform OCR
-        text = pytesseract.image_to_string(pil_image, lang='vie+eng')
-        
-        return text.strip()
-    except Exception as e:
-        logger.error(f"Error in Tesseract processing: {str(e)}")
-        return None
+    return recognize_text(preprocess_image(image))
 
-def get_roi_coordinates(set_order):
-    """Get ROI coordinates for the specified set order"""
-    try:
-        # Get ROI info content
-        roi_blob_client = config_container_client.get_blob_client('roi_info.txt')
-        roi_content = roi_blob_client.download_blob().readall().decode('utf-8')
-        
-        # Parse ROI content
-        lines = roi_content.strip().split('\n')
-        current_set = None
-        coordinates = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            if line.startswith('Bộ khung'):
-                # Extract set number from "Bộ khung X: Y vùng"
-                set_parts = line.split(':')
-                if len(set_parts) >= 1:
-                    set_number = set_parts[0].split()[2]  # Get the number after "Bộ khung"
-                    try:
-                        current_set = int(set_number)
-                        coordinates = []  # Reset coordinates for new set
-                    except ValueError:
-                        logger.error(f"Invalid set number format: {set_number}")
-                        continue
-            elif line.startswith('('):
-                try:
-                    # Parse coordinates (x1, y1, x2, y2)
-                    coords = line.strip('()').split(',')
-                    if len(coords) == 4:
-                        coords = [int(x.strip()) for x in coords]
-                        coordinates.append(coords)
-                except (ValueError, IndexError) as e:
-                    logger.error(f"Error parsing coordinates: {line}, Error: {str(e)}")
-                    continue
-            
-            # If we've found the target set and have coordinates, return them
-            if current_set == set_order and coordinates:
-                return coordinates
-        
-        raise ValueError(f"Set order {set_order} not found in ROI info or no coordinates found")
-    except Exception as e:
-        logger.error(f"Error getting ROI coordinates: {str(e)}")
-        raise
+def ocr_image(image_data, rois, ocr_mode, timings, state_key=None):
+    """Decode an uploaded image and OCR its ROIs, filling decode/preprocess/ocr timings.
+
+    With a state_key (station and layout), unchanged and blank ROIs are answered from the
+    frame state instead of tesseract and marked with a 'skipped' reason.
+    """
+    state = frame_states.state(state_key) if frame_states is not None and state_key is not None else None
+    results = ocr_pipeline.ocr_image(image_data, rois, ocr_mode, timings, state)
+    for result in results:
+        if result.get('skipped'):
+            ocr_rois_skipped.inc(reason=result['skipped'])
+
+    image_bytes.observe(len(image_data), endpoint='ocr')
+    ocr_rois.observe(len(rois))
+    record_timings(timings, 'decode', 'preprocess', 'ocr')
+    return results
+
+def requested_layout():
+    """Explicit set_order or template_id of an OCR request (form field or query parameter)"""
+    set_order = request.form.get('set_order') or request.args.get('set_order')
+    template_id = request.form.get('template_id') or request.args.get('template_id')
+    if set_order and template_id:
+        raise ValueError('Pass either set_order or template_id, not both')
+    if set_order:
+        try:
+            set_order = int(set_order)
+        except ValueError:
+            raise ValueError('set_order must be an integer')
+    else:
+        set_order = None
+    return set_order, template_id or None
+
+def count_skipped(results):
+    """Number of ROIs answered without running tesseract"""
+    return sum(1 for result in results if result.get('skipped'))
+
+def recognized_all(results):
+    """Whether recognition succeeded for every ROI; failed ones carry an 'error' and must
+    not be served from the result cache"""
+    return not any(result.get('error') for result in results)
+
+def resolve_roi_layout(set_order=None, template_id=None):
+    """Resolve the ROI layout of a request (see resolve_layout), ValueError if unusable"""
+    return resolve_layout(template_registry, roi_cache, set_order_cache, set_order, template_id)
+
+def run_ocr_job(job_id, payload):
+    """Job queue handler: OCR an image submitted with ?async=1 and store its results"""
+    timings = {}
+    deadline = time.monotonic() + ocr_job_max_admission_wait
+    while True:
+        try:
+            with ocr_admitted(timings):
+                results = ocr_image(
+                    payload['image_data'], payload['rois'], payload['ocr_mode'], timings, payload['state_key']
+                )
+            break
+        except AdmissionRejectedError as e:
+            # No client is waiting on a queued job: retry once the budget should have room,
+            # until OCR_JOB_MAX_ADMISSION_WAIT_SECONDS so saturation still fails jobs
+            if time.monotonic() + e.retry_after > deadline:
+                raise RuntimeError(f"No OCR capacity within {ocr_job_max_admission_wait:g}s: {str(e)}")
+            logger.info(f"OCR job {job_id} waits {e.retry_after}s for an admission token ({e.reason})")
+            time.sleep(e.retry_after)
+    if not results:
+        raise ValueError('No valid ROIs processed')
+
+    stage_start = time.perf_counter()
+    result_filename = f"ocr_job_{job_id}.json"
+    result_blob_client = ocr_results_container_client.get_blob_client(result_filename)
+    content = json.dumps(results, ensure_ascii=False)
+    result_blob_client.upload_blob(content, overwrite=True)
+    store_result_record(
+        payload['layout'], payload['ocr_mode'], results, result_filename,
+        station_id=payload['station_id'], job_id=job_id
+    )
+    timings['upload'] = elapsed_ms(stage_start)
+    storage_transfer_bytes.observe(len(content.encode('utf-8')), operation='job_result')
+    record_timings(timings, 'upload')
+
+    return {
+        **payload['layout'],
+        'ocr_mode': payload['ocr_mode'],
+        'results': results,
+        'result_file': result_filename,
+        'skipped_rois': count_skipped(results),
+        'timings_ms': timings
+    }
+
+def store_job_status(job):
+    """Job queue hook, run by the job worker: record a job's status as GET /api/ocr/jobs/<id>
+    returns it in the OCR results container, so that every worker can answer it"""
+    blob_client = ocr_results_container_client.get_blob_client(f"ocr_job_status/{job.id}.json")
+    blob_client.upload_blob(json.dumps(job.to_dict(), ensure_ascii=False), overwrite=True)
+
+ocr_job_queue = JobQueue(
+    run_ocr_job, workers=ocr_job_workers, max_queue=ocr_job_queue_size, on_status=store_job_status
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unmatched'
+    if 'request_start' in g and endpoint != 'get_metrics':
+        request_seconds.observe(time.perf_counter() - g.request_start, endpoint=endpoint, method=request.method)
+    if response.status_code >= 400:
+        request_errors.inc(endpoint=endpoint, status=response.status_code)
+    return response
 
 @app.route('/')
 def home():
@@ -153,30 +495,61 @@ def upload_image():
       - in: formData
         name: file
         type: file
-        required: true
-        description: The image file to upload
+        required: false
+        description: The image file to upload (multipart form)
+      - in: query
+        name: filename
+        type: string
+        required: false
+        description: Original filename when the image is sent as a raw application/octet-stream body
     responses:
       200:
         description: File uploaded successfully
       400:
         description: No file part or no selected file
+      413:
+        description: File exceeds the maximum upload size
       500:
         description: Server error
     """
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file part'}), 400
+        # Reject oversized bodies before reading any of them
+        if request.content_length is not None and request.content_length > upload_max_bytes:
+            return jsonify({'error': f"File exceeds the maximum size of {upload_max_bytes} bytes"}), 413
+
+        if request.mimetype == 'application/octet-stream':
+            # Raw body: stream straight from the socket
+            filename = request.args.get('filename', '')
+            stream = request.stream
+        else:
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file part'}), 400
+            file = request.files['file']
+            filename = file.filename
+            # Multipart parts larger than a few hundred KB are spooled to disk by werkzeug
+            stream = file.stream
         
-        file = request.files['file']
-        if file.filename == '':
+        if filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
-        if file:
-            original_filename = secure_filename(file.filename)
+        if stream:
+            original_filename = secure_filename(filename)
             storage_filename = f"{uuid.uuid4()}_{original_filename}"
             
             blob_client = container_client.get_blob_client(storage_filename)
-            blob_client.upload_blob(file.read(), overwrite=True)
+            try:
+                uploaded_bytes = upload_stream_in_blocks(
+                    blob_client,
+                    stream,
+                    block_size=upload_block_size,
+                    max_concurrency=upload_max_concurrency,
+                    max_size=upload_max_bytes
+                )
+            except UploadTooLargeError as e:
+                return jsonify({'error': str(e)}), 413
+            image_page_cache.clear()
+            image_bytes.observe(uploaded_bytes, endpoint='upload')
+            storage_transfer_bytes.observe(uploaded_bytes, operation='image_upload')
             
             return jsonify({
                 'message': 'File uploaded successfully',
@@ -190,24 +563,61 @@ def upload_image():
 @app.route('/api/images', methods=['GET'])
 def list_images():
     """
-    List all images in Azure Storage
+    List images in Azure Storage, one page at a time
     ---
+    parameters:
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        description: Page size (default 1000, max 5000)
+      - in: query
+        name: prefix
+        type: string
+        required: false
+        description: Only list images whose storage filename starts with this prefix
+      - in: query
+        name: continuation_token
+        type: string
+        required: false
+        description: Token from the X-Continuation-Token header of the previous page
     responses:
       200:
-        description: List of images
+        description: List of images; X-Continuation-Token is set when more pages follow
+      400:
+        description: Invalid paging parameters
       500:
         description: Server error
     """
     try:
-        blobs = container_client.list_blobs()
-        images = []
-        for blob in blobs:
-            original_filename = blob.name.split('_', 1)[1] if '_' in blob.name else blob.name
-            images.append({
-                'storage_filename': blob.name,
-                'original_filename': original_filename
-            })
-        return jsonify(images)
+        try:
+            limit = int(request.args.get('limit', '1000'))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            return jsonify({'error': f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+        prefix = request.args.get('prefix') or None
+        continuation_token = request.args.get('continuation_token') or None
+
+        cache_key = (prefix, limit, continuation_token)
+        page = image_page_cache.get(cache_key)
+        if page is None:
+            blobs, next_token = list_blob_page(container_client, prefix, limit, continuation_token)
+            images = []
+            for blob in blobs:
+                original_filename = blob.name.split('_', 1)[1] if '_' in blob.name else blob.name
+                images.append({
+                    'storage_filename': blob.name,
+                    'original_filename': original_filename
+                })
+            page = (images, next_token)
+            image_page_cache.put(cache_key, page)
+
+        images, next_token = page
+        response = Response(stream_json_array(images), mimetype='application/json')
+        if next_token:
+            response.headers['X-Continuation-Token'] = next_token
+        return response
     except Exception as e:
         logger.error(f"Error in list_images: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -232,11 +642,76 @@ def delete_image(filename):
     try:
         blob_client = container_client.get_blob_client(filename)
         blob_client.delete_blob()
+        image_page_cache.clear()
         return jsonify({'message': 'File deleted successfully'})
     except Exception as e:
         logger.error(f"Error in delete_image: {str(e)}")
         return jsonify({'error': str(e)}), 404
 
+@app.route('/api/images/bulk-delete', methods=['POST'])
+def bulk_delete_images():
+    """
+    Delete many images with batched storage requests
+    ---
+    parameters:
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            names:
+              type: array
+              items:
+                type: string
+              description: Storage filenames to delete (exclusive with prefix/older_than)
+            prefix:
+              type: string
+              description: Delete images whose storage filename starts with this prefix
+            older_than:
+              type: string
+              description: Delete images last modified before this ISO 8601 datetime (UTC unless an offset is given)
+            dry_run:
+              type: boolean
+              description: Only report what would be deleted
+    responses:
+      200:
+        description: One JSON line per image (name, status deleted / not_found / failed / would_delete, error), then a summary line
+      400:
+        description: Invalid selection
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': 'A JSON object body is required'}), 400
+    try:
+        names, prefix, older_than = parse_selection(body.get('names'), body.get('prefix'), body.get('older_than'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    dry_run = bool(body.get('dry_run', False))
+
+    def generate():
+        summary = {'dry_run': dry_run}
+        start = time.perf_counter()
+        try:
+            selected = names if names is not None else select_blobs(container_client, prefix, older_than)
+            for outcomes in delete_in_batches(container_client, selected, batch_size=bulk_delete_batch_size,
+                                              concurrency=bulk_delete_concurrency, dry_run=dry_run):
+                summarize(outcomes, summary)
+                for outcome in outcomes:
+                    if not dry_run:
+                        bulk_deleted_images.inc(status=outcome['status'])
+                    yield json.dumps(outcome, ensure_ascii=False) + '\n'
+        except Exception as e:
+            logger.error(f"Error in bulk_delete_images: {str(e)}")
+            summary['error'] = str(e)
+        finally:
+            if not dry_run:
+                image_page_cache.clear()
+        summary['elapsed_ms'] = elapsed_ms(start)
+        yield json.dumps({'summary': summary}, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/roi-info', methods=['POST'])
 def update_roi_info():
     """
@@ -252,7 +727,7 @@ def update_roi_info():
       200:
         description: ROI info updated successfully
       400:
-        description: Invalid file or no file part
+        description: Invalid file, no file part or invalid ROI hints
       500:
         description: Server error
     """
@@ -265,8 +740,15 @@ def update_roi_info():
             return jsonify({'error': 'No selected file'}), 400
         
         if file and file.filename == 'roi_info.txt':
+            roi_content = file.read()
+            try:
+                parse_roi_info(roi_content.decode('utf-8'), strict=True)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             blob_client = config_container_client.get_blob_client('roi_info.txt')
-            blob_client.upload_blob(file.read(), overwrite=True)
+            upload_result = blob_client.upload_blob(roi_content, overwrite=True)
+            # Make the new layout visible to this worker immediately
+            roi_cache.prime(roi_content.decode('utf-8'), upload_result.get('etag'))
             return jsonify({'message': 'ROI info updated successfully'})
         else:
             return jsonify({'error': 'Invalid file name'}), 400
@@ -293,6 +775,136 @@ def get_roi_info():
         logger.error(f"Error in get_roi_info: {str(e)}")
         return jsonify({'error': str(e)}), 404
 
+@app.route('/api/templates', methods=['GET'])
+def list_templates():
+    """
+    List ROI layout templates
+    ---
+    responses:
+      200:
+        description: IDs of the stored templates
+      500:
+        description: Server error
+    """
+    try:
+        return jsonify({'templates': template_registry.list()})
+    except Exception as e:
+        logger.error(f"Error in list_templates: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/templates/<template_id>', methods=['PUT'])
+def put_template(template_id):
+    """
+    Create or update a ROI layout template, storing it as a new version
+    ---
+    parameters:
+      - in: path
+        name: template_id
+        type: string
+        required: true
+        description: Template ID (letters, digits, "_", "-", ".")
+      - in: body
+        name: body
+        required: true
+        schema:
+          type: object
+          properties:
+            rois:
+              type: array
+              description: ROIs as [x1, y1, x2, y2] or {"coordinates": [x1, y1, x2, y2]}
+            description:
+              type: string
+            expected_version:
+              type: integer
+              description: Reject the update unless the stored template is at this version (0 for a new template)
+    responses:
+      200:
+        description: The stored template with its new version
+      400:
+        description: Invalid template
+      409:
+        description: The template changed since expected_version
+      500:
+        description: Server error
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or 'rois' not in data:
+            return jsonify({'error': 'Missing rois in request body'}), 400
+        expected_version = data.get('expected_version')
+        if expected_version is not None and not isinstance(expected_version, int):
+            return jsonify({'error': 'expected_version must be an integer'}), 400
+
+        try:
+            template = template_registry.put(
+                template_id, data['rois'], description=data.get('description'), expected_version=expected_version
+            )
+        except TemplateConflictError as e:
+            return jsonify({'error': str(e)}), 409
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(template)
+    except Exception as e:
+        logger.error(f"Error in put_template: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/templates/<template_id>', methods=['GET'])
+def get_template(template_id):
+    """
+    Get a ROI layout template
+    ---
+    parameters:
+      - in: path
+        name: template_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: The current version of the template
+      400:
+        description: Invalid template ID
+      404:
+        description: Template not found
+    """
+    try:
+        return jsonify(template_registry.get(template_id))
+    except TemplateNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in get_template: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/templates/<template_id>', methods=['DELETE'])
+def delete_template(template_id):
+    """
+    Delete a ROI layout template
+    ---
+    parameters:
+      - in: path
+        name: template_id
+        type: string
+        required: true
+    responses:
+      200:
+        description: Template deleted
+      400:
+        description: Invalid template ID
+      404:
+        description: Template not found
+    """
+    try:
+        template_registry.delete(template_id)
+        return jsonify({'message': f"Template {template_id} deleted successfully"})
+    except TemplateNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in delete_template: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/ocr', methods=['POST'])
 def process_ocr():
     """
@@ -304,30 +916,60 @@ def process_ocr():
         type: file
         required: true
         description: The image file to process OCR
+      - in: formData
+        name: set_order
+        type: integer
+        required: false
+        description: Set of roi_info.txt to use instead of the global set order
+      - in: formData
+        name: template_id
+        type: string
+        required: false
+        description: Registry template to use instead of the global set order
+      - in: formData
+        name: ocr_mode
+        type: string
+        enum: [per_roi, packed]
+        required: false
+        description: OCR strategy, defaults to the OCR_MODE setting
+      - in: formData
+        name: station_id
+        type: string
+        required: false
+        description: Camera/station sending the frame; with OCR_CHANGE_DETECTION, ROIs unchanged since its previous frame are not OCRed again
+      - in: query
+        name: async
+        type: integer
+        enum: [0, 1]
+        required: false
+        description: When 1, queue the image and return a job ID immediately
     responses:
       200:
         description: OCR results
+      202:
+        description: Job queued, poll /api/ocr/jobs/{job_id}
       400:
         description: Invalid input
+      404:
+        description: Template not found
+      429:
+        description: OCR capacity exhausted (wait queue full or no token before the deadline), retry after Retry-After seconds
       500:
         description: Server error
+      503:
+        description: Async job queue is full
     """
     try:
-        # Get current set order
-        set_order_blob_client = set_order_container_client.get_blob_client('set_order.txt')
-        set_order_str = set_order_blob_client.download_blob().readall().decode('utf-8').strip()
-        try:
-            set_order = int(set_order_str)
-        except ValueError:
-            logger.error(f"Invalid set order value: {set_order_str}")
-            return jsonify({'error': 'Invalid set order value'}), 400
-        
-        # Get ROI coordinates for current set order
+        request_start = time.perf_counter()
+        timings = {}
+
         try:
-            roi_coordinates = get_roi_coordinates(set_order)
+            layout, rois = resolve_roi_layout(*requested_layout())
+        except TemplateNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
         except ValueError as e:
-            logger.error(f"Error getting ROI coordinates: {str(e)}")
             return jsonify({'error': str(e)}), 400
+        timings['config'] = elapsed_ms(request_start)
         
         # Get image from request
         if 'file' not in request.files:
@@ -336,59 +978,417 @@ def process_ocr():
         file = request.files['file']
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
+
+        ocr_mode = request.form.get('ocr_mode', default_ocr_mode)
+        if ocr_mode not in OCR_MODES:
+            return jsonify({'error': f"Invalid ocr_mode, expected one of {', '.join(OCR_MODES)}"}), 400
+
+        # Frames of one station and layout are compared with the previous one
+        station_id = request.form.get('station_id') or request.args.get('station_id') or ''
+        if len(station_id) > 128:
+            return jsonify({'error': 'station_id is too long'}), 400
+        state_key = (station_id, layout_key(layout), ocr_mode) if station_id else None
         
-        # Read and process image
-        image_data = file.read()
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            return jsonify({'error': 'Invalid image file'}), 400
-        
-        # Process OCR for each ROI
-        results = []
-        for i, coords in enumerate(roi_coordinates):
+        if request.args.get('async', '0').lower() in ('1', 'true'):
             try:
-                x1, y1, x2, y2 = coords
-                # Ensure coordinates are within image bounds
-                x1 = max(0, min(x1, img.shape[1]))
-                y1 = max(0, min(y1, img.shape[0]))
-                x2 = max(0, min(x2, img.shape[1]))
-                y2 = max(0, min(y2, img.shape[0]))
-                
-                roi = img[y1:y2, x1:x2]
-                if roi.size == 0:
-                    logger.warning(f"Empty ROI at coordinates {coords}")
-                    continue
-                    
-                text = process_image_with_tesseract(roi)
-                results.append({
-                    'roi_index': i + 1,
-                    'coordinates': coords,
-                    'text': text if text else ''
+                job = ocr_job_queue.submit({
+                    'image_data': file.read(),
+                    'layout': layout,
+                    'rois': rois,
+                    'ocr_mode': ocr_mode,
+                    'station_id': station_id or None,
+                    'state_key': state_key
                 })
-            except Exception as e:
-                logger.error(f"Error processing ROI {i + 1}: {str(e)}")
-                continue
+            except QueueFullError as e:
+                response = jsonify({'error': str(e)})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            return jsonify({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f"/api/ocr/jobs/{job.id}"
+            }), 202
+
+        image_data = file.read()
+
+        # Identical frames are answered from the result cache
+        cache_key = ocr_cache_key(image_data, layout, rois, ocr_mode)
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            timings['total'] = elapsed_ms(request_start)
+            record_timings(timings, 'config')
+            return jsonify({
+                **layout,
+                'ocr_mode': ocr_mode,
+                'results': cached['results'],
+                'result_file': cached['result_file'],
+                'cached': True,
+                'skipped_rois': count_skipped(cached['results']),
+                'timings_ms': timings
+            })
+
+        # Read and process image once a token is free (see OCR_ADMISSION_TOKENS)
+        try:
+            with ocr_admitted(timings):
+                results = ocr_image(image_data, rois, ocr_mode, timings, state_key)
+        except AdmissionRejectedError as e:
+            admission_rejected.inc(reason=e.reason)
+            response = jsonify({'error': str(e), 'reason': e.reason})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         if not results:
             return jsonify({'error': 'No valid ROIs processed'}), 400
         
-        # Save results to OCR results container
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        result_filename = f"ocr_result_{timestamp}.json"
-        result_blob_client = ocr_results_container_client.get_blob_client(result_filename)
-        result_blob_client.upload_blob(json.dumps(results, ensure_ascii=False), overwrite=True)
+        # Queue results for the OCR results container (written behind the response)
+        stage_start = time.perf_counter()
+        result_filename = new_result_filename('ocr_result')
+        content = json.dumps(results, ensure_ascii=False)
+        if not result_writer.submit(result_filename, content):
+            result_filename = None
+        if cache_key and recognized_all(results):
+            result_cache.put(cache_key, {'results': results, 'result_file': result_filename})
+        store_result_record(layout, ocr_mode, results, result_filename, station_id=station_id or None)
+        timings['upload'] = elapsed_ms(stage_start)
+        timings['total'] = elapsed_ms(request_start)
+        storage_transfer_bytes.observe(len(content.encode('utf-8')), operation='ocr_result')
+        record_timings(timings, 'config', 'upload', 'total')
+        logger.info(f"OCR {layout} ({ocr_mode}): {len(rois)} ROIs, timings (ms) {timings}")
         
         return jsonify({
-            'set_order': set_order,
+            **layout,
+            'ocr_mode': ocr_mode,
             'results': results,
-            'result_file': result_filename
+            'result_file': result_filename,
+            'cached': False,
+            'skipped_rois': count_skipped(results),
+            'timings_ms': timings
         })
     except Exception as e:
         logger.error(f"Error in OCR processing: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def read_zip_member(archive, member):
+    """Decompress one zip member, never more than UPLOAD_MAX_BYTES whatever its header claims"""
+    with archive.open(member) as f:
+        data = f.read(upload_max_bytes + 1)
+    if len(data) > upload_max_bytes:
+        raise ValueError(f"{member.filename} exceeds the maximum size of {upload_max_bytes} bytes")
+    return data
+
+def collect_batch_images(files):
+    """Expand uploaded parts into (filename, bytes) pairs, unpacking zip archives.
+
+    Zip members are checked against the image count, UPLOAD_MAX_BYTES and the batch's
+    OCR_BATCH_MAX_BYTES from their declared sizes before anything is decompressed.
+    """
+    images = []
+    total_bytes = 0
+    for file in files:
+        if file.filename == '':
+            continue
+        data = file.read()
+        if file.filename.lower().endswith('.zip') or zipfile.is_zipfile(io.BytesIO(data)):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                members = [member for member in archive.infolist() if not member.is_dir()]
+                if len(images) + len(members) > ocr_batch_max_images:
+                    raise ValueError(f"Too many images in batch, limit is {ocr_batch_max_images}")
+                for member in members:
+                    if member.file_size > upload_max_bytes:
+                        raise ValueError(f"{member.filename} exceeds the maximum size of {upload_max_bytes} bytes")
+                    total_bytes += member.file_size
+                    if total_bytes > ocr_batch_max_bytes:
+                        raise ValueError(f"Batch exceeds {ocr_batch_max_bytes} bytes of images")
+                for member in members:
+                    images.append((member.filename, read_zip_member(archive, member)))
+        else:
+            if len(images) >= ocr_batch_max_images:
+                raise ValueError(f"Too many images in batch, limit is {ocr_batch_max_images}")
+            total_bytes += len(data)
+            if total_bytes > ocr_batch_max_bytes:
+                raise ValueError(f"Batch exceeds {ocr_batch_max_bytes} bytes of images")
+            images.append((file.filename, data))
+    return images
+
+def ocr_batch_item(index, filename, image_data, layout, rois, ocr_mode):
+    """OCR one image of a batch, returns its NDJSON record"""
+    timings = {}
+    record = {'index': index, 'filename': filename}
+    try:
+        cache_key = ocr_cache_key(image_data, layout, rois, ocr_mode)
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            record['results'] = cached['results']
+            record['cached'] = True
+        else:
+            with ocr_admitted(timings):
+                results = ocr_image(image_data, rois, ocr_mode, timings)
+            if not results:
+                record['error'] = 'No valid ROIs processed'
+            else:
+                record['results'] = results
+                record['cached'] = False
+                if cache_key and recognized_all(results):
+                    result_cache.put(cache_key, {'results': results, 'result_file': None})
+    except AdmissionRejectedError as e:
+        # Per-image counterpart of the 429 of POST /api/ocr, the stream has already started
+        admission_rejected.inc(reason=e.reason)
+        record.update(error=str(e), reason=e.reason, retry_after=e.retry_after)
+    except Exception as e:
+        logger.error(f"Error processing batch image {filename}: {str(e)}")
+        record['error'] = str(e)
+    record['timings_ms'] = timings
+    return record
+
+@app.route('/api/ocr/batch', methods=['POST'])
+def process_ocr_batch():
+    """
+    Process OCR on many images with one set order / ROI lookup, streaming NDJSON results
+    ---
+    parameters:
+      - in: formData
+        name: files
+        type: file
+        required: true
+        description: Image files to process, or zip archives of images
+      - in: formData
+        name: set_order
+        type: integer
+        required: false
+        description: Set of roi_info.txt to use instead of the global set order
+      - in: formData
+        name: template_id
+        type: string
+        required: false
+        description: Registry template to use instead of the global set order
+      - in: formData
+        name: ocr_mode
+        type: string
+        enum: [per_roi, packed]
+        required: false
+        description: OCR strategy, defaults to the OCR_MODE setting
+    responses:
+      200:
+        description: One JSON line per image as it finishes, followed by a summary line
+      400:
+        description: Invalid input
+      404:
+        description: Template not found
+      500:
+        description: Server error
+    """
+    try:
+        try:
+            layout, rois = resolve_roi_layout(*requested_layout())
+        except TemplateNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        files = request.files.getlist('files') + request.files.getlist('file')
+        if not files:
+            return jsonify({'error': 'No file part'}), 400
+
+        ocr_mode = request.form.get('ocr_mode', default_ocr_mode)
+        if ocr_mode not in OCR_MODES:
+            return jsonify({'error': f"Invalid ocr_mode, expected one of {', '.join(OCR_MODES)}"}), 400
+
+        try:
+            images = collect_batch_images(files)
+        except (ValueError, zipfile.BadZipFile) as e:
+            return jsonify({'error': str(e)}), 400
+        if not images:
+            return jsonify({'error': 'No selected file'}), 400
+    except Exception as e:
+        logger.error(f"Error in batch OCR processing: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        batch_start = time.perf_counter()
+        futures = [
+            ocr_batch_executor.submit(ocr_batch_item, i, filename, data, layout, rois, ocr_mode)
+            for i, (filename, data) in enumerate(images)
+        ]
+        records = []
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            if record.get('cached') is False:
+                store_result_record(layout, ocr_mode, record['results'], filename=record['filename'])
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+
+        # Save all results of the batch as one aggregated blob
+        records.sort(key=lambda r: r['index'])
+        summary = {
+            **layout,
+            'ocr_mode': ocr_mode,
+            'images': len(records),
+            'failed': sum(1 for r in records if 'error' in r)
+        }
+        result_filename = new_result_filename('ocr_batch')
+        content = json.dumps(dict(summary, records=records), ensure_ascii=False)
+        if result_writer.submit(result_filename, content):
+            summary['result_file'] = result_filename
+            storage_transfer_bytes.observe(len(content.encode('utf-8')), operation='ocr_batch_result')
+        else:
+            summary['error'] = 'Result buffer full, batch results were not saved'
+        summary['timings_ms'] = {'total': elapsed_ms(batch_start)}
+        logger.info(f"OCR batch {layout} ({ocr_mode}): {summary}")
+        yield json.dumps({'summary': summary}, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/ocr/jobs/<job_id>', methods=['GET'])
+def get_ocr_job(job_id):
+    """
+    Get status and result of an async OCR job
+    ---
+    parameters:
+      - in: path
+        name: job_id
+        type: string
+        required: true
+        description: The job ID returned by POST /api/ocr?async=1
+    responses:
+      200:
+        description: Job status (queued, running, succeeded, failed), with the OCR result once it succeeded
+      404:
+        description: Malformed job ID
+      500:
+        description: Server error
+    """
+    try:
+        job = ocr_job_queue.get(job_id)
+        if job is not None:
+            return jsonify(job.to_dict())
+
+        # Job of another worker or instance: its worker records every status change. Nothing
+        # is recorded while it waits in that worker's queue, so no record means queued.
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return jsonify({'error': 'Job not found'}), 404
+        blob_client = ocr_results_container_client.get_blob_client(f"ocr_job_status/{job_id}.json")
+        try:
+            return jsonify(json.loads(blob_client.download_blob().readall().decode('utf-8')))
+        except ResourceNotFoundError:
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                'submitted_at': None,
+                'started_at': None,
+                'finished_at': None,
+                'wait_seconds': None,
+                'result': None,
+                'error': None
+            })
+    except Exception as e:
+        logger.error(f"Error getting OCR job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ocr/jobs', methods=['GET'])
+def get_ocr_job_queue():
+    """
+    Get async OCR queue statistics
+    ---
+    responses:
+      200:
+        description: Queue depth, running jobs, wait times and rejection counts
+    """
+    return jsonify(ocr_job_queue.stats())
+
+@app.route('/api/ocr/admission', methods=['GET'])
+def get_ocr_admission():
+    """
+    Get OCR admission control statistics of this worker
+    ---
+    responses:
+      200:
+        description: Token budget, tokens in use, queue depth, wait times and rejection counts
+    """
+    return jsonify({'enabled': True, **ocr_admission.stats()} if ocr_admission else {'enabled': False})
+
+def query_time(name, default):
+    """ISO 8601 date or datetime query parameter as aware UTC, naive values are UTC"""
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return utc(datetime.fromisoformat(value))
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+
+@app.route('/api/ocr-results', methods=['GET'])
+def query_ocr_results():
+    """
+    Stream stored OCR results of one layout in a time range
+    ---
+    parameters:
+      - in: query
+        name: set_order
+        type: integer
+        required: false
+        description: Set order whose results to return (this or template_id is required)
+      - in: query
+        name: template_id
+        type: string
+        required: false
+        description: Template whose results to return
+      - in: query
+        name: from
+        type: string
+        required: false
+        description: Start (inclusive), ISO 8601 date or datetime, UTC unless an offset is given; defaults to 24 hours before "to"
+      - in: query
+        name: to
+        type: string
+        required: false
+        description: End (exclusive), defaults to now
+      - in: query
+        name: limit
+        type: integer
+        required: false
+        description: Maximum number of results
+    responses:
+      200:
+        description: One JSON line per result (layout, ocr_mode, result_file, results, ts), in time order within each hour
+      400:
+        description: Invalid parameters
+      503:
+        description: Result shards are disabled
+    """
+    if result_store is None:
+        return jsonify({'error': 'Result shards are disabled (RESULT_SHARDS=0)'}), 503
+    try:
+        set_order, template_id = requested_layout()
+        if set_order is None and not template_id:
+            raise ValueError('set_order or template_id is required')
+        end = query_time('to', datetime.now(timezone.utc))
+        start = query_time('from', end - timedelta(days=1))
+        if start >= end:
+            raise ValueError('from must be before to')
+        if end - start > timedelta(days=result_query_max_days):
+            raise ValueError(f"The time range is limited to {result_query_max_days:g} days")
+        limit = request.args.get('limit')
+        try:
+            limit = int(limit) if limit else None
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be positive')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        try:
+            for record in result_store.query(start, end, set_order, template_id, limit):
+                yield json.dumps(record, ensure_ascii=False) + '\n'
+        except Exception as e:
+            logger.error(f"Error querying OCR results: {str(e)}")
+            yield json.dumps({'error': str(e)}, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/ocr-results/<filename>', methods=['GET'])
 def get_ocr_result(filename):
     """
@@ -409,8 +1409,11 @@ def get_ocr_result(filename):
         description: Server error
     """
     try:
-        blob_client = ocr_results_container_client.get_blob_client(filename)
-        result_content = blob_client.download_blob().readall().decode('utf-8')
+        # Results still waiting in the write-behind buffer are served from memory
+        result_content = result_writer.pending(filename)
+        if result_content is None:
+            blob_client = ocr_results_container_client.get_blob_client(filename)
+            result_content = blob_client.download_blob().readall().decode('utf-8')
         return jsonify(json.loads(result_content))
     except Exception as e:
         logger.error(f"Error getting OCR result: {str(e)}")
@@ -450,7 +1453,9 @@ def update_set_order():
             return jsonify({'error': 'Value must be an integer'}), 400
 
         blob_client = set_order_container_client.get_blob_client('set_order.txt')
-        blob_client.upload_blob(str(value), overwrite=True)
+        upload_result = blob_client.upload_blob(str(value), overwrite=True)
+        # Write-through so this worker serves the new value immediately
+        set_order_cache.prime(str(value), upload_result.get('etag'))
         
         return jsonify({
             'message': 'Set order updated successfully',
@@ -474,13 +1479,43 @@ def get_set_order():
         description: Server error
     """
     try:
-        blob_client = set_order_container_client.get_blob_client('set_order.txt')
-        value = blob_client.download_blob().readall().decode('utf-8')
-        return jsonify({'value': int(value)})
+        return jsonify({'value': set_order_cache.get()})
     except Exception as e:
         logger.error(f"Error in get_set_order: {str(e)}")
         return jsonify({'error': str(e)}), 404
 
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Get in-process cache statistics
+    ---
+    responses:
+      200:
+        description: Hit/miss counters of the in-process caches
+    """
+    return jsonify({
+        'roi_info': roi_cache.stats(),
+        'set_order': set_order_cache.stats(),
+        'templates': template_registry.stats(),
+        'frame_state': frame_states.stats() if frame_states else None,
+        'ocr_engine': ocr_engine.stats(),
+        'result_writer': result_writer.stats(),
+        'result_store': result_store.stats() if result_store else None,
+        'result_cache': result_cache.stats() if result_cache else None,
+        'storage_cache': storage_cache.stats() if storage_cache else None
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus metrics of this worker process
+    ---
+    responses:
+      200:
+        description: Stage latency, ROI count, image size and transfer histograms, error and cache counters in the Prometheus text format
+    """
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
\ No newline at end of file
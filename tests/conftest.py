@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The repository root holds an __init__.py, so pytest does not put it on sys.path itself
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
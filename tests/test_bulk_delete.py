@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.bulk_delete import MAX_NAMES, parse_selection
+
+
+def test_names_are_deduplicated_in_order():
+    assert parse_selection(names=['b.png', 'a.png', 'b.png']) == (['b.png', 'a.png'], None, None)
+
+
+def test_prefix_and_age_cutoff():
+    names, prefix, older_than = parse_selection(prefix='uploads/', older_than='2024-05-01T12:00:00')
+
+    assert names is None and prefix == 'uploads/'
+    # Without an offset the cutoff is UTC
+    assert older_than == datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def test_age_cutoff_keeps_its_offset():
+    _, prefix, older_than = parse_selection(older_than='2024-05-01T12:00:00+07:00')
+
+    assert prefix is None
+    assert older_than.utcoffset() == timedelta(hours=7)
+    assert older_than == datetime(2024, 5, 1, 5, tzinfo=timezone.utc)
+
+
+def test_empty_prefix_is_none():
+    cutoff = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    assert parse_selection(prefix='', older_than=cutoff) == (None, None, cutoff)
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({}, 'Pass names, prefix or older_than'),
+    ({'prefix': '', 'older_than': ''}, 'Pass names, prefix or older_than'),
+    ({'names': ['a.png'], 'prefix': 'x/'}, 'not both'),
+    ({'names': ['a.png'], 'older_than': '2024-01-01'}, 'not both'),
+    ({'names': []}, 'non-empty list'),
+    ({'names': 'a.png'}, 'non-empty list'),
+    ({'names': ['a.png', '']}, 'non-empty list'),
+    ({'names': ['a.png', 3]}, 'non-empty list'),
+    ({'names': ['a.png'] * (MAX_NAMES + 1)}, f"At most {MAX_NAMES}"),
+    ({'older_than': 'last week'}, 'ISO 8601'),
+])
+def test_invalid_selections(kwargs, message):
+    with pytest.raises(ValueError, match=message):
+        parse_selection(**kwargs)
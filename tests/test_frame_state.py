@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.services.frame_state import FrameStateCache
+from app.services.preprocessing import PreprocessedFrame
+
+TEXT_ROI = {'coordinates': [0, 0, 160, 40]}
+BLANK_ROI = {'coordinates': [0, 60, 160, 100]}
+
+
+def frame(text='123', brightness=0, rois=(TEXT_ROI, BLANK_ROI)):
+    gray = np.full((100, 200), 200, np.uint8)
+    cv2.putText(gray, text, (5, 32), cv2.FONT_HERSHEY_SIMPLEX, 1.0, 20, 2)
+    gray = cv2.add(gray, brightness) if brightness >= 0 else cv2.subtract(gray, -brightness)
+    return PreprocessedFrame(gray, [roi['coordinates'] for roi in rois])
+
+
+def ocr(cache, state, current, rois, text='123'):
+    """Triage a frame and 'recognize' its pending ROIs as text, returns (pending, reused)"""
+    pending, reused, fingerprints = cache.triage(state, current, list(enumerate(rois)))
+    results = [{'roi_index': index + 1, 'coordinates': roi['coordinates'], 'text': text} for index, roi in pending]
+    cache.remember(state, fingerprints, results)
+    return [index for index, _ in pending], reused
+
+
+@pytest.fixture
+def cache():
+    return FrameStateCache(change_threshold=24.0, blank_stddev=2.0)
+
+
+def test_blank_rois_are_answered_without_ocr(cache):
+    pending, reused = ocr(cache, cache.state('s1'), frame(), [TEXT_ROI, BLANK_ROI])
+
+    assert pending == [0]
+    assert reused == [{'roi_index': 2, 'coordinates': BLANK_ROI['coordinates'], 'text': '', 'skipped': 'blank'}]
+
+
+def test_unchanged_roi_reuses_text_despite_brightness_shift(cache):
+    state = cache.state('s1')
+    ocr(cache, state, frame(), [TEXT_ROI])
+
+    pending, reused = ocr(cache, state, frame(brightness=15), [TEXT_ROI])
+
+    assert pending == []
+    assert reused == [{'roi_index': 1, 'coordinates': TEXT_ROI['coordinates'], 'text': '123', 'skipped': 'unchanged'}]
+    assert cache.stats()['skipped_unchanged'] == 1 and cache.stats()['recognized'] == 1
+
+
+def test_changed_digit_is_recognized_again(cache):
+    state = cache.state('s1')
+    ocr(cache, state, frame('123'), [TEXT_ROI])
+
+    pending, reused = ocr(cache, state, frame('128'), [TEXT_ROI], text='128')
+
+    assert pending == [0] and reused == []
+    assert state.get(0)[2] == '128'
+
+
+def test_text_is_only_reused_for_the_same_hints(cache):
+    state = cache.state('s1')
+    ocr(cache, state, frame(), [TEXT_ROI])
+
+    pending, _ = ocr(cache, state, frame(), [dict(TEXT_ROI, psm=7)])
+
+    assert pending == [0]
+
+
+def test_failed_recognition_is_not_remembered(cache):
+    state = cache.state('s1')
+    pending, reused, fingerprints = cache.triage(state, frame(), [(0, TEXT_ROI)])
+    cache.remember(state, fingerprints, [{'roi_index': 1, 'coordinates': TEXT_ROI['coordinates'], 'text': '',
+                                          'error': 'tesseract failed'}])
+
+    assert state.get(0) is None
+    assert ocr(cache, state, frame(), [TEXT_ROI])[0] == [0]
+
+
+def test_roi_outside_the_image_is_left_to_ocr(cache):
+    outside = {'coordinates': [300, 300, 400, 400]}
+
+    assert ocr(cache, cache.state('s1'), frame(rois=(outside,)), [outside]) == ([0], [])
+
+
+def test_negative_settings_disable_skipping():
+    cache = FrameStateCache(change_threshold=-1, blank_stddev=-1)
+    state = cache.state('s1')
+    ocr(cache, state, frame(), [TEXT_ROI, BLANK_ROI])
+
+    assert ocr(cache, state, frame(), [TEXT_ROI, BLANK_ROI]) == ([0, 1], [])
+
+
+def test_states_are_per_key_and_least_recently_used_are_evicted():
+    cache = FrameStateCache(max_entries=2)
+    first = cache.state(('s1', 'set:1'))
+    second = cache.state(('s2', 'set:1'))
+    assert cache.state(('s1', 'set:1')) is first
+
+    cache.state(('s3', 'set:1'))
+
+    # s1 was used again after s2, so s2 made room for s3
+    assert cache.stats()['states'] == 2
+    assert cache.state(('s1', 'set:1')) is first
+    assert cache.state(('s2', 'set:1')) is not second
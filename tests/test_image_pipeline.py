@@ -0,0 +1,77 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.services.image_pipeline import MAX_OPERATIONS, _draft_factor, parse_operations, run_pipeline
+
+
+def test_parse_operations_normalizes():
+    assert parse_operations([
+        'grayscale',
+        {'op': 'crop', 'left': 10, 'top': 0, 'right': 110.0, 'bottom': 50},
+        {'op': 'resize', 'width': 40},
+        {'op': 'threshold'},
+        {'op': 'rotate', 'angle': -90}
+    ]) == [
+        {'op': 'grayscale'},
+        {'op': 'crop', 'box': [10, 0, 110, 50]},
+        {'op': 'resize', 'width': 40, 'height': None},
+        {'op': 'threshold', 'value': 128},
+        {'op': 'rotate', 'angle': 270.0, 'expand': True}
+    ]
+
+
+@pytest.mark.parametrize('operations, message', [
+    ([], 'non-empty list'),
+    ('grayscale', 'non-empty list'),
+    (['grayscale'] * (MAX_OPERATIONS + 1), f"At most {MAX_OPERATIONS}"),
+    (['blur'], 'Unknown operation'),
+    ([{'op': 'crop', 'left': 0, 'top': 0, 'right': 10}], 'needs left, top, right and bottom'),
+    ([{'op': 'crop', 'left': 10, 'top': 0, 'right': 10, 'bottom': 5}], 'crop box is empty'),
+    ([{'op': 'crop', 'left': -1, 'top': 0, 'right': 10, 'bottom': 5}], 'crop.left must be between'),
+    ([{'op': 'crop', 'left': 0.5, 'top': 0, 'right': 10, 'bottom': 5}], 'crop.left must be an integer'),
+    ([{'op': 'resize'}], 'resize needs width or height'),
+    ([{'op': 'resize', 'width': 0}], 'resize.width must be between'),
+    ([{'op': 'resize', 'height': True}], 'resize.height must be an integer'),
+    ([{'op': 'threshold', 'value': 256}], 'threshold.value must be between'),
+    ([{'op': 'rotate', 'angle': '90'}], 'rotate.angle must be a number'),
+])
+def test_parse_operations_rejects(operations, message):
+    with pytest.raises(ValueError, match=message):
+        parse_operations(operations)
+
+
+@pytest.mark.parametrize('operations, factor', [
+    ([{'op': 'resize', 'width': 1000}], 0.25),
+    (['grayscale', {'op': 'resize', 'height': 600}], 0.2),
+    # The resize applies to the cropped size
+    ([{'op': 'crop', 'left': 0, 'top': 0, 'right': 2000, 'bottom': 1000}, {'op': 'resize', 'width': 500}], 0.25),
+    # A quarter turn swaps width and height before the resize
+    ([{'op': 'rotate', 'angle': 90}, {'op': 'resize', 'height': 1000}], 0.25),
+    # Anything that needs full detail before the resize disables draft decoding
+    ([{'op': 'rotate', 'angle': 45}, {'op': 'resize', 'width': 1000}], 1.0),
+    ([{'op': 'threshold'}, {'op': 'resize', 'width': 1000}], 1.0),
+    ([{'op': 'crop', 'left': 5000, 'top': 0, 'right': 6000, 'bottom': 10}, {'op': 'resize', 'width': 10}], 1.0),
+    # Upscaling or no resize at all
+    ([{'op': 'resize', 'width': 8000}], 1.0),
+    (['grayscale'], 1.0),
+])
+def test_draft_factor(operations, factor):
+    assert _draft_factor((4000, 3000), parse_operations(operations)) == pytest.approx(factor)
+
+
+def test_run_pipeline_applies_operations_in_order():
+    source = io.BytesIO()
+    Image.new('RGB', (200, 100), (200, 30, 30)).save(source, format='PNG')
+
+    content, output_format, size = run_pipeline(source.getvalue(), parse_operations([
+        {'op': 'crop', 'left': 0, 'top': 0, 'right': 100, 'bottom': 100},
+        {'op': 'resize', 'width': 50},
+        {'op': 'rotate', 'angle': 90},
+        {'op': 'threshold', 'value': 50}
+    ]))
+
+    assert output_format == 'PNG' and size == (50, 50)
+    image = Image.open(io.BytesIO(content))
+    assert image.mode == 'L' and image.getextrema() == (255, 255)
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from app.services.job_queue import JobQueue, QueueFullError
+
+
+def wait_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.status not in ('succeeded', 'failed'):
+        assert time.monotonic() < deadline, f"Job {job.id} still {job.status}"
+        time.sleep(0.01)
+
+
+def test_job_runs_through_queued_running_succeeded():
+    release = threading.Event()
+    statuses = []
+
+    def handler(job_id, payload):
+        release.wait(5)
+        return {'echo': payload}
+
+    queue = JobQueue(handler, workers=1, on_status=lambda job: statuses.append(job.to_dict()))
+    try:
+        job = queue.submit('frame')
+        assert queue.get(job.id) is job
+        release.set()
+        wait_finished(job)
+    finally:
+        # Joins the worker, so its last on_status call has returned
+        queue.shutdown(5)
+
+    # Recorded by the worker only: once when it starts, once when it finishes
+    assert [status['status'] for status in statuses] == ['running', 'succeeded']
+    assert set(statuses[0]) == set(statuses[1])
+    final = job.to_dict()
+    assert final['result'] == {'echo': 'frame'} and final['error'] is None
+    assert final['started_at'] and final['finished_at'] and final['wait_seconds'] is not None
+    assert job.payload is None
+    assert queue.stats()['completed'] == 1
+
+
+def test_failed_handler_marks_job_failed():
+    def handler(job_id, payload):
+        raise RuntimeError('tesseract crashed')
+
+    queue = JobQueue(handler, workers=1)
+    try:
+        job = queue.submit(None)
+        wait_finished(job)
+        assert job.status == 'failed' and job.error == 'tesseract crashed' and job.result is None
+        assert queue.stats()['failed'] == 1
+    finally:
+        queue.shutdown(5)
+
+
+def test_submit_rejects_when_queue_is_full():
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(job_id, payload):
+        started.set()
+        release.wait(5)
+
+    queue = JobQueue(handler, workers=1, max_queue=1)
+    try:
+        running = queue.submit(1)
+        started.wait(5)
+        queued = queue.submit(2)
+        assert queued.status == 'queued'
+        with pytest.raises(QueueFullError):
+            queue.submit(3)
+        stats = queue.stats()
+        assert stats['running'] == 1 and stats['depth'] == 1 and stats['rejected'] == 1
+    finally:
+        release.set()
+        queue.shutdown(5)
+    assert running.status == queued.status == 'succeeded'
+
+
+def test_finished_jobs_are_evicted_beyond_max_finished():
+    queue = JobQueue(lambda job_id, payload: payload, workers=1, max_finished=2)
+    try:
+        jobs = [queue.submit(i) for i in range(4)]
+        for job in jobs:
+            wait_finished(job)
+    finally:
+        queue.shutdown(5)
+    assert [queue.get(job.id) for job in jobs[:2]] == [None, None]
+    assert [queue.get(job.id) for job in jobs[2:]] == jobs[2:]
@@ -0,0 +1,104 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.result_store import INDEX_SUFFIX, ResultStore
+from app.services.storage import MemoryStorage
+
+
+@pytest.fixture
+def container():
+    return MemoryStorage().get_container_client('ocr-results')
+
+
+@pytest.fixture
+def store(container):
+    store = ResultStore(container, flush_interval=0.05)
+    yield store
+    store.close(5)
+
+
+def window():
+    now = datetime.now(timezone.utc)
+    return now - timedelta(hours=1), now + timedelta(hours=1)
+
+
+def test_appended_records_round_trip_per_layout(store, container):
+    for i in range(3):
+        assert store.append({'set_order': 1, 'i': i, 'results': [{'text': f"T{i}"}]})
+    store.append({'template_id': 'meter', 'i': 10})
+    assert store.flush(5)
+    store.append({'set_order': 1, 'i': 3})
+    assert store.flush(5)
+
+    start, end = window()
+    records = list(store.query(start, end, set_order=1))
+    assert [record['i'] for record in records] == [0, 1, 2, 3]
+    assert records[0]['results'] == [{'text': 'T0'}]
+    assert [record['i'] for record in store.query(start, end, template_id='meter')] == [10]
+    assert list(store.query(start, end, set_order=2)) == []
+
+    # One shard and its index; the second flush appended to the same shard
+    names = [blob.name for blob in container.list_blobs(name_starts_with='shards/')]
+    assert len(names) == 2 and sum(name.endswith(INDEX_SUFFIX) for name in names) == 1
+    stats = store.stats()
+    assert stats['written'] == 5 and stats['segments_written'] == 3 and stats['pending_indexes'] == 0
+
+
+def test_query_honors_time_range_and_limit(store):
+    for i in range(5):
+        store.append({'set_order': 1, 'i': i})
+    store.flush(5)
+
+    start, end = window()
+    assert [record['i'] for record in store.query(start, end, set_order=1, limit=2)] == [0, 1]
+    assert list(store.query(end, end + timedelta(hours=1), set_order=1)) == []
+    assert list(store.query(start - timedelta(hours=2), start, set_order=1)) == []
+
+
+def test_append_drops_records_beyond_the_buffer(container):
+    store = ResultStore(container, flush_interval=60, max_buffer=2)
+    try:
+        assert store.append({'set_order': 1}) and store.append({'set_order': 1})
+        assert not store.append({'set_order': 1})
+        assert store.stats()['dropped'] == 1
+    finally:
+        store.close(5)
+
+
+def test_failed_index_upload_does_not_duplicate_records(container):
+    get_blob_client = container.get_blob_client
+    failures = [2]
+
+    class FlakyIndexBlob:
+        def __init__(self, blob_client):
+            self.blob_client = blob_client
+
+        def upload_blob(self, *args, **kwargs):
+            if self.blob_client.blob_name.endswith(INDEX_SUFFIX) and failures[0]:
+                failures[0] -= 1
+                raise RuntimeError('index upload failed')
+            return self.blob_client.upload_blob(*args, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(self.blob_client, name)
+
+    container.get_blob_client = lambda name: FlakyIndexBlob(get_blob_client(name))
+    store = ResultStore(container, flush_interval=0.05)
+    try:
+        for i in range(3):
+            store.append({'set_order': 1, 'i': i})
+        store.flush(5)
+        store.append({'set_order': 1, 'i': 3})
+        store.flush(5)
+        # The index is retried by the writer thread on its next pass
+        deadline = time.monotonic() + 5
+        while store.stats()['pending_indexes'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        start, end = window()
+        assert [record['i'] for record in store.query(start, end, set_order=1)] == [0, 1, 2, 3]
+        assert store.stats()['failed_flushes'] == 2
+    finally:
+        store.close(5)
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.roi_layout import parse_hints, parse_roi_info
+
+ROI_INFO = """Bộ khung 1: 2 vùng
+(10, 20, 110, 60) psm=7 whitelist=0123456789.
+(0, 0, 50, 50)
+
+Bộ khung 2: 1 vùng
+(5, 5, 15, 15) lang=eng profile=invert text_height=18
+"""
+
+
+def test_parse_roi_info_returns_every_roi_with_hints():
+    layouts = parse_roi_info(ROI_INFO)
+
+    assert layouts == {
+        1: [
+            {'coordinates': [10, 20, 110, 60], 'psm': 7, 'whitelist': '0123456789.'},
+            {'coordinates': [0, 0, 50, 50]}
+        ],
+        2: [{'coordinates': [5, 5, 15, 15], 'lang': 'eng', 'profile': 'invert', 'text_height': 18}]
+    }
+
+
+def test_parse_roi_info_skips_sets_without_coordinates_and_bad_lines():
+    layouts = parse_roi_info("Bộ khung 1: 0 vùng\nBộ khung x: 1 vùng\n(1, 2, 3, 4)\n"
+                             "Bộ khung 3: 1 vùng\n(1, 2, 3)\n(a, b, c, d)\n(1, 2, 3, 4)")
+
+    assert layouts == {3: [{'coordinates': [1, 2, 3, 4]}]}
+
+
+def test_parse_roi_info_keeps_first_block_of_repeated_set():
+    content = "Bộ khung 1: 1 vùng\n(1, 2, 3, 4)\nBộ khung 1: 1 vùng\n(5, 6, 7, 8)"
+
+    assert parse_roi_info(content) == {1: [{'coordinates': [1, 2, 3, 4]}]}
+    with pytest.raises(ValueError, match='more than once'):
+        parse_roi_info(content, strict=True)
+
+
+def test_parse_roi_info_ignores_invalid_hints_unless_strict():
+    content = "Bộ khung 1: 2 vùng\n(1, 2, 3, 4) psm=99\n(5, 6, 7, 8) color=red lang=eng"
+
+    # The ROI is kept (so later roi_index values do not shift) with default settings
+    assert parse_roi_info(content) == {1: [{'coordinates': [1, 2, 3, 4]}, {'coordinates': [5, 6, 7, 8], 'lang': 'eng'}]}
+    with pytest.raises(ValueError, match='Invalid ROI hints'):
+        parse_roi_info(content, strict=True)
+    with pytest.raises(ValueError, match='Unknown ROI hint'):
+        parse_roi_info("Bộ khung 1: 1 vùng\n(5, 6, 7, 8) color=red", strict=True)
+
+
+def test_parse_hints_normalizes_values():
+    assert parse_hints({'psm': '7', 'text_height': 24.0, 'lang': 'vie+eng', 'whitelist': None}) == {
+        'psm': 7, 'text_height': 24, 'lang': 'vie+eng'
+    }
+    assert parse_hints({}) == {}
+
+
+@pytest.mark.parametrize('hints', [
+    {'psm': 0},
+    {'psm': 2},
+    {'psm': True},
+    {'psm': 'seven'},
+    {'whitelist': ''},
+    {'whitelist': '0 1'},
+    {'whitelist': 'x' * 257},
+    {'lang': 'eng+'},
+    {'lang': 'en g'},
+    {'profile': 'sepia'},
+    {'text_height': 0},
+    {'text_height': 10001},
+    {'text_height': False},
+])
+def test_parse_hints_rejects_invalid_values(hints):
+    with pytest.raises(ValueError):
+        parse_hints(hints)